@@ -0,0 +1,262 @@
+"""
+A fixed layout table of actor state in shared memory. The sim writes
+it every AI update and AIs started with it (see core_ai.make_ai) read
+it directly rather than having the actors pickled through their queue.
+Orders still go back to the sim through the AI's queue.
+
+The table is a memory mapped file (in /dev/shm where there is one).
+Only the sim maps it writable, each AI process maps it again read-only
+with reader() so it can't change the table underneath the sim.
+
+Each actor is a row of doubles (see fields), the header holds a
+sequence number along with the number of rows and the tick they are
+from. The sequence number is odd while the sim is writing, a reader
+copies the rows and only keeps them if the sequence number was even and
+unchanged across the copy (a seqlock).
+
+Type names and commands are stored as their index in type_names and
+commands respectively.
+
+The last field is a bitmask of the teams that can see the actor (bit
+1 << team, see BattleSim.visible_actors) or NaN when every team can,
+teams 0 to 52 fit exactly in a double. read() with a team only returns
+the rows that team can see.
+"""
+
+import os
+import time
+import mmap
+import struct
+import tempfile
+
+from engine.libs import actor_lib
+
+# NumPy is optional, it's only used to give a zero-copy view of the rows
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+fields = ("oid", "team", "type", "pos_x", "pos_y", "pos_z",
+    "velocity_x", "velocity_y", "velocity_z", "hp", "completion",
+    "order_cmd", "order_x", "order_y", "order_target", "visible_to")
+row_size = len(fields)
+
+# Sequence number, row count and tick
+_header = struct.Struct("<qqq")
+_row = struct.Struct("<%dd" % row_size)
+
+shm_dir = None
+if os.path.isdir("/dev/shm"):
+    shm_dir = "/dev/shm"
+
+commands = ("stop", "hold position", "move", "attack", "aid", "build")
+
+nan = float("nan")
+
+def _is_nan(v):
+    return v != v
+
+class ActorTable (object):
+    def __init__(self, type_names, capacity=10000, file_path=None):
+        """Makes a new table, or maps an existing one read-only when
+        given its file_path (see reader)"""
+        super(ActorTable, self).__init__()
+        
+        self.type_names = list(type_names)
+        self.capacity = capacity
+        
+        self._type_ids = {}
+        for i, name in enumerate(self.type_names):
+            self._type_ids[name] = i
+        
+        self._command_ids = {}
+        for i, cmd in enumerate(commands):
+            self._command_ids[cmd] = i
+        
+        size = _header.size + capacity * _row.size
+        
+        if file_path == None:
+            fd, self.file_path = tempfile.mkstemp(prefix="actor_table", dir=shm_dir)
+            os.ftruncate(fd, size)
+            self.buffer = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+            os.close(fd)
+            
+            self.writable = True
+        else:
+            self.file_path = file_path
+            with open(file_path, "rb") as f:
+                self.buffer = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            
+            self.writable = False
+        
+        self.overflowed = False
+        self.closed = False
+    
+    def reader(self):
+        """The same table mapped read-only, for the AI processes"""
+        return ActorTable(self.type_names, self.capacity, self.file_path)
+    
+    # A pickled table (e.g. sent to a spawned process) comes back as a reader
+    def __getstate__(self):
+        return (self.type_names, self.capacity, self.file_path)
+    
+    def __setstate__(self, state):
+        self.__init__(*state)
+    
+    def unmap(self):
+        if not self.closed:
+            self.buffer.close()
+            self.closed = True
+    
+    def close(self):
+        """Unmaps the table, the one that made it also removes its file"""
+        if self.closed:
+            return
+        
+        self.unmap()
+        if self.writable and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+    
+    def header(self):
+        """(sequence, count, tick)"""
+        return _header.unpack_from(self.buffer, 0)
+    
+    def sequence(self):
+        return self.header()[0]
+    
+    def _pack_order(self, order):
+        cmd, pos, target = order
+        
+        if type(pos) in (list, tuple):
+            x, y = pos[0], pos[1]
+        elif type(pos) in (int, float):
+            x, y = pos, nan
+        else:
+            x, y = nan, nan
+        
+        if target == None:
+            target = nan
+        elif type(target) in (str, unicode):
+            target = self._type_ids.get(target, -1)
+        elif type(target) not in (int, float):
+            target = target.oid
+        
+        return self._command_ids.get(cmd, -1), x, y, target
+    
+    def pack_actor(self, a, visible_to=nan):
+        order_cmd, order_x, order_y, order_target = self._pack_order(a.current_order)
+        
+        return (a.oid, a.team, self._type_ids.get(a.actor_type, -1),
+            a.pos[0], a.pos[1], a.pos[2],
+            a.velocity[0], a.velocity[1], a.velocity[2],
+            a.hp, a.completion,
+            order_cmd, order_x, order_y, order_target,
+            visible_to)
+    
+    def write(self, actors, tick=0, visible_to=None):
+        """visible_to is oid -> bitmask of the teams that can see the
+        actor, without it every team can see every actor"""
+        if not self.writable:
+            raise Exception("This actor table is read-only")
+        
+        if len(actors) > self.capacity:
+            if not self.overflowed:
+                print("Actor table is full, only the first %d of %d actors are shared" % (
+                    self.capacity, len(actors)))
+            self.overflowed = True
+        
+        count = min(len(actors), self.capacity)
+        buf = self.buffer
+        seq, old_count, old_tick = self.header()
+        
+        _header.pack_into(buf, 0, seq + 1, old_count, old_tick)
+        
+        offset = _header.size
+        for a in actors[:count]:
+            if visible_to == None:
+                mask = nan
+            else:
+                mask = visible_to.get(a.oid, 0)
+            
+            _row.pack_into(buf, offset, *self.pack_actor(a, mask))
+            offset += _row.size
+        
+        _header.pack_into(buf, 0, seq + 2, count, tick)
+    
+    def read(self, retries=1000, team=None):
+        """Returns (sequence, tick, rows) with each row a tuple in the
+        order of fields, None if the sim was writing every time we tried.
+        Given a team only the rows it can see are returned."""
+        buf = self.buffer
+        
+        for i in range(retries):
+            seq, count, tick = self.header()
+            if seq % 2 == 1:
+                time.sleep(0)
+                continue
+            
+            values = struct.unpack_from("<%dd" % (count * row_size), buf, _header.size)
+            
+            if self.sequence() == seq:
+                rows = [values[j:j+row_size] for j in range(0, len(values), row_size)]
+                
+                if team != None:
+                    bit = 1 << team
+                    rows = [r for r in rows if _is_nan(r[-1]) or int(r[-1]) & bit]
+                
+                return seq, tick, rows
+        
+        return None
+    
+    def view(self):
+        """The rows without copying them, a numpy array if numpy is
+        available and otherwise a buffer of the packed rows. They can
+        change underneath you, check sequence() before and after
+        reading if that matters. Every row is there whoever can see it,
+        AIs should use read(team=...) instead."""
+        count = self.header()[1]
+        
+        if numpy != None:
+            return numpy.frombuffer(self.buffer, dtype=numpy.float64,
+                count=count * row_size, offset=_header.size).reshape((count, row_size))
+        
+        return buffer(self.buffer, _header.size, count * _row.size)
+    
+    def _unpack_order(self, cmd_id, x, y, target):
+        cmd = None
+        if 0 <= cmd_id < len(commands):
+            cmd = commands[int(cmd_id)]
+        
+        if _is_nan(x):
+            pos = None
+        elif _is_nan(y):
+            pos = x
+        else:
+            pos = [x, y]
+        
+        if _is_nan(target):
+            target = None
+        elif cmd == "build":
+            target = self.type_names[int(target)]
+        else:
+            target = int(target)
+        
+        return cmd, pos, target
+    
+    def make_actor(self, row):
+        """A StrippedActor from a row, it only has the fields in the table"""
+        actor_type = None
+        if row[2] >= 0:
+            actor_type = self.type_names[int(row[2])]
+        
+        return actor_lib.make_stripped({
+            "oid":              int(row[0]),
+            "team":             int(row[1]),
+            "actor_type":       actor_type,
+            "pos":              [row[3], row[4], row[5]],
+            "velocity":         [row[6], row[7], row[8]],
+            "hp":               row[9],
+            "completion":       row[10],
+            "current_order":    self._unpack_order(row[11], row[12], row[13], row[14]),
+        })
@@ -3,40 +3,116 @@ so that the actors have basic intelligence. It's not designed to handle
 strategic actions or anything beyond handling simple micromanagement.
 
 It is designed to have a direct link to the simulation and not perform
-long-running calculations."""
+long-running calculations.
 
-import weakref
+Actors ask for their targets to be refreshed through request_update,
+the autotargeter will only run so many refreshes each tick (see
+actor_budget and time_budget) and pushes the rest back to the next
+tick. Actors placed at the same time would otherwise all refresh on
+the same tick, every refresh_interval ticks."""
 
-from engine.libs import vectors
+import time
+import weakref
 
 class Autotargeter (object):
-    def __init__(self, sim, team):
+    # How many ticks an actor waits between target refreshes
+    refresh_interval = 10
+    
+    # How many ticks of counters to keep
+    history_length = 100
+    
+    def __init__(self, sim, team, actor_budget=0, time_budget=0):
         super(Autotargeter, self).__init__()
         
         self.sim = sim
         self.team = team
         
-        self.next_update = 0
+        # Limits on the refreshes run in a single tick, 0 means there
+        # is no limit. The time budget is in seconds.
+        self.actor_budget = actor_budget
+        self.time_budget = time_budget
+        
+        # Actors that did not fit into the budget, they get first
+        # go at the budget next tick
+        self.backlog = []
+        self._backlog_oids = set()
         
-        self.enemy_actors = []
+        # Counters for the current tick
+        self.refreshes = 0
+        self.deferred = 0
+        self._time_used = 0
+        
+        # (refreshes, deferred) for each of the previous ticks
+        self.history = []
     
     def update(self):
-        self.next_update -= 1
-        if self.next_update > 0: return
+        """Called once per tick before the actors are updated"""
+        self.history.append((self.refreshes, self.deferred))
+        if len(self.history) > self.history_length:
+            del(self.history[0])
         
-        self.enemy_actors = []
+        self.refreshes = 0
+        self.deferred = 0
+        self._time_used = 0
         
-        for a in self.sim.actors:
-            if a.team != self.team:
-                self.enemy_actors.append(weakref.ref(a)())
+        backlog = self.backlog
+        self.backlog = []
+        self._backlog_oids = set()
         
-        self.next_update = 10
+        for a in backlog:
+            if a.hp <= 0: continue
+            
+            if self.request_update(a):
+                # Now it's been pushed back it stays out of step with
+                # the actors it was queued alongside
+                a.next_ai_update = self.refresh_interval
+    
+    def in_budget(self):
+        if self.actor_budget > 0 and self.refreshes >= self.actor_budget:
+            return False
+        
+        if self.time_budget > 0 and self._time_used >= self.time_budget:
+            return False
+        
+        return True
+    
+    def request_update(self, the_actor):
+        """Refreshes the targets of the actor if there is budget left this
+        tick, if not it is queued for the next tick. Returns True if the
+        refresh took place."""
+        if the_actor.oid in self._backlog_oids:
+            return False
+        
+        if not self.in_budget():
+            self.backlog.append(the_actor)
+            self._backlog_oids.add(the_actor.oid)
+            self.deferred += 1
+            return False
+        
+        start_time = time.time()
+        self.update_actor(the_actor)
+        
+        self._time_used += time.time() - start_time
+        self.refreshes += 1
+        return True
+    
+    def counters(self):
+        return {
+            "refreshes":    self.refreshes,
+            "deferred":     self.deferred,
+            "backlog":      len(self.backlog),
+            "history":      list(self.history),
+        }
     
     def update_actor(self, the_actor):
+        """Nearest enemies come first so enemy_targets[0] is always
+        the closest thing in range"""
         the_actor.enemy_targets = []
         
-        for a in self.enemy_actors:
-            dist = vectors.distance(a.pos, the_actor.pos)
-            
-            if dist <= the_actor.max_attack_range:
-                the_actor.enemy_targets.append(a)
+        in_range = self.sim.spatial_index.query_radius(
+            the_actor.pos, the_actor.max_attack_range,
+            exclude_team=self.team, by_distance=True
+        )
+        
+        for a in in_range:
+            the_actor.enemy_targets.append(weakref.ref(a)())
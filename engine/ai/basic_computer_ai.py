@@ -21,6 +21,7 @@ class BasicComputerAI (core_ai.AICore):
         
         self.prefs = {
             "actor_format": "dict",
+            "wire_format":  "frames",
         }
         
         self.enemy_actors = {}
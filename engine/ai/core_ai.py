@@ -2,6 +2,7 @@ import multiprocessing
 import time
 
 from engine.libs import vectors, ai_lib
+from engine.ai import wire
 
 ai_classes = {}
 def register_ai(class_name, class_template):
@@ -13,7 +14,7 @@ def register_ai(class_name, class_template):
 class AICore (object):
     """This forms the basis of an AI that runs a team."""
     
-    def __init__(self, in_queue, out_queue):
+    def __init__(self, in_queue, out_queue, actor_table=None):
         super(AICore, self).__init__()
         
         self.running = True
@@ -22,12 +23,27 @@ class AICore (object):
         self.in_queue = in_queue
         self.out_queue = out_queue
         
+        # When the sim shares an actor_table.ActorTable and our prefs
+        # have an actor_source of "table" the actors are read from it
+        # rather than sent through in_queue
+        self.actor_table = actor_table
+        self._table_sequence = None
+        
         self.next_update = 0
         
         self.enemy_actors = []
         self.own_actors = []
         self.terrain = {}
         
+        # Every actor we know of by oid, kept up to date by the deltas
+        # the sim sends between full lists
+        self.actors = {}
+        
+        # With a wire_format of "frames" our orders are held until the
+        # end of the cycle and sent as one frame packed by this, see wire.py
+        self.wire = wire.Codec()
+        self._outgoing = []
+        
         self.next_cycle = time.time()
         ai_lib.set_speed(self, 100)
         
@@ -35,6 +51,7 @@ class AICore (object):
             "_default":     self._default_data_handler,
             "init":         self._init,
             "actors":       self._recieve_actors,
+            "actor_deltas": self._recieve_actor_deltas,
             "actor_types":  self._recieve_actor_types,
             "build_lists":  self._recieve_build_lists,
             "quit":         self._quit,
@@ -45,6 +62,8 @@ class AICore (object):
         
         self.prefs = {
             "actor_format": "list",
+            "actor_source": "queue",
+            "wire_format":  "frames",
         }
     
     def read_queue(self):
@@ -54,6 +73,13 @@ class AICore (object):
             print("Error reading in from in_queue")
             raise
         
+        if wire.is_frame(data):
+            for message in self.wire.unpack_frame(data):
+                self.handle_message(message)
+        else:
+            self.handle_message(data)
+    
+    def handle_message(self, data):
         cmd = data['cmd']
         del(data['cmd'])
         
@@ -76,27 +102,64 @@ class AICore (object):
             self.team = int(kwargs['team'])
     
     def _recieve_actors(self, actor_list):
+        """The full list of actors, anything we had before is replaced"""
+        if type(actor_list) == dict:
+            self.actors = dict(actor_list)
+        else:
+            self.actors = {}
+            for a in actor_list:
+                self.actors[a.oid] = a
+        
+        self._sort_actors()
+    
+    def _recieve_actor_deltas(self, created, removed, changed):
+        """Only what has changed since the last list or deltas,
+        see ai_lib.actor_deltas"""
+        ai_lib.apply_deltas(self.actors, created, removed, changed)
+        self._sort_actors()
+    
+    def _read_actor_table(self):
+        """Replaces the actors with those in the table if the sim has
+        written to it since we last looked"""
+        if self.actor_table.sequence() == self._table_sequence:
+            return
+        
+        # Only the actors our team can see, the sim marks each row
+        result = self.actor_table.read(team=self.team)
+        if result == None:
+            return
+        
+        self._table_sequence, tick, rows = result
+        
+        self.actors = {}
+        for row in rows:
+            a = self.actor_table.make_actor(row)
+            self.actors[a.oid] = a
+        
+        self._sort_actors()
+    
+    def _sort_actors(self):
         # This allows the AI to re-scan the lists and see if there's
         # anything it needs to do differently
         self.actors_updated = True
         
         if self.prefs['actor_format'] == "dict":
-            return self._recieve_actors_as_dict(actor_list)
+            return self._sort_actors_as_dict()
         
         self.enemy_actors = []
         self.own_actors = []
         
-        for a in actor_list:
+        for aid, a in sorted(self.actors.items()):
             if a.team == self.team:
                 self.own_actors.append(a)
             else:
                 self.enemy_actors.append(a)
     
-    def _recieve_actors_as_dict(self, actor_list):
+    def _sort_actors_as_dict(self):
         self.enemy_actors = {}
         self.own_actors = {}
         
-        for aid, a in actor_list.items():
+        for aid, a in self.actors.items():
             if a.team == self.team:
                 self.own_actors[aid] = a
             else:
@@ -104,18 +167,24 @@ class AICore (object):
     
     def _recieve_actor_types(self, actor_types):
         self.actor_types = actor_types
+        self.wire = wire.Codec(actor_types.keys())
     
     def _recieve_build_lists(self, build_lists):
         self.build_lists = build_lists
     
     def issue_orders(self, actor_id, cmd, pos=None, target=None):
-        self.out_queue.put({
+        order = {
             "data_type":    "orders",
             "cmd":          cmd,
             "actor":        actor_id,
             "target":       target,
             "pos":          pos,
-        })
+        }
+        
+        if self.prefs.get("wire_format") == "frames":
+            self._outgoing.append(order)
+        else:
+            self.out_queue.put(order)
         
         # Update our records so we don't spam the queue
         if type(self.own_actors) == list:
@@ -128,6 +197,14 @@ class AICore (object):
             self.own_actors[actor_id].current_order = cmd, pos, target
             if cmd == "build": self.own_actors[actor_id].build_queue.append(target)
     
+    def send_orders(self):
+        """Sends the orders held back by issue_orders as one frame"""
+        if self._outgoing == []:
+            return
+        
+        self.out_queue.put(self.wire.pack_frame(self._outgoing))
+        self._outgoing = []
+    
     def core_cycle(self):
         """The central loop for the AI"""
         
@@ -135,21 +212,32 @@ class AICore (object):
         while not self.in_queue.empty():
             self.read_queue()
         
+        if self.actor_table != None and self.prefs.get("actor_source") == "table":
+            self._read_actor_table()
+        
         if time.time() > self.next_cycle:
             self.cycle()
+        
+        self.send_orders()
     
     def cycle(self):
         """This is intended to be overwritten by the subclass"""
         pass
 
-def _ai_process(ai_class, in_queue, out_queue):
+def _ai_process(ai_class, in_queue, out_queue, actor_table=None):
     # Added to prevent memory leaks if the program doesn't
     # exit correctly
     start_time = time.time()
     time_to_live = 60 * 10# 10 Minutes
     
     try:
-        a = ai_class(in_queue, out_queue)
+        # A forked process still has the sim's writable mapping of the
+        # table, swap it for a read-only one
+        if actor_table != None:
+            shared_table, actor_table = actor_table, actor_table.reader()
+            shared_table.unmap()
+        
+        a = ai_class(in_queue, out_queue, actor_table)
         out_queue.put({"data_type":"prefs","prefs":a.prefs})
         time_to_live -= 1
         
@@ -161,8 +249,9 @@ def _ai_process(ai_class, in_queue, out_queue):
     except Exception as e:
         raise
 
-def make_ai(class_name):
-    """Returns the ai in and out queues"""
+def make_ai(class_name, actor_table=None):
+    """Returns the ai in and out queues, actor_table is an
+    actor_table.ActorTable the sim will share with the AI"""
     if class_name not in ai_classes:
         raise KeyError("No AI class by name of %s" % class_name)
     
@@ -171,7 +260,7 @@ def make_ai(class_name):
     
     ai_class = ai_classes[class_name]
     
-    p = multiprocessing.Process(target=_ai_process, args=(ai_class, ai_in_queue, ai_out_queue))
+    p = multiprocessing.Process(target=_ai_process, args=(ai_class, ai_in_queue, ai_out_queue, actor_table))
     p.start()
     
     return ai_in_queue, ai_out_queue
@@ -0,0 +1,732 @@
+"""
+A compact binary format for the messages between the sim and the AIs.
+Rather than putting each message on the queue as a dict (pickled and
+sent down the pipe one at a time) everything one side has to say in a
+cycle is packed into a single frame, a string of records:
+
+    ORDER_ROWS      orders from an AI (see AICore.issue_orders), each a
+                    fixed size row
+    ORDER           an order that doesn't fit in a row
+    ACTORS          the full list of actors an AI can see
+    ACTOR_DELTAS    what has changed since the last list or deltas
+    PICKLED         anything else, pickled
+
+Each record is a kind and the length of its payload. Actor fields are
+written in the order of actor_fields behind a mask of which ones are
+present, so the changed actors in a delta only carry what changed. A
+whole actor has its fixed size fields packed together instead (see
+_actor_head), as do the changes that are only numbers and vectors (see
+fixed_formats).
+
+Commands, actor type names and ability flags are sent as their index in
+a table both sides build from the actor types and abilities (see Codec),
+any other name is sent in full. An actor's flag sets are a bitmask of
+the flags when they're all in the first 8 of the table.
+
+The AIs only need to know roughly where things are, so the numbers in
+actor records (vectors, hp, completion and order positions) are sent as
+float32, good to a few thousandths of a pixel across a large battlefield.
+Orders from the AIs keep full precision.
+
+Frames are only used with AIs whose prefs have a wire_format of
+"frames", unpacking one gives back the same dicts the AI or the sim
+would otherwise have got one at a time.
+"""
+
+import struct
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from engine.libs import actor_lib
+from engine.logic import abilities
+
+PICKLED = 0
+ORDER = 1
+ACTORS = 2
+ACTOR_DELTAS = 3
+ORDER_ROWS = 4
+
+commands = ("stop", "hold position", "move", "attack", "aid", "build")
+
+# The stripped fields (see actor_lib.stripped_fields), a record's mask
+# has bit n set when it holds actor_fields[n]
+actor_fields = actor_lib.attribs + ("current_order", "order_queue")
+
+# A whole actor whose type has a name id, whose vectors are the usual
+# length and whose flags fit in a bitmask has its fixed size fields
+# packed together (the HEAD mask bit) followed by the rest
+head_fields = ("oid", "team", "actor_type", "pos", "velocity", "facing",
+    "hp", "completion", "offence_flags", "defence_flags")
+tail_fields = tuple([k for k in actor_fields if k not in head_fields])
+HEAD = 1 << 15
+
+# Fields that are always the same size, when all of an actor's fields
+# are these (typically pos, velocity and facing in a delta) they're
+# packed with one struct made for that mask and the FIXED bit is set
+fixed_formats = {
+    "oid":          "i",
+    "team":         "i",
+    "hp":           "f",
+    "completion":   "f",
+    "pos":          "3f",
+    "velocity":     "3f",
+    "facing":       "2f",
+}
+vector_lengths = {"pos": 3, "velocity": 3, "facing": 2}
+FIXED = 1 << 14
+
+_field_bits = dict([(k, 1 << i) for i, k in enumerate(actor_fields)])
+
+_record = struct.Struct("<BI")
+_byte = struct.Struct("<B")
+_short = struct.Struct("<h")
+_ushort = struct.Struct("<H")
+_int = struct.Struct("<i")
+_uint = struct.Struct("<I")
+_double = struct.Struct("<d")
+_float = struct.Struct("<f")
+
+# oid, team, type, pos, velocity, facing, hp, completion and the two
+# flag bitmasks
+_actor_head = struct.Struct("<ihh3f3f2fffBB")
+
+# actor, command, position length, x, y, z, target kind and target. The
+# position length is 0 for no position and 1 for a single number.
+_order_row = struct.Struct("<ihBdddBi")
+
+# Vectors and order positions can be missing, a single number or a list
+NO_VALUE = 0
+NUMBER = 1
+SEQUENCE = 2
+
+# Order targets are nothing, an actor's oid or the name of what to build
+NO_TARGET = 0
+OID_TARGET = 1
+NAME_TARGET = 2
+
+def ability_flags():
+    """Every flag an ability can give an actor, in the order they're
+    added to the name table"""
+    flags = set()
+    for ability_class in abilities.lookup.values():
+        flags.update(ability_class.offence_flags)
+        flags.update(ability_class.defence_flags)
+    
+    return sorted(flags)
+
+class Codec (object):
+    def __init__(self, type_names=()):
+        super(Codec, self).__init__()
+        
+        self.flag_names = ability_flags()[:8]
+        
+        self.names = list(commands) + sorted(type_names)
+        self.names.extend([f for f in ability_flags() if f not in self.names])
+        
+        self._name_ids = {}
+        for i, name in enumerate(self.names):
+            self._name_ids[name] = i
+        
+        self._flag_bits = {}
+        for i, name in enumerate(self.flag_names):
+            self._flag_bits[name] = 1 << i
+        
+        # mask -> (struct, fields) for FIXED records
+        self._fixed_structs = {}
+        
+        # Every flag set a bitmask can stand for
+        self._flag_sets = []
+        for mask in range(256):
+            self._flag_sets.append([f for f in self.flag_names if mask & self._flag_bits[f]])
+        
+        self.field_packers = {
+            "oid":              self._pack_int,
+            "team":             self._pack_int,
+            "actor_type":       self._pack_name,
+            "pos":              self._pack_vector32,
+            "velocity":         self._pack_vector32,
+            "facing":           self._pack_vector32,
+            "hp":               self._pack_float,
+            "completion":       self._pack_float,
+            "offence_flags":    self._pack_names,
+            "defence_flags":    self._pack_names,
+            "build_queue":      self._pack_names,
+            "current_order":    self._pack_actor_order,
+            "order_queue":      self._pack_actor_orders,
+        }
+        
+        self.field_unpackers = {
+            "oid":              self._unpack_int,
+            "team":             self._unpack_int,
+            "actor_type":       self._unpack_name,
+            "pos":              self._unpack_vector32,
+            "velocity":         self._unpack_vector32,
+            "facing":           self._unpack_vector32,
+            "hp":               self._unpack_float,
+            "completion":       self._unpack_float,
+            "offence_flags":    self._unpack_name_set,
+            "defence_flags":    self._unpack_name_set,
+            "build_queue":      self._unpack_names,
+            "current_order":    self._unpack_actor_order,
+            "order_queue":      self._unpack_actor_orders,
+        }
+        
+        self.message_packers = {
+            "orders":           self._pack_order_message,
+            "actors":           self._pack_actors_message,
+            "actor_deltas":     self._pack_deltas_message,
+        }
+        
+        self.record_unpackers = {
+            PICKLED:            self._unpack_pickled,
+            ORDER:              self._unpack_order_message,
+            ACTORS:             self._unpack_actors_message,
+            ACTOR_DELTAS:       self._unpack_deltas_message,
+            ORDER_ROWS:         self._unpack_order_rows,
+        }
+    
+    # Values, each packer appends to parts and each unpacker
+    # returns (value, offset)
+    def _pack_int(self, value, parts):
+        parts.append(_int.pack(value))
+    
+    def _unpack_int(self, data, offset):
+        return _int.unpack_from(data, offset)[0], offset + _int.size
+    
+    def _pack_number(self, value, parts):
+        parts.append(_double.pack(value))
+    
+    def _unpack_number(self, data, offset):
+        return _double.unpack_from(data, offset)[0], offset + _double.size
+    
+    def _pack_float(self, value, parts):
+        parts.append(_float.pack(value))
+    
+    def _unpack_float(self, data, offset):
+        return _float.unpack_from(data, offset)[0], offset + _float.size
+    
+    def _pack_name(self, name, parts):
+        name_id = self._name_ids.get(name, -1)
+        parts.append(_short.pack(name_id))
+        
+        if name_id == -1:
+            encoded = name.encode("utf-8")
+            parts.append(_ushort.pack(len(encoded)))
+            parts.append(encoded)
+    
+    def _unpack_name(self, data, offset):
+        name_id = _short.unpack_from(data, offset)[0]
+        offset += _short.size
+        
+        if name_id != -1:
+            return self.names[name_id], offset
+        
+        length = _ushort.unpack_from(data, offset)[0]
+        offset += _ushort.size
+        return data[offset:offset+length].decode("utf-8"), offset + length
+    
+    def _pack_names(self, names, parts):
+        parts.append(_ushort.pack(len(names)))
+        for name in names:
+            self._pack_name(name, parts)
+    
+    def _unpack_names(self, data, offset):
+        count = _ushort.unpack_from(data, offset)[0]
+        offset += _ushort.size
+        
+        names = []
+        for i in range(count):
+            name, offset = self._unpack_name(data, offset)
+            names.append(name)
+        
+        return names, offset
+    
+    def _unpack_name_set(self, data, offset):
+        names, offset = self._unpack_names(data, offset)
+        return set(names), offset
+    
+    def _flag_mask(self, flags):
+        """The flags as a bitmask of flag_names, None if one isn't there"""
+        mask = 0
+        for f in flags:
+            bit = self._flag_bits.get(f)
+            if bit == None:
+                return None
+            mask |= bit
+        
+        return mask
+    
+    def _pack_vector(self, value, parts):
+        if value == None:
+            parts.append(_byte.pack(NO_VALUE))
+        elif type(value) in (int, long, float):
+            parts.append(_byte.pack(NUMBER))
+            parts.append(_double.pack(value))
+        else:
+            parts.append(_byte.pack(SEQUENCE))
+            parts.append(_byte.pack(len(value)))
+            parts.append(struct.pack("<%dd" % len(value), *value))
+    
+    def _unpack_vector(self, data, offset):
+        kind = _byte.unpack_from(data, offset)[0]
+        offset += _byte.size
+        
+        if kind == NO_VALUE:
+            return None, offset
+        
+        if kind == NUMBER:
+            return _double.unpack_from(data, offset)[0], offset + _double.size
+        
+        length = _byte.unpack_from(data, offset)[0]
+        offset += _byte.size
+        return list(struct.unpack_from("<%dd" % length, data, offset)), offset + 8 * length
+    
+    def _pack_vector32(self, value, parts):
+        if value == None:
+            parts.append(_byte.pack(NO_VALUE))
+        elif type(value) in (int, long, float):
+            parts.append(_byte.pack(NUMBER))
+            parts.append(_float.pack(value))
+        else:
+            parts.append(struct.pack("<BB%df" % len(value), SEQUENCE, len(value), *value))
+    
+    def _unpack_vector32(self, data, offset):
+        kind = _byte.unpack_from(data, offset)[0]
+        offset += _byte.size
+        
+        if kind == NO_VALUE:
+            return None, offset
+        
+        if kind == NUMBER:
+            return _float.unpack_from(data, offset)[0], offset + _float.size
+        
+        length = _byte.unpack_from(data, offset)[0]
+        offset += _byte.size
+        return list(struct.unpack_from("<%df" % length, data, offset)), offset + 4 * length
+    
+    def _pack_order(self, order, parts, pack_vector=None):
+        cmd, pos, target = order
+        
+        self._pack_name(cmd, parts)
+        (pack_vector or self._pack_vector)(pos, parts)
+        
+        if target == None:
+            parts.append(_byte.pack(NO_TARGET))
+        elif type(target) in (str, unicode):
+            parts.append(_byte.pack(NAME_TARGET))
+            self._pack_name(target, parts)
+        else:
+            parts.append(_byte.pack(OID_TARGET))
+            parts.append(_int.pack(target))
+    
+    def _unpack_order(self, data, offset, unpack_vector=None):
+        cmd, offset = self._unpack_name(data, offset)
+        pos, offset = (unpack_vector or self._unpack_vector)(data, offset)
+        
+        kind = _byte.unpack_from(data, offset)[0]
+        offset += _byte.size
+        
+        target = None
+        if kind == OID_TARGET:
+            target, offset = self._unpack_int(data, offset)
+        elif kind == NAME_TARGET:
+            target, offset = self._unpack_name(data, offset)
+        
+        return (cmd, pos, target), offset
+    
+    def _pack_orders(self, orders, parts):
+        parts.append(_ushort.pack(len(orders)))
+        for o in orders:
+            self._pack_order(o, parts)
+    
+    def _unpack_orders(self, data, offset):
+        count = _ushort.unpack_from(data, offset)[0]
+        offset += _ushort.size
+        
+        orders = []
+        for i in range(count):
+            o, offset = self._unpack_order(data, offset)
+            orders.append(o)
+        
+        return orders, offset
+    
+    # The orders an actor holds are only for the AI to look at, their
+    # positions are float32 like the rest of the actor
+    def _pack_actor_order(self, order, parts):
+        self._pack_order(order, parts, self._pack_vector32)
+    
+    def _unpack_actor_order(self, data, offset):
+        return self._unpack_order(data, offset, self._unpack_vector32)
+    
+    def _pack_actor_orders(self, orders, parts):
+        parts.append(_ushort.pack(len(orders)))
+        for o in orders:
+            self._pack_actor_order(o, parts)
+    
+    def _unpack_actor_orders(self, data, offset):
+        count = _ushort.unpack_from(data, offset)[0]
+        offset += _ushort.size
+        
+        orders = []
+        for i in range(count):
+            o, offset = self._unpack_actor_order(data, offset)
+            orders.append(o)
+        
+        return orders, offset
+    
+    def _pack_actor_head(self, fields):
+        """The head fields as an _actor_head, None if they don't fit in one"""
+        type_id = self._name_ids.get(fields['actor_type'])
+        pos, velocity, facing = fields['pos'], fields['velocity'], fields['facing']
+        
+        if type_id == None or len(pos) != 3 or len(velocity) != 3 or len(facing) != 2:
+            return None
+        
+        if not -32768 <= fields['team'] < 32768:
+            return None
+        
+        offence_mask = self._flag_mask(fields['offence_flags'])
+        defence_mask = self._flag_mask(fields['defence_flags'])
+        if offence_mask == None or defence_mask == None:
+            return None
+        
+        return _actor_head.pack(fields['oid'], fields['team'], type_id,
+            pos[0], pos[1], pos[2], velocity[0], velocity[1], velocity[2],
+            facing[0], facing[1], fields['hp'], fields['completion'],
+            offence_mask, defence_mask)
+    
+    def _unpack_actor_head(self, data, offset):
+        values = _actor_head.unpack_from(data, offset)
+        
+        fields = {
+            "oid":              values[0],
+            "team":             values[1],
+            "actor_type":       self.names[values[2]],
+            "pos":              list(values[3:6]),
+            "velocity":         list(values[6:9]),
+            "facing":           list(values[9:11]),
+            "hp":               values[11],
+            "completion":       values[12],
+            "offence_flags":    set(self._flag_sets[values[13]]),
+            "defence_flags":    set(self._flag_sets[values[14]]),
+        }
+        
+        return fields, offset + _actor_head.size
+    
+    def _fixed_struct(self, mask):
+        """(struct, [(field, vector length or 0)]) for the fields in the
+        mask, None if any of them isn't in fixed_formats"""
+        if mask not in self._fixed_structs:
+            keys = [k for i, k in enumerate(actor_fields) if mask & (1 << i)]
+            
+            if [k for k in keys if k not in fixed_formats] != []:
+                self._fixed_structs[mask] = None
+            else:
+                fmt = "<" + "".join([fixed_formats[k] for k in keys])
+                self._fixed_structs[mask] = (struct.Struct(fmt),
+                    [(k, vector_lengths.get(k, 0)) for k in keys])
+        
+        return self._fixed_structs[mask]
+    
+    def _pack_fixed(self, fields, mask):
+        """The fields packed by _fixed_struct, None if they don't fit"""
+        fixed = self._fixed_struct(mask)
+        if fixed == None:
+            return None
+        
+        values = []
+        for k, length in fixed[1]:
+            v = fields[k]
+            
+            if length == 0:
+                values.append(v)
+            elif type(v) in (list, tuple) and len(v) == length:
+                values.extend(v)
+            else:
+                return None
+        
+        return fixed[0].pack(*values)
+    
+    def _unpack_fixed(self, data, offset, mask):
+        s, keys = self._fixed_struct(mask)
+        values = s.unpack_from(data, offset)
+        
+        fields = {}
+        i = 0
+        for k, length in keys:
+            if length == 0:
+                fields[k] = values[i]
+                i += 1
+            else:
+                fields[k] = list(values[i:i+length])
+                i += length
+        
+        return fields, offset + s.size
+    
+    def _pack_fields(self, fields, parts):
+        if len(fields) == len(actor_fields):
+            head = self._pack_actor_head(fields)
+            
+            if head != None:
+                parts.append(_ushort.pack(HEAD))
+                parts.append(head)
+                
+                for k in tail_fields:
+                    self.field_packers[k](fields[k], parts)
+                return
+        
+        mask = 0
+        for k in fields:
+            if k not in _field_bits:
+                raise KeyError("No wire format for actor fields %s" % (
+                    ", ".join([k for k in fields if k not in _field_bits])))
+            mask |= _field_bits[k]
+        
+        fixed = self._pack_fixed(fields, mask)
+        if fixed != None:
+            parts.append(_ushort.pack(mask | FIXED))
+            parts.append(fixed)
+            return
+        
+        parts.append(_ushort.pack(mask))
+        for i, k in enumerate(actor_fields):
+            if mask & (1 << i):
+                self.field_packers[k](fields[k], parts)
+    
+    def _unpack_fields(self, data, offset):
+        mask = _ushort.unpack_from(data, offset)[0]
+        offset += _ushort.size
+        
+        if mask == HEAD:
+            fields, offset = self._unpack_actor_head(data, offset)
+            
+            for k in tail_fields:
+                fields[k], offset = self.field_unpackers[k](data, offset)
+            
+            return fields, offset
+        
+        if mask & FIXED:
+            return self._unpack_fixed(data, offset, mask & ~FIXED)
+        
+        fields = {}
+        for i, k in enumerate(actor_fields):
+            if mask & (1 << i):
+                fields[k], offset = self.field_unpackers[k](data, offset)
+        
+        return fields, offset
+    
+    # Messages, each packer returns the record kind and payload and each
+    # unpacker returns a list of the messages in a record
+    def _pack_order_row(self, message):
+        """The order as an _order_row, None if it doesn't fit in one"""
+        cmd_id = self._name_ids.get(message['cmd'])
+        if cmd_id == None:
+            return None
+        
+        pos = message['pos']
+        x, y, z = 0, 0, 0
+        
+        if pos == None:
+            pos_length = 0
+        elif type(pos) in (int, long, float):
+            pos_length = 1
+            x = pos
+        elif len(pos) == 2:
+            pos_length = 2
+            x, y = pos
+        elif len(pos) == 3:
+            pos_length = 3
+            x, y, z = pos
+        else:
+            return None
+        
+        target = message['target']
+        if target == None:
+            target_kind, target = NO_TARGET, 0
+        elif type(target) in (str, unicode):
+            target_kind, target = NAME_TARGET, self._name_ids.get(target)
+            if target == None:
+                return None
+        else:
+            target_kind = OID_TARGET
+        
+        return _order_row.pack(message['actor'], cmd_id, pos_length, x, y, z, target_kind, target)
+    
+    def _unpack_order_rows(self, data, offset, end):
+        names = self.names
+        messages = []
+        
+        while offset < end:
+            actor, cmd_id, pos_length, x, y, z, target_kind, target = _order_row.unpack_from(data, offset)
+            offset += _order_row.size
+            
+            if pos_length == 0:
+                pos = None
+            elif pos_length == 1:
+                pos = x
+            elif pos_length == 2:
+                pos = [x, y]
+            else:
+                pos = [x, y, z]
+            
+            if target_kind == NO_TARGET:
+                target = None
+            elif target_kind == NAME_TARGET:
+                target = names[target]
+            
+            messages.append({
+                "data_type":    "orders",
+                "cmd":          names[cmd_id],
+                "actor":        actor,
+                "target":       target,
+                "pos":          pos,
+            })
+        
+        return messages
+    
+    def _pack_order_message(self, message):
+        parts = [_int.pack(message['actor'])]
+        self._pack_order((message['cmd'], message['pos'], message['target']), parts)
+        
+        return ORDER, "".join(parts)
+    
+    def _unpack_order_message(self, data, offset, end):
+        actor, offset = self._unpack_int(data, offset)
+        (cmd, pos, target), offset = self._unpack_order(data, offset)
+        
+        return [{
+            "data_type":    "orders",
+            "cmd":          cmd,
+            "actor":        actor,
+            "target":       target,
+            "pos":          pos,
+        }]
+    
+    def _pack_actors_message(self, message):
+        actor_list = message['actor_list']
+        if type(actor_list) == dict:
+            actor_list = [actor_list[k] for k in sorted(actor_list)]
+        
+        parts = [_uint.pack(len(actor_list))]
+        for a in actor_list:
+            self._pack_fields(a.__dict__, parts)
+        
+        return ACTORS, "".join(parts)
+    
+    def _unpack_actors_message(self, data, offset, end):
+        count, offset = _uint.unpack_from(data, offset)[0], offset + _uint.size
+        
+        actor_list = []
+        for i in range(count):
+            fields, offset = self._unpack_fields(data, offset)
+            actor_list.append(actor_lib.make_stripped(fields))
+        
+        return [{"cmd": "actors", "actor_list": actor_list}]
+    
+    def _pack_deltas_message(self, message):
+        parts = [_uint.pack(len(message['created']))]
+        for fields in message['created']:
+            self._pack_fields(fields, parts)
+        
+        removed = message['removed']
+        parts.append(_uint.pack(len(removed)))
+        parts.append(struct.pack("<%di" % len(removed), *removed))
+        
+        parts.append(_uint.pack(len(message['changed'])))
+        for oid, fields in message['changed'].items():
+            parts.append(_int.pack(oid))
+            self._pack_fields(fields, parts)
+        
+        return ACTOR_DELTAS, "".join(parts)
+    
+    def _unpack_deltas_message(self, data, offset, end):
+        count, offset = _uint.unpack_from(data, offset)[0], offset + _uint.size
+        created = []
+        for i in range(count):
+            fields, offset = self._unpack_fields(data, offset)
+            created.append(fields)
+        
+        count, offset = _uint.unpack_from(data, offset)[0], offset + _uint.size
+        removed = list(struct.unpack_from("<%di" % count, data, offset))
+        offset += 4 * count
+        
+        count, offset = _uint.unpack_from(data, offset)[0], offset + _uint.size
+        changed = {}
+        for i in range(count):
+            oid, offset = self._unpack_int(data, offset)
+            changed[oid], offset = self._unpack_fields(data, offset)
+        
+        return [{
+            "cmd":      "actor_deltas",
+            "created":  created,
+            "removed":  removed,
+            "changed":  changed,
+        }]
+    
+    def _unpack_pickled(self, data, offset, end):
+        return [pickle.loads(data[offset:end])]
+    
+    def pack_message(self, message):
+        """A single record, orders are told apart from the sim's messages
+        by their data_type"""
+        kind = message.get("data_type", message.get("cmd"))
+        
+        if kind in self.message_packers:
+            kind, payload = self.message_packers[kind](message)
+        else:
+            kind, payload = PICKLED, pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        
+        return _record.pack(kind, len(payload)) + payload
+    
+    def pack_frame(self, messages):
+        """Orders that fit in a row are packed into the same record as
+        the orders either side of them"""
+        records = []
+        rows = []
+        
+        for m in messages:
+            row = None
+            if m.get("data_type") == "orders":
+                row = self._pack_order_row(m)
+            
+            if row != None:
+                rows.append(row)
+                continue
+            
+            if rows != []:
+                records.append(_record.pack(ORDER_ROWS, len(rows) * _order_row.size))
+                records.extend(rows)
+                rows = []
+            
+            records.append(self.pack_message(m))
+        
+        if rows != []:
+            records.append(_record.pack(ORDER_ROWS, len(rows) * _order_row.size))
+            records.extend(rows)
+        
+        return "".join(records)
+    
+    def unpack_frame(self, frame):
+        """Returns the messages in the frame as dicts, in the order they
+        were packed"""
+        messages = []
+        offset = 0
+        
+        while offset < len(frame):
+            kind, length = _record.unpack_from(frame, offset)
+            offset += _record.size
+            
+            if kind not in self.record_unpackers:
+                raise KeyError("No wire record kind of %d" % kind)
+            
+            messages.extend(self.record_unpackers[kind](frame, offset, offset + length))
+            offset += length
+        
+        return messages
+
+def is_frame(data):
+    """Frames and dicts can share a queue"""
+    return type(data) == str
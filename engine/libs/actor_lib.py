@@ -16,28 +16,51 @@ attribs = (
 # self.rally_orders = []
 # self.micro_orders = []
 
-def strip_actor(the_actor):
-    sa = StrippedActor()
+def _strip_order(order):
+    """Orders can contain a target and we don't want to pass around a
+    reference to a whole actor by mistake"""
+    cmd, pos, target = order
     
+    if target != None:
+        if type(target) not in (int, str, unicode):
+            target = target.oid
+    
+    return cmd, pos, target
+
+def stripped_fields(the_actor):
+    """The fields of the actor that the AIs get to see as a dict, nothing
+    in it is shared with the actor"""
+    fields = {}
     for a in attribs:
-        setattr(sa, a, getattr(the_actor, a))
+        fields[a] = getattr(the_actor, a)
     
-    # Orders can contain a target and we don't want to pass around a
-    # reference to a whole actor by mistake
-    def _strip_order(order):
-        cmd, pos, target = order
-        
-        if target != None:
-            if type(target) not in (int, str, unicode):
-                target = target.oid
-        
-        return cmd, pos, target
+    # Vectors may be Vec3s or shared with the actor, either way the AI
+    # should get a list of its own
+    fields['pos'] = list(the_actor.pos)
+    fields['velocity'] = list(the_actor.velocity)
+    fields['facing'] = list(the_actor.facing)
+    
+    fields['offence_flags'] = set(the_actor.offence_flags)
+    fields['defence_flags'] = set(the_actor.defence_flags)
+    fields['build_queue'] = list(the_actor.build_queue)
     
-    sa.current_order = _strip_order(the_actor.current_order)
-    sa.order_queue = [_strip_order(o) for o in the_actor.order_queue]
+    fields['current_order'] = _strip_order(the_actor.current_order)
+    fields['order_queue'] = [_strip_order(o) for o in the_actor.order_queue]
     
+    return fields
+
+def make_stripped(fields):
+    sa = StrippedActor()
+    sa.__dict__.update(fields)
     return sa
 
+def strip_actor(the_actor):
+    return make_stripped(stripped_fields(the_actor))
+
+# How far an actor can see when its template doesn't say, it can
+# always see at least as far as it can shoot
+default_sight_range = 400
+
 def build_template_cache(template, engine):
     """Takes the template of the actor and creates some cache data"""
     
@@ -101,6 +124,9 @@ def build_template_cache(template, engine):
     template['optimum_heal_range']      = minmax_heal_range
     template['max_heal_range']          = max_heal_range
     
+    template['sight_range'] = template.get('sight_range',
+        max(default_sight_range, max_attack_range, max_heal_range))
+    
     # Construction/Repair
     template['construction_cost']       = template.get('construction_cost', {})
     template['repair_cost']             = template.get('repair_cost', {})
@@ -119,9 +145,14 @@ def build_template_cache(template, engine):
     for k, v in template['repair_cost'].items():
         template['_part_repair_cost'][k] = v/repair_cycles
     
+    # If the engine doesn't know the image (e.g. headless without a size
+    # cache) then the size in the template is used
     if "image" in template:
-        temp_img = engine.images[template['image']]
-        template['size'] = temp_img.get_rect().size
+        size = engine.get_image_size(template['image'])
+        if size != None:
+            template['size'] = size
+        else:
+            template['size'] = template.get('size', [0,0])
     else:
         template['size'] = [0,0]
 
@@ -1,4 +1,4 @@
-from engine.libs import sim_lib
+from engine.libs import sim_lib, actor_lib
 
 def set_speed(sim, cycles_per_second):
     sim.cycles_per_second = cycles_per_second
@@ -22,16 +22,19 @@ def send_static_data(screen, queue):
     # Send build lists
     queue.put({"cmd":"build_lists", "build_lists":dict(screen.build_lists)})
 
-def place_actor(actor_list, building_rect, distance=100, boundries=None):
+def place_actor(actor_list, building_rect, distance=100, boundries=None, spatial_index=None):
     if type(distance) == list:
         for d in distance:
-            r = place_actor(actor_list, building_rect, d, boundries)
+            r = place_actor(actor_list, building_rect, d, boundries, spatial_index)
             if r != None:
                 return r
         return None
     
     """Tests several positions for the building by nudging it around. This is
-    because an AI may not always have the most recent positions for actors."""
+    because an AI may not always have the most recent positions for actors.
+    
+    If a spatial index is passed then only the actors near each nudged
+    position are tested rather than all of actor_list."""
     
     ox, oy = building_rect.left, building_rect.right
     
@@ -52,7 +55,11 @@ def place_actor(actor_list, building_rect, distance=100, boundries=None):
         building_rect.left = ox + x * distance
         building_rect.top = oy + y * distance
         
-        if not sim_lib.test_possible_collision(actor_list, building_rect, True):
+        candidates = actor_list
+        if spatial_index != None:
+            candidates = spatial_index.query_rect(building_rect)
+        
+        if not sim_lib.test_possible_collision(candidates, building_rect, True):
             
             if boundries != None:
                 if 0 < building_rect.left and building_rect.right < boundries[0]:
@@ -63,3 +70,62 @@ def place_actor(actor_list, building_rect, distance=100, boundries=None):
     
     return None
 
+def actor_deltas(previous, actors, stripped=None):
+    """
+    Compares the actors with the fields (see actor_lib.stripped_fields)
+    last sent to the AIs. Returns (state, created, removed, changed):
+    
+    state       oid -> fields for every actor, the next call's previous
+    created     fields of the actors not in previous
+    removed     oids of the actors no longer present
+    changed     oid -> {field: value} holding only the fields that changed
+    
+    stripped is an optional oid -> fields cache, when comparing for
+    several AIs it saves stripping the same actor more than once.
+    """
+    state = {}
+    created = []
+    changed = {}
+    
+    for a in actors:
+        if stripped == None:
+            fields = actor_lib.stripped_fields(a)
+        elif a.oid in stripped:
+            fields = stripped[a.oid]
+        else:
+            fields = actor_lib.stripped_fields(a)
+            stripped[a.oid] = fields
+        
+        state[a.oid] = fields
+        
+        if a.oid not in previous:
+            created.append(fields)
+            continue
+        
+        old_fields = previous[a.oid]
+        diff = {}
+        for k, v in fields.items():
+            if old_fields.get(k) != v:
+                diff[k] = v
+        
+        if diff != {}:
+            changed[a.oid] = diff
+    
+    removed = [oid for oid in previous.keys() if oid not in state]
+    
+    return state, created, removed, changed
+
+def apply_deltas(actors, created, removed, changed):
+    """Applies the output of actor_deltas to a dict of oid -> StrippedActor"""
+    for oid in removed:
+        if oid in actors:
+            del(actors[oid])
+    
+    for fields in created:
+        actors[fields['oid']] = actor_lib.make_stripped(fields)
+    
+    for oid, fields in changed.items():
+        if oid in actors:
+            actors[oid].__dict__.update(fields)
+    
+    return actors
@@ -3,6 +3,20 @@ import pygame
 import math
 import vectors
 
+# NumPy is optional, without it the overlap kernels fall back to pure Python
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Below this many rects the overhead of building arrays outweighs the
+# gain from vectorising
+vectorise_threshold = 32
+
+# How many rows of the overlap mask are built at once, this keeps the
+# memory use down for very dense clusters
+_overlap_chunk_size = 512
+
 def _convert(r):
     # Takes a pos, pos, size, size rect and returns a pos, pos, pos, pos rect
     return (r[0], r[1], r[2] + r[0], r[3] + r[1])
@@ -41,6 +55,90 @@ def rect_collision(r1, r2, convert=False):
     
     return True
 
+# 2D Function
+def overlapping_pairs(bounds, cell=None):
+    """
+    bounds is a list of (left, top, right, bottom) rects, returns a list
+    of (i, j) index pairs (where i < j) for every pair of rects that
+    overlap. Uses the same rules as rect_collision and the pairs are
+    ordered by i and then j.
+    
+    cell is an optional (cell_size, x, y) grid cell, when given only pairs
+    where the top left of the overlapping area falls in that cell are
+    returned. This stops a spatial hash reporting a pair once for every
+    cell the two rects share.
+    """
+    if numpy != None and len(bounds) >= vectorise_threshold:
+        return _overlapping_pairs_numpy(bounds, cell)
+    return _overlapping_pairs_python(bounds, cell)
+
+def _overlapping_pairs_python(bounds, cell=None):
+    pairs = []
+    for i, (left1, top1, right1, bottom1) in enumerate(bounds):
+        for j in range(i+1, len(bounds)):
+            left2, top2, right2, bottom2 = bounds[j]
+            
+            if right1 < left2: continue
+            if left1 > right2: continue
+            if bottom1 < top2: continue
+            if top1 > bottom2: continue
+            
+            if cell != None:
+                if int(max(left1, left2) // cell[0]) != cell[1]: continue
+                if int(max(top1, top2) // cell[0]) != cell[2]: continue
+            
+            pairs.append((i, j))
+    
+    return pairs
+
+def _overlapping_pairs_numpy(bounds, cell=None):
+    b = numpy.array(bounds, dtype=float)
+    left, top, right, bottom = b[:,0], b[:,1], b[:,2], b[:,3]
+    
+    pairs = []
+    for start in range(0, len(bounds), _overlap_chunk_size):
+        end = min(start + _overlap_chunk_size, len(bounds))
+        
+        # Compare this chunk against everything after its first row
+        mask = (right[start:end, None] >= left[None, start:])
+        mask &= (left[start:end, None] <= right[None, start:])
+        mask &= (bottom[start:end, None] >= top[None, start:])
+        mask &= (top[start:end, None] <= bottom[None, start:])
+        
+        # Only keep the upper triangle, i < j
+        rows, cols = numpy.nonzero(numpy.triu(mask, 1))
+        rows += start
+        cols += start
+        
+        if cell != None:
+            keep = numpy.floor(numpy.maximum(left[rows], left[cols]) / cell[0]) == cell[1]
+            keep &= numpy.floor(numpy.maximum(top[rows], top[cols]) / cell[0]) == cell[2]
+            rows, cols = rows[keep], cols[keep]
+        
+        pairs.extend(zip(rows.tolist(), cols.tolist()))
+    
+    return pairs
+
+# 2D Function
+def overlaps_any(bounds, rect):
+    """
+    Returns True if rect (left, top, right, bottom) overlaps any of the
+    rects in bounds
+    """
+    if numpy != None and len(bounds) >= vectorise_threshold:
+        b = numpy.array(bounds, dtype=float)
+        left, top, right, bottom = rect
+        
+        return bool(numpy.any(
+            (b[:,2] >= left) & (b[:,0] <= right) & (b[:,3] >= top) & (b[:,1] <= bottom)
+        ))
+    
+    for r in bounds:
+        if rect_collision(r, rect):
+            return True
+    
+    return False
+
 # 2D Function
 def inside_angles(a1, a2):
     """Takes two pairs and calculates the inside angles of A and B.
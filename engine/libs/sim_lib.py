@@ -6,7 +6,17 @@ def set_speed(sim, cycles_per_second):
     sim.cycles_per_second = cycles_per_second
     sim._cycle_delay = 1 / cycles_per_second
 
-def get_collisions(actors):
+def _bounds(r):
+    """Turns an actor rect (pygame.Rect or pos, pos, size, size sequence)
+    into a left, top, right, bottom tuple"""
+    if type(r) == tuple or type(r) == list:
+        return (r[0], r[1], r[2] + r[0], r[3] + r[1])
+    
+    return (r.left, r.top, r.right, r.bottom)
+
+def brute_force_collisions(actors):
+    """Tests every actor against every other actor, kept as a reference
+    for the faster collision engines"""
     collisions = []
     collided = set()
     for i, a in enumerate(actors):
@@ -20,15 +30,146 @@ def get_collisions(actors):
     
     return collisions
 
+def get_collisions(actors, cell_size=100):
+    """
+    Uses a uniform grid (spatial hash) as a broadphase, each actor is
+    bucketed into every cell its rect touches and only actors sharing
+    a cell are tested against each other.
+    
+    The result is identical to brute_force_collisions, pairs are ordered
+    by their index in actors.
+    """
+    bounds = []
+    single_cell = []
+    cells = {}
+    for i, a in enumerate(actors):
+        left, top, right, bottom = _bounds(a.rect)
+        bounds.append((left, top, right, bottom))
+        
+        x1, x2 = int(left // cell_size), int(right // cell_size)
+        y1, y2 = int(top // cell_size), int(bottom // cell_size)
+        single_cell.append(x1 == x2 and y1 == y2)
+        
+        for x in range(x1, x2 + 1):
+            for y in range(y1, y2 + 1):
+                if (x, y) in cells:
+                    cells[(x, y)].append(i)
+                else:
+                    cells[(x, y)] = [i]
+    
+    pairs = []
+    for (cx, cy), members in cells.items():
+        if len(members) < 2: continue
+        
+        # Actors spanning several cells can share more than one, the pair
+        # is then only kept by the cell holding the top left corner of the
+        # area where they overlap
+        cell = None
+        for i in members:
+            if not single_cell[i]:
+                cell = (cell_size, cx, cy)
+                break
+        
+        # Members were added in index order so the pairs come back sorted
+        for p, q in geometry.overlapping_pairs([bounds[i] for i in members], cell):
+            pairs.append((members[p], members[q]))
+    
+    # Each cell gave us a sorted run, sort merges the runs
+    pairs.sort()
+    return [(actors[i], actors[j]) for i, j in pairs]
+
+class SweepAndPrune (object):
+    """
+    A persistent broadphase that keeps actors sorted along the x-axis
+    between collision checks. Most actors barely move between checks so
+    an insertion sort only has a handful of swaps to make.
+    
+    Pairs overlapping on the x-axis are then tested on the y-axis, the
+    result is identical to brute_force_collisions.
+    """
+    def __init__(self):
+        super(SweepAndPrune, self).__init__()
+        
+        # Each entry is [left, top, right, bottom, actor]
+        self.entries = []
+    
+    def _sync(self, actors):
+        """Drops actors no longer present, adds new ones to the end of the
+        list and refreshes the bounds of everything else"""
+        present = {}
+        for a in actors:
+            present[id(a)] = a
+        
+        entries = []
+        for e in self.entries:
+            a = e[4]
+            if id(a) not in present: continue
+            del(present[id(a)])
+            
+            e[0], e[1], e[2], e[3] = _bounds(a.rect)
+            entries.append(e)
+        
+        # Anything left over is new
+        for a in actors:
+            if id(a) in present:
+                left, top, right, bottom = _bounds(a.rect)
+                entries.append([left, top, right, bottom, a])
+        
+        self.entries = entries
+    
+    def _sort(self):
+        """Insertion sort on the left edge, near linear when the list
+        is already close to sorted"""
+        entries = self.entries
+        for i in range(1, len(entries)):
+            e = entries[i]
+            left = e[0]
+            j = i - 1
+            while j >= 0 and entries[j][0] > left:
+                entries[j+1] = entries[j]
+                j -= 1
+            entries[j+1] = e
+    
+    def get_collisions(self, actors):
+        self._sync(actors)
+        self._sort()
+        
+        index = {}
+        for i, a in enumerate(actors):
+            index[id(a)] = i
+        
+        pairs = []
+        active = []
+        for e in self.entries:
+            left, top, right, bottom = e[0], e[1], e[2], e[3]
+            
+            # Anything that ends before we start can no longer overlap
+            # with this or any later entry
+            active = [o for o in active if o[2] >= left]
+            
+            for o in active:
+                if bottom < o[1]: continue
+                if top > o[3]: continue
+                
+                i, j = index[id(o[4])], index[id(e[4])]
+                if i < j:
+                    pairs.append((i, j))
+                else:
+                    pairs.append((j, i))
+            
+            active.append(e)
+        
+        pairs.sort()
+        return [(actors[i], actors[j]) for i, j in pairs]
+
 def test_possible_collision(actors, new_rect, convert=True):
     """
     Used to test if a potential actor will collide with anything else
     returns True if there will be a collision
     """
     
-    for a in actors:
-        if geometry.rect_collision(a.rect, new_rect, convert):
-            return True
+    if convert:
+        return geometry.overlaps_any([_bounds(a.rect) for a in actors], _bounds(new_rect))
     
-    return False
+    return geometry.overlaps_any([tuple(a.rect) for a in actors], tuple(new_rect))
 
@@ -0,0 +1,226 @@
+from __future__ import division
+
+"""
+A uniform grid used to answer "who is near X" without scanning every
+actor. Actors are bucketed by the area they cover (their position and
+the size of their rect) and the grid is updated incrementally as they
+move so that it can be shared by everything in the sim.
+
+Each team has a grid of its own, this lets a query skip a team
+entirely (e.g. looking only for enemies) without having to filter
+through the actors of that team.
+"""
+
+from engine.libs import vectors
+
+class SpatialIndex (object):
+    def __init__(self, cell_size=100):
+        super(SpatialIndex, self).__init__()
+        
+        self.cell_size = cell_size
+        
+        # team -> (x, y) -> {oid: actor}
+        self.cells = {}
+        
+        # oid -> (team, x1, y1, x2, y2), the team grid and range of cells
+        # the actor is in
+        self.actor_cells = {}
+        self.actors = {}
+    
+    def __len__(self):
+        return len(self.actors)
+    
+    def _cell_range(self, left, top, right, bottom):
+        cs = self.cell_size
+        return (int(left // cs), int(top // cs), int(right // cs), int(bottom // cs))
+    
+    def _actor_range(self, a):
+        half_width = a.rect.width/2
+        half_height = a.rect.height/2
+        
+        return self._cell_range(
+            a.pos[0] - half_width, a.pos[1] - half_height,
+            a.pos[0] + half_width, a.pos[1] + half_height,
+        )
+    
+    def _insert(self, a, cell_range):
+        if a.team not in self.cells:
+            self.cells[a.team] = {}
+        cells = self.cells[a.team]
+        
+        x1, y1, x2, y2 = cell_range
+        for x in range(x1, x2 + 1):
+            for y in range(y1, y2 + 1):
+                if (x, y) in cells:
+                    cells[(x, y)][a.oid] = a
+                else:
+                    cells[(x, y)] = {a.oid: a}
+        
+        self.actor_cells[a.oid] = (a.team,) + cell_range
+    
+    def _remove(self, a):
+        team, x1, y1, x2, y2 = self.actor_cells[a.oid]
+        cells = self.cells[team]
+        
+        for x in range(x1, x2 + 1):
+            for y in range(y1, y2 + 1):
+                cell = cells[(x, y)]
+                del(cell[a.oid])
+                
+                if len(cell) == 0:
+                    del(cells[(x, y)])
+        
+        if len(cells) == 0:
+            del(self.cells[team])
+        
+        del(self.actor_cells[a.oid])
+    
+    def add(self, a):
+        if a.oid in self.actors:
+            raise KeyError("Actor %s is already in the spatial index" % a.oid)
+        
+        self.actors[a.oid] = a
+        self._insert(a, self._actor_range(a))
+    
+    def remove(self, a):
+        if a.oid not in self.actors:
+            return
+        
+        self._remove(a)
+        del(self.actors[a.oid])
+    
+    def update(self, a):
+        """Called after an actor has moved, this is cheap when it has
+        stayed within the same cells"""
+        cell_range = self._actor_range(a)
+        
+        if self.actor_cells[a.oid] == (a.team,) + cell_range:
+            return
+        
+        self._remove(a)
+        self._insert(a, cell_range)
+    
+    def rebuild(self, cell_size=None):
+        if cell_size != None:
+            self.cell_size = cell_size
+        
+        self.cells = {}
+        self.actor_cells = {}
+        for a in self.actors.values():
+            self._insert(a, self._actor_range(a))
+    
+    def _candidates(self, left, top, right, bottom, exclude_team=None):
+        x1, y1, x2, y2 = self._cell_range(left, top, right, bottom)
+        
+        found = {}
+        for team, cells in self.cells.items():
+            if exclude_team != None and team == exclude_team: continue
+            
+            for x in range(x1, x2 + 1):
+                for y in range(y1, y2 + 1):
+                    if (x, y) in cells:
+                        found.update(cells[(x, y)])
+        
+        return found
+    
+    def _sorted(self, found):
+        """Results come back in oid order, the same order as sim.actors"""
+        return [found[k] for k in sorted(found)]
+    
+    def query_rect(self, rect, exclude_team=None):
+        """
+        Returns all actors overlapping the rect, rect can be a pygame.Rect
+        or a (left, top, right, bottom) sequence
+        """
+        if type(rect) == tuple or type(rect) == list:
+            left, top, right, bottom = rect
+        else:
+            left, top, right, bottom = rect.left, rect.top, rect.right, rect.bottom
+        
+        found = self._candidates(left, top, right, bottom, exclude_team)
+        for oid, a in list(found.items()):
+            half_width = a.rect.width/2
+            half_height = a.rect.height/2
+            
+            if a.pos[0] + half_width < left or a.pos[0] - half_width > right:
+                del(found[oid])
+            elif a.pos[1] + half_height < top or a.pos[1] - half_height > bottom:
+                del(found[oid])
+        
+        return self._sorted(found)
+    
+    def query_point(self, point, exclude_team=None):
+        """Returns all actors containing the point (see actor_lib.contains_point)"""
+        return self.query_rect((point[0], point[1], point[0], point[1]), exclude_team)
+    
+    def query_radius(self, pos, radius, exclude_team=None, by_distance=False):
+        """
+        Returns all actors whose position is within radius of pos. When
+        by_distance is set the nearest actor comes first, ties are
+        broken by oid.
+        """
+        found = self._candidates(pos[0] - radius, pos[1] - radius, pos[0] + radius, pos[1] + radius, exclude_team)
+        
+        # Squared distances sort the same way and save the square root
+        radius_squared = radius * radius
+        
+        if by_distance:
+            in_range = []
+            for oid, a in found.items():
+                dist = vectors.distance_squared(pos, a.pos)
+                if dist <= radius_squared:
+                    in_range.append((dist, oid, a))
+            
+            in_range.sort()
+            return [a for dist, oid, a in in_range]
+        
+        for oid, a in list(found.items()):
+            if vectors.distance_squared(pos, a.pos) > radius_squared:
+                del(found[oid])
+        
+        return self._sorted(found)
+    
+    def query_sight(self, viewers, exclude_team=None):
+        """
+        Returns all actors with any part of them within the sight_range
+        of at least one of the viewers. Cells lying entirely within a
+        viewer's sight are taken whole and actors that have already
+        been seen are not checked again, so a crowd of viewers looking
+        at the same area costs little more than one.
+        """
+        cs = self.cell_size
+        found = {}
+        
+        for v in viewers:
+            px, py = v.pos[0], v.pos[1]
+            radius = v.sight_range
+            radius_squared = radius * radius
+            
+            x1, y1, x2, y2 = self._cell_range(px - radius, py - radius, px + radius, py + radius)
+            
+            for team, cells in self.cells.items():
+                if exclude_team != None and team == exclude_team: continue
+                
+                for x in range(x1, x2 + 1):
+                    for y in range(y1, y2 + 1):
+                        cell = cells.get((x, y))
+                        if cell == None: continue
+                        
+                        # The corner of the cell furthest from the viewer
+                        dx = max(abs(x * cs - px), abs((x + 1) * cs - px))
+                        dy = max(abs(y * cs - py), abs((y + 1) * cs - py))
+                        
+                        if dx * dx + dy * dy <= radius_squared:
+                            found.update(cell)
+                            continue
+                        
+                        for oid, a in cell.items():
+                            if oid in found: continue
+                            
+                            # Distance to the nearest point of the actor
+                            dx = max(abs(a.pos[0] - px) - a.rect.width/2, 0)
+                            dy = max(abs(a.pos[1] - py) - a.rect.height/2, 0)
+                            if dx * dx + dy * dy <= radius_squared:
+                                found[oid] = a
+        
+        return self._sorted(found)
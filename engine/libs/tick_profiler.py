@@ -0,0 +1,126 @@
+from __future__ import division
+
+"""
+TickProfiler times each phase of a logic cycle (and the redraw) and
+keeps the last few hundred timings of each so we can see not just how
+long a tick takes on average but how bad the slow ones are.
+    
+    profiler.start()
+    do_ai_stuff()
+    profiler.mark("ai")
+    move_actors()
+    profiler.mark("actors")
+    profiler.end_tick()
+
+Times are recorded in seconds, the summary and dumps are in milliseconds.
+"""
+
+import time
+import json
+from collections import deque
+
+percentiles = (50, 95, 99)
+
+def percentile(values, p):
+    """Nearest rank percentile of values, values must be sorted"""
+    if len(values) == 0:
+        return 0
+    
+    rank = int(round(p/100 * (len(values) - 1)))
+    return values[rank]
+
+class TickProfiler (object):
+    def __init__(self, window=300, summary_interval=30):
+        super(TickProfiler, self).__init__()
+        
+        self.enabled = False
+        
+        # How many samples of each phase are kept and how many ticks
+        # go by between refreshing the summary
+        self.window = window
+        self.summary_interval = summary_interval
+        
+        # Phases are kept in the order they were first seen
+        self.phases = []
+        self.samples = {}
+        
+        # "phase_p95" -> ms, this is what the overlay reads
+        self.summary = {}
+        
+        self.ticks = 0
+        self._last_mark = 0
+    
+    def add_phase(self, phase):
+        if phase in self.samples: return
+        
+        self.phases.append(phase)
+        self.samples[phase] = deque(maxlen=self.window)
+        
+        for p in percentiles:
+            self.summary["%s_p%d" % (phase, p)] = 0
+    
+    def record(self, phase, duration):
+        if phase not in self.samples:
+            self.add_phase(phase)
+        
+        self.samples[phase].append(duration)
+    
+    def start(self):
+        if not self.enabled: return
+        self._last_mark = time.time()
+    
+    def mark(self, phase):
+        """Records the time since the last mark (or start) against phase"""
+        if not self.enabled: return
+        
+        now = time.time()
+        self.record(phase, now - self._last_mark)
+        self._last_mark = now
+    
+    def end_tick(self):
+        if not self.enabled: return
+        
+        self.ticks += 1
+        if self.ticks % self.summary_interval == 0:
+            self.update_summary()
+    
+    def stats(self):
+        """Returns phase -> {"p50", "p95", "p99", "mean", "max", "samples"}
+        with the times in milliseconds"""
+        result = {}
+        for phase in self.phases:
+            values = sorted(self.samples[phase])
+            if len(values) == 0: continue
+            
+            phase_stats = {
+                "mean":     sum(values) / len(values) * 1000,
+                "max":      values[-1] * 1000,
+                "samples":  len(values),
+            }
+            
+            for p in percentiles:
+                phase_stats["p%d" % p] = percentile(values, p) * 1000
+            
+            result[phase] = phase_stats
+        
+        return result
+    
+    def update_summary(self):
+        for phase, phase_stats in self.stats().items():
+            for p in percentiles:
+                self.summary["%s_p%d" % (phase, p)] = phase_stats["p%d" % p]
+    
+    def dump(self, file_path=None):
+        """Returns the stats as JSON, writing them to file_path if given"""
+        data = json.dumps({
+            "ticks":    self.ticks,
+            "window":   self.window,
+            "phases":   self.phases,
+            "stats":    self.stats(),
+        }, indent=4, sort_keys=True, separators=(",", ": "))
+        
+        if file_path != None:
+            with open(file_path, "w") as f:
+                f.write(data)
+        
+        return data
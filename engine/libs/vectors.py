@@ -1,6 +1,83 @@
 from __future__ import division
 import math
 
+class Vec3 (object):
+    """
+    A 3D vector that can be used anywhere an [x, y, z] list can. The
+    functions in this module still return lists, the gain comes from
+    iadd and iscale which change the vector in place rather than
+    building a new list every time something moves.
+    """
+    __slots__ = ("x", "y", "z")
+    
+    # Mutable so it can't be used as a dict key
+    __hash__ = None
+    
+    def __init__(self, x=0, y=0, z=0):
+        self.x = x
+        self.y = y
+        self.z = z
+    
+    def __len__(self):
+        return 3
+    
+    def __getitem__(self, i):
+        if i == 0 or i == -3: return self.x
+        if i == 1 or i == -2: return self.y
+        if i == 2 or i == -1: return self.z
+        
+        if type(i) == slice:
+            return self.tolist()[i]
+        
+        raise IndexError("Vec3 index out of range (%s)" % i)
+    
+    def __setitem__(self, i, v):
+        if i == 0 or i == -3: self.x = v
+        elif i == 1 or i == -2: self.y = v
+        elif i == 2 or i == -1: self.z = v
+        else:
+            raise IndexError("Vec3 index out of range (%s)" % i)
+    
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+    
+    def __eq__(self, other):
+        try:
+            if len(other) != 3: return False
+            return self.x == other[0] and self.y == other[1] and self.z == other[2]
+        except TypeError:
+            return False
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def __repr__(self):
+        return "Vec3(%s, %s, %s)" % (self.x, self.y, self.z)
+    
+    # Slots and no __dict__ mean we need to tell pickle how to rebuild it
+    def __reduce__(self):
+        return (Vec3, (self.x, self.y, self.z))
+    
+    def iadd(self, other):
+        """Adds another vector to this one in place"""
+        self.x += other[0]
+        self.y += other[1]
+        self.z += other[2]
+        return self
+    
+    def iscale(self, amount):
+        """Multiplies this vector by a number in place"""
+        self.x *= amount
+        self.y *= amount
+        self.z *= amount
+        return self
+    
+    def tolist(self):
+        return [self.x, self.y, self.z]
+    
+    def copy(self):
+        return Vec3(self.x, self.y, self.z)
+
 # Combines two lists
 def add_vectors(vec1, vec2):
     if type(vec2) == float or type(vec2) == int:
@@ -78,6 +155,34 @@ def angle_diff(angle1, angle2=0):
     else:
         return -left
 
+# Angle -> (sin, cos), angles not in the table are worked out as needed
+_trig_table = {}
+
+def build_trig_table(steps):
+    """Adds steps evenly spaced angles (in degrees) to the trig table, the
+    values are those math would give so results don't change"""
+    for i in range(steps):
+        a = i * 360 / steps
+        
+        # Whole angles are stored as ints, 90 and 90.0 hash the same
+        # but this keeps the table tidy
+        if a == int(a):
+            a = int(a)
+        
+        r = math.radians(a)
+        _trig_table[a] = (math.sin(r), math.cos(r))
+
+def sin_cos(angle):
+    """Returns the sin and cos of an angle in degrees"""
+    if angle in _trig_table:
+        return _trig_table[angle]
+    
+    r = math.radians(angle)
+    return math.sin(r), math.cos(r)
+
+# Facings are normally whole degrees
+build_trig_table(360)
+
 def move_to_vector(angle, distance):
     """
     distance is the 3D line going from origin at angles a1 and a2 (contained as the variable angle)
@@ -106,10 +211,30 @@ def _move_to_vector_2d(angle, distance):
     if angle == 180:    return 0, distance
     if angle == 270:    return -distance, 0
     
-    opp = math.sin(math.radians(angle)) * distance
-    adj = math.cos(math.radians(angle)) * distance
+    s, c = sin_cos(angle)
     
-    return [opp, -adj]
+    return [s * distance, -c * distance]
+
+def move_towards(pos1, pos2, distance):
+    """
+    The same as move_to_vector(angle(pos1, pos2), distance) but works on
+    the vector between them directly rather than going to degrees and back.
+    Like angle() the Z part is always upwards.
+    """
+    x = pos2[0] - pos1[0]
+    y = pos2[1] - pos1[1]
+    z = abs(pos1[2] - pos2[2])
+    
+    hyp = math.sqrt(x*x + y*y)
+    
+    # angle() gives [0, 0] when there's no horrizontal distance
+    if hyp == 0:
+        return [0, -distance, 0]
+    
+    total = math.sqrt(hyp*hyp + z*z)
+    h = abs(distance * hyp / total)
+    
+    return [x / hyp * h, y / hyp * h, distance * z / total]
 
 def vector_to_move(vector):
     return [angle([0,0,0], vector), total_velocity(vector)]
@@ -175,6 +300,42 @@ def distance(pos1, pos2=None):
     
     return a
 
+def distance_squared(pos1, pos2=None):
+    """The square of distance(), comparing this against a squared range
+    saves on the square root"""
+    if pos2 == None:
+        pos2 = [0 for i in pos1]
+    
+    x = pos1[0] - pos2[0]
+    y = pos1[1] - pos2[1]
+    
+    if len(pos1) == 3:
+        z = pos1[2] - pos2[2]
+        return x*x + y*y + z*z
+    
+    return x*x + y*y
+
+def compare_distance(pos1, pos2, dist):
+    """
+    Compares the distance between pos1 and pos2 to dist without working
+    out the distance itself. Like cmp() it returns a negative number if
+    they are closer than dist, 0 if exactly dist apart and a positive
+    number if further away.
+    """
+    # Nothing can be a negative distance away
+    if dist < 0:
+        return 1
+    
+    # distance_squared inlined, this gets called a lot
+    x = pos1[0] - pos2[0]
+    y = pos1[1] - pos2[1]
+    
+    if len(pos1) == 3:
+        z = pos1[2] - pos2[2]
+        return cmp(x*x + y*y + z*z, dist*dist)
+    
+    return cmp(x*x + y*y, dist*dist)
+
 def compare_vectors(vel1, vel2):
     """
     Returns a the difference between the two angles, if the two vectors collide then was it head on or side to side?
@@ -188,11 +349,19 @@ def get_midpoint(pos1, pos2, distance):
     """
     Given pos1 and pos2 it determines where pos1 will end up if it travels "distance" towards pos2.
     """
-    a, za = angle(pos1, pos2)
+    dx = pos2[0] - pos1[0]
+    dy = pos2[1] - pos1[1]
+    dz = abs(pos1[2] - pos2[2])
+    
+    hyp = math.sqrt(dx*dx + dy*dy)
+    
+    # Same as angle() giving us [0, 0]
+    if hyp == 0:
+        return [pos1[0], pos1[1] - distance, pos1[2]]
     
-    x = pos1[0] + (math.sin(math.radians(a)) * distance)
-    y = pos1[1] - (math.cos(math.radians(a)) * distance)
-    z = pos1[2] + (math.sin(math.radians(za)) * distance)
+    x = pos1[0] + (dx / hyp * distance)
+    y = pos1[1] + (dy / hyp * distance)
+    z = pos1[2] + (dz / math.sqrt(hyp*hyp + dz*dz) * distance)
     
     return [x,y,z]
     
@@ -1,5 +1,3 @@
-import random
-
 from engine.logic import effects, bullets, teams
 from engine.libs import vectors, actor_lib, math_lib
 
@@ -164,11 +162,11 @@ class WeaponAbility (Ability):
         if not super(WeaponAbility, self).can_use(target, **kwargs):
             return False
         
-        if vectors.distance(self.actor.pos, target.pos) > self.max_range:
+        if vectors.compare_distance(self.actor.pos, target.pos, self.max_range) > 0:
             return False
         
         if self.min_range > 0:
-            if vectors.distance(self.actor.pos, target.pos) < self.min_range:
+            if vectors.compare_distance(self.actor.pos, target.pos, self.min_range) < 0:
                 return False
         
         if self.actor.team == target.team:
@@ -188,11 +186,11 @@ class ConstructionAbility (Ability):
         if not super(ConstructionAbility, self).can_use(target, **kwargs):
             return False
         
-        if vectors.distance(self.actor.pos, target.pos) > self.max_range:
+        if vectors.compare_distance(self.actor.pos, target.pos, self.max_range) > 0:
             return False
         
         if self.min_range > 0:
-            if vectors.distance(self.actor.pos, target.pos) < self.min_range:
+            if vectors.compare_distance(self.actor.pos, target.pos, self.min_range) < 0:
                 return False
         
         if self.actor.team != target.team:
@@ -233,7 +231,7 @@ class ConstructionAbility (Ability):
         self.charge = 0
     
     def generate_effect(self, target):
-        colour = [self.effect['colour'][i] + random.random() * self.effect['variation'][i] for i in range(3)]
+        colour = [self.effect['colour'][i] + self.actor.rng.random() * self.effect['variation'][i] for i in range(3)]
         
         the_effect = effects.Beam(
             origin=self.actor.pos,
@@ -254,11 +252,11 @@ class RepairAbility (Ability):
         if not super(RepairAbility, self).can_use(target, **kwargs):
             return False
         
-        if vectors.distance(self.actor.pos, target.pos) > self.max_range:
+        if vectors.compare_distance(self.actor.pos, target.pos, self.max_range) > 0:
             return False
         
         if self.min_range > 0:
-            if vectors.distance(self.actor.pos, target.pos) < self.min_range:
+            if vectors.compare_distance(self.actor.pos, target.pos, self.min_range) < 0:
                 return False
         
         if self.actor.team != target.team:
@@ -293,7 +291,7 @@ class RepairAbility (Ability):
         self.charge = 0
     
     def generate_effect(self, target):
-        colour = [self.effect['colour'][i] + random.random() * self.effect['variation'][i] for i in range(3)]
+        colour = [self.effect['colour'][i] + self.actor.rng.random() * self.effect['variation'][i] for i in range(3)]
         
         the_effect = effects.Beam(
             origin=vectors.add_vectors(self.actor.pos, self.effect_offset),
@@ -0,0 +1,217 @@
+from __future__ import division
+
+"""
+ActorStore keeps the position and velocity of every actor in a set of
+columns (structure of arrays) rather than spread across a list per
+actor. This lets the whole sim be moved in one step per tick instead
+of one actor at a time.
+
+The actors still have a pos and velocity, they are StoreVectors which
+read and write the columns. If something replaces one with a list (e.g.
+arriving at a move order) the store picks the new value up the next
+time it syncs.
+"""
+
+from array import array
+
+# NumPy is optional, without it the columns are arrays of doubles
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class StoreVector (object):
+    """A 3 length vector backed by 3 columns of an ActorStore"""
+    __slots__ = ("columns", "slot")
+    
+    # Mutable so it can't be used as a dict key
+    __hash__ = None
+    
+    def __init__(self, columns, slot):
+        self.columns = columns
+        self.slot = slot
+    
+    def __len__(self):
+        return 3
+    
+    def __getitem__(self, i):
+        if type(i) == slice:
+            return self.tolist()[i]
+        
+        if i < -3 or i > 2:
+            raise IndexError("StoreVector index out of range (%s)" % i)
+        
+        return float(self.columns[i][self.slot])
+    
+    def __setitem__(self, i, v):
+        if i < -3 or i > 2:
+            raise IndexError("StoreVector index out of range (%s)" % i)
+        
+        self.columns[i][self.slot] = v
+    
+    def __iter__(self):
+        return iter(self.tolist())
+    
+    def __eq__(self, other):
+        try:
+            if len(other) != 3: return False
+            return self.tolist() == [other[0], other[1], other[2]]
+        except TypeError:
+            return False
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def __repr__(self):
+        return "StoreVector(%s, %s, %s)" % tuple(self.tolist())
+    
+    # Once pickled it's no longer attached to the store
+    def __reduce__(self):
+        return (list, (self.tolist(),))
+    
+    def tolist(self):
+        s = self.slot
+        return [float(self.columns[0][s]), float(self.columns[1][s]), float(self.columns[2][s])]
+    
+    def copy(self):
+        return self.tolist()
+
+class ActorStore (object):
+    def __init__(self, capacity=64, use_numpy=True):
+        super(ActorStore, self).__init__()
+        
+        self.use_numpy = use_numpy and numpy != None
+        
+        # Slot i holds actors[i], when an actor is removed the last
+        # actor is moved into its slot
+        self.actors = []
+        self._pos_views = []
+        self._velocity_views = []
+        
+        self.capacity = 0
+        self.pos = tuple(self._new_column(0) for i in range(3))
+        self.velocity = tuple(self._new_column(0) for i in range(3))
+        self._grow(capacity)
+    
+    def __len__(self):
+        return len(self.actors)
+    
+    def _new_column(self, size):
+        if self.use_numpy:
+            return numpy.zeros(size, dtype=float)
+        return array('d', [0] * size)
+    
+    def _grow(self, capacity):
+        """Makes space for at least capacity actors, the views hold onto
+        the column tuples so they are resized in place"""
+        if capacity <= self.capacity: return
+        
+        for columns in (self.pos, self.velocity):
+            for c in columns:
+                if self.use_numpy:
+                    c.resize(capacity, refcheck=False)
+                else:
+                    c.extend([0] * (capacity - len(c)))
+        
+        self.capacity = capacity
+    
+    def _write(self, slot, a):
+        for i in range(3):
+            self.pos[i][slot] = a.pos[i]
+            self.velocity[i][slot] = a.velocity[i]
+    
+    def add(self, a):
+        if a.store_slot != None:
+            raise KeyError("Actor %s is already in an actor store" % a.oid)
+        
+        slot = len(self.actors)
+        if slot >= self.capacity:
+            self._grow(max(16, self.capacity * 2))
+        
+        self._write(slot, a)
+        
+        a.store_slot = slot
+        a.pos = StoreVector(self.pos, slot)
+        a.velocity = StoreVector(self.velocity, slot)
+        
+        self.actors.append(a)
+        self._pos_views.append(a.pos)
+        self._velocity_views.append(a.velocity)
+    
+    def remove(self, a):
+        slot = a.store_slot
+        if slot == None: return
+        
+        self._sync_actor(slot, a)
+        a.pos = a.pos.tolist()
+        a.velocity = a.velocity.tolist()
+        a.store_slot = None
+        
+        # Move the last actor into the gap
+        last = len(self.actors) - 1
+        if slot != last:
+            moved = self.actors[last]
+            self._sync_actor(last, moved)
+            
+            for columns in (self.pos, self.velocity):
+                for c in columns:
+                    c[slot] = c[last]
+            
+            self.actors[slot] = moved
+            self._pos_views[slot] = moved.pos
+            self._velocity_views[slot] = moved.velocity
+            
+            moved.store_slot = slot
+            moved.pos.slot = slot
+            moved.velocity.slot = slot
+        
+        del(self.actors[last])
+        del(self._pos_views[last])
+        del(self._velocity_views[last])
+    
+    def _sync_actor(self, slot, a):
+        if a.pos is not self._pos_views[slot]:
+            for i in range(3):
+                self.pos[i][slot] = a.pos[i]
+            a.pos = self._pos_views[slot]
+        
+        if a.velocity is not self._velocity_views[slot]:
+            for i in range(3):
+                self.velocity[i][slot] = a.velocity[i]
+            a.velocity = self._velocity_views[slot]
+    
+    def sync(self):
+        """Picks up any pos or velocity that has been replaced rather
+        than changed through its view"""
+        for slot, a in enumerate(self.actors):
+            self._sync_actor(slot, a)
+    
+    def integrate(self):
+        """Moves every actor by its velocity and updates their rects,
+        this replaces the movement part of ObjectBase.update"""
+        self.sync()
+        
+        n = len(self.actors)
+        px, py, pz = self.pos
+        vx, vy, vz = self.velocity
+        
+        if self.use_numpy:
+            px[:n] += vx[:n]
+            py[:n] += vy[:n]
+            pz[:n] += vz[:n]
+            
+            xs = px[:n].tolist()
+            ys = py[:n].tolist()
+        else:
+            for i in range(n):
+                px[i] += vx[i]
+                py[i] += vy[i]
+                pz[i] += vz[i]
+            
+            xs, ys = px, py
+        
+        for i, a in enumerate(self.actors):
+            a.rect.topleft = (
+                xs[i] - a.rect.width/2,
+                ys[i] - a.rect.height/2
+            )
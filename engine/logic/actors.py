@@ -1,5 +1,6 @@
 from __future__ import division
 
+import random
 import weakref
 
 import pygame
@@ -42,9 +43,16 @@ class Actor (object_base.ObjectBase):
     optimum_heal_range    = 100
     max_heal_range        = 100
     
+    # Used to decide what the AIs get to see
+    sight_range             = 400
+    
     construction_rate       = 1
     repair_rate             = 1
     
+    # Anything random comes from here, the sim replaces it with its own
+    # (seeded) generator
+    rng                     = random.Random()
+    
     does_damage             = False
     can_construct           = False
     can_repair              = False
@@ -202,6 +210,8 @@ class Actor (object_base.ObjectBase):
         self.max_heal_range         = data.get("max_heal_range", self.max_heal_range)
         self.optimum_heal_range     = data.get("optimum_heal_range", self.optimum_heal_range)
         
+        self.sight_range            = data.get("sight_range", self.sight_range)
+        
         self.does_damage            = data.get("does_damage", self.does_damage)
         self.can_construct          = data.get("can_construct", self.can_construct)
         self.can_repair             = data.get("can_repair", self.can_repair)
@@ -381,8 +391,8 @@ class Actor (object_base.ObjectBase):
         
         # Update our objectives etc
         if self.autotargeter != None and self.next_ai_update < 1:
-            self.autotargeter.update_actor(self)
-            self.next_ai_update = 10
+            self.next_ai_update = self.autotargeter.refresh_interval
+            self.autotargeter.request_update(self)
     
     def run_ai(self):
         if self.micro_orders == []:
@@ -403,7 +413,7 @@ class Actor (object_base.ObjectBase):
         elif cmd == "move":
             self._move_ai(pos)
             
-            if vectors.distance(self.pos, pos) <= vectors.total_velocity(self.velocity):
+            if vectors.distance_squared(self.pos, pos) <= vectors.distance_squared(self.velocity):
                 self.pos = pos
                 self.velocity = [0,0,0]
                 self.next_order()
@@ -415,8 +425,7 @@ class Actor (object_base.ObjectBase):
             if target != None:
                 # First, are we within optimum range of our target?
                 # If not then we need to get closer
-                target_distance = vectors.distance(self.pos, target.pos)
-                if target_distance > self.optimum_attack_range:
+                if vectors.compare_distance(self.pos, target.pos, self.optimum_attack_range) > 0:
                     attack_pos = vectors.get_midpoint(self.pos, target.pos, self.optimum_attack_range)
                     self._move_ai(attack_pos)
                 else:
@@ -429,9 +438,7 @@ class Actor (object_base.ObjectBase):
             
             # If we have a target, lets move closer to it
             if target != None:
-                dist = vectors.distance(self.pos, target.pos)
-                
-                if dist > self.optimum_heal_range:
+                if vectors.compare_distance(self.pos, target.pos, self.optimum_heal_range) > 0:
                     target_pos = vectors.get_midpoint(self.pos, target.pos, self.optimum_heal_range)
                     self._move_ai(target_pos)
                 else:
@@ -507,12 +514,10 @@ class Actor (object_base.ObjectBase):
         return False
     
     def _accelerate_ai(self, target):
-        dist = vectors.distance(self.pos, target)
-        
-        if dist > self.max_velocity:
-            self.velocity = vectors.move_to_vector(vectors.angle(self.pos, target), self.max_velocity)
+        if vectors.compare_distance(self.pos, target, self.max_velocity) > 0:
+            self.velocity = vectors.move_towards(self.pos, target, self.max_velocity)
         else:
-            self.velocity = vectors.move_to_vector(vectors.angle(self.pos, target), dist)
+            self.velocity = vectors.move_towards(self.pos, target, vectors.distance(self.pos, target))
     
     def _decelerate_ai(self):
         total_velocity = vectors.total_velocity(self.velocity)
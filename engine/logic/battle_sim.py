@@ -13,10 +13,14 @@ import sys
 import json
 import pdb
 import weakref
+import random
+import struct
+import zlib
+from collections import deque
 
-from engine.libs import actor_lib, vectors, geometry, pathing, sim_lib, ai_lib
-from engine.logic import actor_subtypes, teams
-from engine.ai import autotargeter, core_ai
+from engine.libs import actor_lib, vectors, geometry, pathing, sim_lib, ai_lib, spatial_lib
+from engine.logic import actor_subtypes, teams, actor_store, snapshots
+from engine.ai import autotargeter, core_ai, actor_table, wire
 from engine.render import battle_screen
 
 def handle_number(v):
@@ -35,13 +39,35 @@ def handle_boolean(v):
     
     return v
 
+def handle_string(v):
+    if type(v) not in (str, unicode):
+        raise Exception("%s (%s) is not a string but needs to be cast as one" % (
+            v, type(v)
+        ))
+    
+    return str(v)
+
 attribute_handlers = {
     "number":   handle_number,
     "boolean":  handle_boolean,
+    "string":   handle_string,
 }
 
 attribute_list = (
     ("collision_interval",  "_collision_interval", "number"),
+    ("collision_cell_size", "_collision_cell_size", "number"),
+    ("collision_engine",    "_collision_engine", "string"),
+    ("spatial_cell_size",   "_spatial_cell_size", "number"),
+    ("autotarget_actor_budget", "_autotarget_actor_budget", "number"),
+    ("autotarget_time_budget",  "_autotarget_time_budget", "number"),
+    ("use_vec3",            "_use_vec3", "boolean"),
+    ("use_actor_store",     "_use_actor_store", "boolean"),
+    ("tick_profiler",       "_tick_profiler", "boolean"),
+    ("deterministic",       "_deterministic", "boolean"),
+    ("random_seed",         "_random_seed", "number"),
+    ("ai_actor_table",      "_ai_actor_table", "boolean"),
+    ("ai_actor_table_capacity", "_ai_actor_table_capacity", "number"),
+    ("ai_visibility",       "_ai_visibility", "boolean"),
     ("scroll_speed",        "scroll_speed", "number"),
     ("allow_mouse_scroll",  "allow_mouse_scroll", "boolean"),
     ("scroll_delay",        "scroll_delay", "number"),
@@ -54,13 +80,73 @@ for a, b, t in attribute_list:
             a, t
         ))
 
+# Used by BattleSim.checksum, one per actor
+_checksum_actor = struct.Struct("<iiddddddddd")
+_checksum_bullet = struct.Struct("<ddd")
+
 
 class BattleSim (battle_screen.BattleScreen):
+    # The engine hands us the frame time and we run however many logic
+    # cycles fit into it, each one being _cycle_delay long
+    fixed_timestep = True
+    
+    # If we're further behind than this we drop the ticks rather than
+    # spending ever longer catching up
+    max_steps_per_frame = 5
+    
+    profiler_phases = ("ai_queues", "orders", "autotargeters", "actors",
+        "bullets", "effects", "collisions", "render")
+    
+    # How many of the per tick checksums are kept in deterministic mode
+    checksum_history = 3000
+    
     def __init__(self, engine):
         # How many cycles between collision checks
         self._collision_interval = 5
         self._collision_inverval_count = 0
         
+        # Size of the grid cells used to bucket actors when checking
+        # for collisions
+        self._collision_cell_size = 100
+        
+        # Which of the sim_lib collision engines to use, the sweep and
+        # prune engine keeps state between checks
+        self._collision_engine = "grid"
+        self._sweep_and_prune = sim_lib.SweepAndPrune()
+        
+        # Shared by everything that needs to know what is near a given
+        # point, it is kept up to date as the actors move
+        self._spatial_cell_size = 100
+        self.spatial_index = spatial_lib.SpatialIndex(self._spatial_cell_size)
+        
+        # Limits on how many target refreshes each autotargeter will run
+        # per tick, 0 means no limit
+        self._autotarget_actor_budget = 0
+        self._autotarget_time_budget = 0
+        
+        # Actors keep their position as a vectors.Vec3 and move it in place
+        self._use_vec3 = False
+        
+        # Actor positions and velocities are held in columns and
+        # moved together once per cycle
+        self._use_actor_store = False
+        self.actor_store = None
+        
+        # Time each phase of the logic cycle, see tick_profiler
+        self._tick_profiler = False
+        
+        # In deterministic mode nothing depends on the wall clock and
+        # a checksum of the state is kept for every tick. All random
+        # numbers come from rng either way.
+        self._deterministic = False
+        self._random_seed = 0
+        self.rng = random.Random(self._random_seed)
+        self.checksums = deque(maxlen=self.checksum_history)
+        
+        # When set (to a replay.Recorder) the setup and every order
+        # given are written to a replay
+        self.recorder = None
+        
         super(BattleSim, self).__init__(engine)
         
         self.next_cycle = time.time()
@@ -95,11 +181,52 @@ class BattleSim (battle_screen.BattleScreen):
         self.actor_lookup = {}
         
         self.ai_prefs = {}
+        
+        # What each AI was last sent (team -> oid -> actor_lib.stripped_fields)
+        # and which of them have had the full list to apply deltas to.
+        # Every so often they get the full list again in case they've
+        # drifted (e.g. by changing their copies of the actors).
+        self._ai_actor_state = {}
+        self._ai_synced = set()
+        self._ai_updates = 0
+        self.ai_resync_interval = 10
+        
+        # AIs can instead read the actors from shared memory, see
+        # actor_table.py. The table is made when the AIs are.
+        self._ai_actor_table = False
+        self._ai_actor_table_capacity = 10000
+        self.ai_table = None
+        
+        # Packs and unpacks the frames for AIs with a wire_format of
+        # "frames", it's rebuilt with the actor types when they load
+        self.ai_wire = wire.Codec()
+        
+        # AIs only get the actors their team can see (see visible_actors),
+        # in the table each row is marked with the teams that can see it
+        self._ai_visibility = True
+        
+        # Ticks still to be run by fast_forward and how many of them
+        # update() runs at a time, between batches the engine gets a
+        # chance to handle input
+        self._fast_forward_ticks = 0
+        self._fast_forward_render_every = 0
+        self.fast_forward_batch = 100
+        
+        # Time owed to the fixed timestep and how many ticks have been
+        # dropped because we couldn't keep up (shown on the profiler panel)
+        self._accumulator = 0
+        self.dropped_ticks = 0
     
     def quit(self, event=None):
         for k, q in self.out_queues.items():
             q.put({"cmd":"quit"})
         
+        if self.recorder != None:
+            self.recorder.close()
+        
+        if self.ai_table != None:
+            self.ai_table.close()
+        
         super(BattleSim, self).quit(event)
     
     def data_dump(self, file_path=None):
@@ -118,7 +245,7 @@ class BattleSim (battle_screen.BattleScreen):
             data.append("velocity: %s" % a.velocity)
         
         data.append("\n**** Collisions **** ")
-        data.append(str(sim_lib.get_collisions(self.actors)))
+        data.append(str(self.get_collisions()))
         
         data = "\n".join(data)
         
@@ -130,6 +257,36 @@ class BattleSim (battle_screen.BattleScreen):
             with open(file_path, "w") as f:
                 f.write(data)
     
+    def get_collisions(self):
+        if self._collision_engine == "grid":
+            return sim_lib.get_collisions(self.actors, self._collision_cell_size)
+        
+        elif self._collision_engine == "sweep":
+            return self._sweep_and_prune.get_collisions(self.actors)
+        
+        elif self._collision_engine == "brute":
+            return sim_lib.brute_force_collisions(self.actors)
+        
+        raise KeyError("No collision engine by the name of '%s'" % self._collision_engine)
+    
+    def add_order(self, the_actor, command, pos=None, target=None):
+        if type(the_actor) == int:
+            the_actor = self.actors[the_actor]
+        
+        if self.recorder != None:
+            self.recorder.order(self.tick, False, the_actor, command, pos, target)
+        
+        super(BattleSim, self).add_order(the_actor, command, pos, target)
+    
+    def queue_order(self, the_actor, command, pos=None, target=None):
+        if type(the_actor) == int:
+            the_actor = self.actors[the_actor]
+        
+        if self.recorder != None:
+            self.recorder.order(self.tick, True, the_actor, command, pos, target)
+        
+        super(BattleSim, self).queue_order(the_actor, command, pos, target)
+    
     def issue_orders(self):
         """Issues the orders that have been stored in the delayed storage"""
         for a, cmd, pos, target in self.orders[self.tick]:
@@ -153,62 +310,210 @@ class BattleSim (battle_screen.BattleScreen):
     def update(self):
         super(BattleSim, self).update()
         
-        if time.time() > self.next_cycle:
+        if self._fast_forward_ticks > 0:
+            ticks = min(self._fast_forward_ticks, self.fast_forward_batch)
+            self._fast_forward_ticks -= ticks
+            
+            try:
+                self.run_ticks(ticks, self._fast_forward_render_every)
+            except Exception as e:
+                self.data_dump()
+                raise
+        
+        elif time.time() > self.next_cycle:
             try:
                 self.logic_cycle()
             except Exception as e:
                 self.data_dump()
                 raise
     
+    def show_profiler(self, position=(200, 50)):
+        """The profiler panel along with how many ticks we've dropped
+        through lag"""
+        super(BattleSim, self).show_profiler(position)
+        
+        p = self.panels["profiler"]
+        p.size = (p.size[0], p.size[1] + 20)
+        p.add_text(
+            obj = self,
+            attribute = "dropped_ticks",
+            position = (10, len(self.profiler_phases) * 20 + 5),
+            prefix = "dropped ticks: ",
+        )
+    
+    def advance(self, frame_time):
+        if not self.fixed_timestep or self._fast_forward_ticks > 0:
+            self.update()
+            return
+        
+        # The screen side of things (e.g. scrolling) happens once a frame
+        super(BattleSim, self).update()
+        
+        self._accumulator += frame_time
+        
+        steps = 0
+        while self._accumulator >= self._cycle_delay:
+            if steps >= self.max_steps_per_frame:
+                dropped = int(self._accumulator / self._cycle_delay)
+                self.dropped_ticks += dropped
+                
+                self._accumulator -= dropped * self._cycle_delay
+                break
+            
+            try:
+                self.logic_cycle()
+            except Exception as e:
+                self.data_dump()
+                raise
+            
+            self._accumulator -= self._cycle_delay
+            steps += 1
+        
+        self.interpolation = self._accumulator / self._cycle_delay
+    
+    def run_ticks(self, ticks, render_every=0):
+        """Runs ticks logic cycles back to back without waiting for the
+        cycle delay. When render_every is above 0 the screen is drawn
+        after every render_every ticks, otherwise nothing is drawn."""
+        for i in range(1, ticks + 1):
+            self.logic_cycle()
+            
+            if render_every > 0 and i % render_every == 0:
+                self._next_redraw = 0
+                self.redraw()
+    
+    def fast_forward(self, ticks, render_every=0):
+        """Has update() run the next ticks logic cycles as fast as it can
+        rather than at the speed set by sim_lib.set_speed"""
+        self._fast_forward_ticks = ticks
+        self._fast_forward_render_every = render_every
+    
     def read_ai_queues(self):
-        for t, q in self.in_queues.items():
+        for t, q in sorted(self.in_queues.items()):
             while not q.empty():
                 data = q.get()
                 
-                if data['data_type'] == "orders":
-                    a = self.actor_lookup[data['actor']]
-                    if data['target'] in self.actor_lookup:
-                        data['target'] = self.actor_lookup[data['target']]
-                    
-                    self.add_order(a, data['cmd'], pos=data['pos'], target=data['target'])
-                elif data['data_type'] == "prefs":
-                    self.ai_prefs[t] = data['prefs']
+                # A frame holds everything the AI sent in a cycle
+                if wire.is_frame(data):
+                    for message in self.ai_wire.unpack_frame(data):
+                        self.handle_ai_message(t, message)
                 else:
-                    raise Exception("No handler for AI cmd of %s (full data: %s)" % (
-                        data['data_type'], str(data))
-                    )
-                
+                    self.handle_ai_message(t, data)
     
-    def update_ai_queues(self):
-        actor_list = []
-        actor_dict = {}
-        for a in self.actors:
-            sa = actor_lib.strip_actor(a)
+    def handle_ai_message(self, t, data):
+        if data['data_type'] == "orders":
+            # The actor may have died since the AI last heard about it
+            if data['actor'] not in self.actor_lookup:
+                return
             
-            actor_list.append(sa)
-            actor_dict[a.oid] = sa
+            a = self.actor_lookup[data['actor']]
+            if data['target'] in self.actor_lookup:
+                data['target'] = self.actor_lookup[data['target']]
+            
+            self.add_order(a, data['cmd'], pos=data['pos'], target=data['target'])
+        elif data['data_type'] == "prefs":
+            self.ai_prefs[t] = data['prefs']
+        else:
+            raise Exception("No handler for AI cmd of %s (full data: %s)" % (
+                data['data_type'], str(data))
+            )
+    
+    def visible_actors(self, team):
+        """The team's own actors and any others within the sight_range of
+        one of them, in oid order"""
+        own_actors = [a for a in self.actors if a.team == team]
         
-        # TODO - Make it so that each AI only gets a list of actors
-        # that it can actually see. That way it can't cheat
+        visible = own_actors + self.spatial_index.query_sight(own_actors, exclude_team=team)
+        visible.sort(key=lambda a: a.oid)
         
-        for t, q in self.out_queues.items():
+        return visible
+    
+    def update_ai_queues(self):
+        """AIs are sent all the actors they can see the first time and
+        every ai_resync_interval updates after that, in between they are
+        only sent what has changed since the last update"""
+        if self.out_queues == {}:
+            return
+        
+        # AIs reading the table don't need anything else
+        table_teams, queue_teams = [], []
+        for t in self.out_queues.keys():
             if t not in self.ai_prefs: continue
-            if self.ai_prefs[t].get("actor_format", "list") == "list":
-                data = [{
+            if self.ai_table != None and self.ai_prefs[t].get("actor_source", "queue") == "table":
+                table_teams.append(t)
+            else:
+                queue_teams.append(t)
+        
+        if self.ai_table != None:
+            visible_to = None
+            if self._ai_visibility:
+                visible_to = {}
+                for t in table_teams:
+                    bit = 1 << int(t)
+                    for a in self.visible_actors(int(t)):
+                        visible_to[a.oid] = visible_to.get(a.oid, 0) | bit
+            
+            self.ai_table.write(self.actors, self.tick, visible_to)
+        
+        if queue_teams == []:
+            return
+        
+        self._ai_updates += 1
+        resync = (self._ai_updates % self.ai_resync_interval == 0)
+        
+        # Each actor is only stripped once however many AIs can see it
+        stripped = {}
+        
+        for t in queue_teams:
+            q = self.out_queues[t]
+            
+            if self._ai_visibility:
+                actors = self.visible_actors(int(t))
+            else:
+                actors = self.actors
+            
+            state, created, removed, changed = ai_lib.actor_deltas(
+                self._ai_actor_state.get(t, {}), actors, stripped)
+            self._ai_actor_state[t] = state
+            
+            messages = []
+            
+            if t in self._ai_synced and not resync:
+                if created != [] or removed != [] or changed != {}:
+                    messages.append({
+                        "cmd":      "actor_deltas",
+                        "created":  created,
+                        "removed":  removed,
+                        "changed":  changed,
+                    })
+            
+            elif self.ai_prefs[t].get("actor_format", "list") == "list":
+                messages.append({
                     "cmd":          "actors",
-                    "actor_list":   actor_list,
-                }]
+                    "actor_list":   [actor_lib.make_stripped(state[a.oid]) for a in actors],
+                })
+                self._ai_synced.add(t)
+            
             else:
-                data = [{
+                messages.append({
                     "cmd":          "actors",
-                    "actor_list":   actor_dict,
-                }]
+                    "actor_list":   dict([(a.oid, actor_lib.make_stripped(state[a.oid])) for a in actors]),
+                })
+                self._ai_synced.add(t)
+            
+            if messages == []:
+                continue
             
-            for d in data:
-                q.put(d)
+            if self.ai_prefs[t].get("wire_format", "dicts") == "frames":
+                q.put(self.ai_wire.pack_frame(messages))
+            else:
+                for m in messages:
+                    q.put(m)
     
     def logic_cycle(self):
         """The core function of the sim, this is where the 'magic happens'"""
+        self.profiler.start()
+        
         if int(time.time()) != self.cycle_count[1]:
             self.cycle_count = [0, int(time.time())]
         
@@ -218,26 +523,34 @@ class BattleSim (battle_screen.BattleScreen):
             self.next_ai_update = 30
         
         self.read_ai_queues()
+        self.profiler.mark("ai_queues")
         
         self.tick += 1
         
         self.orders[self.tick + self.tick_jump] = []
         self.q_orders[self.tick + self.tick_jump] = []
         self.issue_orders()
-        
-        # This will warn us if the sim is lagging behind how fast it's meant to be
-        time_over = time.time() - self.next_cycle
-        if time_over > 0.25:
-            print("Logic lag of %ss" % time_over)
+        self.profiler.mark("orders")
         
         # Update the AIs
-        for t, a in self.autotargeters.items():
+        for t, a in sorted(self.autotargeters.items()):
             a.update()
+        self.profiler.mark("autotargeters")
+        
+        # Remember where everything was so the screen can draw between ticks
+        if self.interpolate:
+            for a in self.actors:
+                a.last_pos = (a.pos[0], a.pos[1])
+        
+        # Move all the actors at once, a.update() will then skip
+        # the movement step
+        if self.actor_store != None:
+            self.actor_store.integrate()
         
         # Update the actors themselves
-        to_remove = []
+        dead_actors = []
         to_add = []
-        for i, a in enumerate(self.actors):
+        for a in self.actors:
             # First we need to check to see if it's got a build order
             # it'd have one because the AI can't directly tell us
             # to build something and instantly be told what the building
@@ -254,7 +567,7 @@ class BattleSim (battle_screen.BattleScreen):
                     a_type = self.actor_types[type_name]
             
                     new_rect = pygame.Rect(pos[0], pos[1], a_type['size'][0], a_type['size'][1])
-                    building_rect = ai_lib.place_actor(self.actors, new_rect, [50, 100, 200], self.battlefield['size'])
+                    building_rect = ai_lib.place_actor(self.actors, new_rect, [50, 100, 200], self.battlefield['size'], self.spatial_index)
                     
                     if building_rect != None:
                         posx = building_rect.left + building_rect.width/2
@@ -270,6 +583,18 @@ class BattleSim (battle_screen.BattleScreen):
                 a.next_order()
             
             a.update()
+            self.spatial_index.update(a)
+            
+            # Pass effects from the actor to the sim, this means that
+            # if the actor dies the effect still lives on
+            while len(a.effects) > 0:
+                self.effects.append(a.effects.pop())
+            
+            # Do same with bullets
+            while len(a.bullets) > 0:
+                b = a.bullets.pop()
+                b.use_vec3 = a.use_vec3
+                self.bullets.append(b)
             
             # Is the actor trying to place a new unit?
             # We only check as often as we check for collisions, this gives a cycle
@@ -282,7 +607,7 @@ class BattleSim (battle_screen.BattleScreen):
                     new_rect_pos = vectors.add_vectors(a.pos, a.build_offset)
                     new_rect = pygame.Rect(new_rect_pos[0], new_rect_pos[1], a_type['size'][0], a_type['size'][1])
                 
-                    if not sim_lib.test_possible_collision(self.actors, new_rect):
+                    if not sim_lib.test_possible_collision(self.spatial_index.query_rect(new_rect), new_rect):
                         to_add.append((a, {
                             "type": a.build_queue[0],
                             "pos":  new_rect_pos,
@@ -292,43 +617,46 @@ class BattleSim (battle_screen.BattleScreen):
                         self.signal_menu_rebuild = True
                         del(a.build_queue[0])
             
-            if a.hp <= 0: to_remove.insert(0, i)
-        for i in to_remove: del(self.actors[i])
+            if a.hp <= 0: dead_actors.append(a)
+        
+        if dead_actors != []:
+            self.remove_actors(dead_actors)
+        
         for builder, new_actor in to_add:
             new_target = self.place_actor(new_actor)
             builder.issue_command("aid", target=new_target)
+        self.profiler.mark("actors")
         
-        # Bullets too
-        to_delete = []
-        for i, b in enumerate(self.bullets):
+        # Bullets too, the lists are rebuilt in place rather than
+        # deleting from them one at a time
+        live_bullets = []
+        for b in self.bullets:
             b.update()
             
             if b.dead:
-                new_effect = b.explode(self.actors)
+                new_effect = b.explode(self.spatial_index.query_radius(b.pos, b.blast_radius))
                 if new_effect != None:
                     self.effects.append(new_effect)
-                to_delete.insert(0, i)
-        for i in to_delete:
-            del(self.bullets[i])
+            else:
+                live_bullets.append(b)
+        self.bullets[:] = live_bullets
+        self.profiler.mark("bullets")
         
         # And lastly effects
-        to_delete = []
-        for i, e in enumerate(self.effects):
+        live_effects = []
+        for e in self.effects:
             e.update()
-            if e.dead:
-                to_delete.insert(0, i)
-                continue
-        
-        # Delete any uneeded effects
-        for i in to_delete:
-            del(self.effects[i])
+            if not e.dead:
+                live_effects.append(e)
+        self.effects[:] = live_effects
+        self.profiler.mark("effects")
         
         # Check for collisions
         self._collision_inverval_count -= 1
         
         if self._collision_inverval_count < 1:
             self._collision_inverval_count = self._collision_interval
-            collisions = sim_lib.get_collisions(self.actors)
+            collisions = self.get_collisions()
             
             # We now have a list of all the collisions
             for obj1, obj2 in collisions:
@@ -336,11 +664,50 @@ class BattleSim (battle_screen.BattleScreen):
                 # actor in the same way and the order the collison was found is
                 # irrelevant
                 actor_lib.handle_pathing_collision(min(obj1, obj2), max(obj1, obj2))
+                self.spatial_index.update(obj1)
+                self.spatial_index.update(obj2)
+        self.profiler.mark("collisions")
+        self.profiler.end_tick()
+        
+        if self._deterministic:
+            self.checksums.append(self.checksum())
+        
+        if self.recorder != None:
+            self.recorder.end_tick(self)
         
         # Set next cycle time
         self.next_cycle = time.time() + self._cycle_delay
         self.cycle_count[0] += 1
     
+    def checksum(self):
+        """A crc32 of the tick, the actors and the bullets. Two sims given
+        the same orders should always have the same checksum."""
+        crc = zlib.crc32(struct.pack("<iii", self.tick, len(self.actors), len(self.bullets)))
+        
+        # Actors are kept in oid order
+        for a in self.actors:
+            crc = zlib.crc32(_checksum_actor.pack(
+                a.oid, a.team, a.hp, a.completion,
+                a.pos[0], a.pos[1], a.pos[2],
+                a.velocity[0], a.velocity[1],
+                a.facing[0], a.facing[1],
+            ), crc)
+        
+        for b in self.bullets:
+            crc = zlib.crc32(_checksum_bullet.pack(b.pos[0], b.pos[1], b.pos[2]), crc)
+        
+        return crc & 0xffffffff
+    
+    def snapshot(self):
+        """The whole state of the sim as a compressed string of bytes,
+        see snapshots.py"""
+        return snapshots.dumps(self)
+    
+    def restore(self, blob):
+        """Puts the sim back to the state it was in when blob was taken,
+        the sim must have been loaded with the same setup"""
+        snapshots.loads(self, blob)
+    
     def place_actor_from_click(self, event, drag, actor_data):
         self.place_image = None
         actor_data['pos'] = [event.pos[0] - self.draw_margin[0], event.pos[1] - self.draw_margin[1], 0]
@@ -356,8 +723,42 @@ class BattleSim (battle_screen.BattleScreen):
             if actor_lib.can_build(self.actor_types[a.actor_type], self.actor_types[actor_data['type']], self.build_lists):
                 builders.append(a)
         
+        if self.recorder != None:
+            self.recorder.place(self.tick, actor_data)
+        
         return self.place_actor(actor_data, builders=builders)
     
+    def remove_actors(self, dead_actors):
+        """Removes the actors in a single pass along with anything
+        else in the sim or screen that refers to them"""
+        dead_oids = set()
+        for a in dead_actors:
+            dead_oids.add(a.oid)
+            
+            self.spatial_index.remove(a)
+            if self.actor_store != None:
+                self.actor_store.remove(a)
+            
+            if a.oid in self.actor_lookup:
+                del(self.actor_lookup[a.oid])
+            
+            if a.selected:
+                a.selected = False
+                self._selection_has_changed = True
+        
+        self.actors[:] = [a for a in self.actors if a.oid not in dead_oids]
+        self.selected_actors[:] = [a for a in self.selected_actors if a.oid not in dead_oids]
+        
+        for k, group in self.control_groups.items():
+            self.control_groups[k] = [a for a in group if a.oid not in dead_oids]
+    
+    def add_actor(self, a):
+        super(BattleSim, self).add_actor(a)
+        self.spatial_index.add(a)
+        
+        if self.actor_store != None:
+            self.actor_store.add(a)
+    
     def place_actor(self, actor_data, builders=[]):
         """Called when there's a click while in placement mode.
         Returns a weakref to the actor just created"""
@@ -365,6 +766,8 @@ class BattleSim (battle_screen.BattleScreen):
         aclass = actor_subtypes.types[class_type]
         
         a = aclass()
+        a.use_vec3 = self._use_vec3
+        a.rng = self.rng
         a.apply_template(self.actor_types[actor_data['type']])
         a.apply_data(actor_data)
         
@@ -393,7 +796,12 @@ class BattleSim (battle_screen.BattleScreen):
         self.add_actor(a)
         self.actor_lookup[a.oid] = weakref.ref(a)()
         
-        mods = pygame.key.get_mods()
+        # There's no keyboard when headless
+        if self.headless:
+            mods = 0
+        else:
+            mods = pygame.key.get_mods()
+        
         for b in builders:
             if KMOD_SHIFT & mods:
                 self.queue_order(b, "aid", target=self.actor_lookup[a.oid])
@@ -411,16 +819,20 @@ class BattleSim (battle_screen.BattleScreen):
             game_path = "{0}/{1}".format(sys.path[0], game_path)
         
         with open(config_path) as f:
-            data = json.loads(f.read())
-            self.load_config(data)
+            config = json.loads(f.read())
         
         with open(setup_path) as f:
-            data = json.loads(f.read())
-            self.load_setup(data)
+            setup = json.loads(f.read())
         
         with open(game_path) as f:
-            data = json.loads(f.read())
-            self.load_game(data)
+            game = json.loads(f.read())
+        
+        if self.recorder != None:
+            self.recorder.setup(config, setup, game)
+        
+        self.load_config(config)
+        self.load_setup(setup)
+        self.load_game(game)
     
     def load_config(self, data):
         for name, maps_to, data_type in attribute_list:
@@ -429,6 +841,21 @@ class BattleSim (battle_screen.BattleScreen):
             v = attribute_handlers[data_type](data[name])
             
             setattr(self, maps_to, v)
+        
+        self.spatial_index.rebuild(self._spatial_cell_size)
+        
+        if self._use_actor_store and self.actor_store == None:
+            self.actor_store = actor_store.ActorStore()
+        
+        self.profiler.enabled = self._tick_profiler
+        
+        self.rng.seed(self._random_seed)
+        
+        # A time budget depends on how fast the machine is
+        if self._deterministic:
+            self._autotarget_time_budget = 0
+        if self._tick_profiler and not self.headless:
+            self.show_profiler()
     
     def load_setup(self, data):
         # Load resources
@@ -497,6 +924,12 @@ class BattleSim (battle_screen.BattleScreen):
             self.teams[team_id].apply_data(team_data)
         
         # Load AIs (AIs are optional)
+        self.ai_wire = wire.Codec(self.actor_types.keys())
+        
+        if self._ai_actor_table and data.get('ais', {}) != {}:
+            self.ai_table = actor_table.ActorTable(sorted(self.actor_types.keys()),
+                self._ai_actor_table_capacity)
+        
         for ai_team, ai_data in data.get('ais', {}).items():
             # Annoyingly we need to convert it from a unicode dict
             # into a standard one
@@ -506,7 +939,7 @@ class BattleSim (battle_screen.BattleScreen):
             
             new_data['team'] = ai_team
             new_data['cmd'] = "init"
-            out_queue, in_queue = core_ai.make_ai(new_data['type'])
+            out_queue, in_queue = core_ai.make_ai(new_data['type'], self.ai_table)
             
             self.out_queues[ai_team] = out_queue
             self.in_queues[ai_team] = in_queue
@@ -528,7 +961,8 @@ class BattleSim (battle_screen.BattleScreen):
         # Any team without a specifically chosen AI gets the default one
         for t in team_set:
             if t not in self.autotargeters:
-                self.autotargeters[t] = autotargeter.Autotargeter(self, t)
+                self.autotargeters[t] = autotargeter.Autotargeter(self, t,
+                    self._autotarget_actor_budget, self._autotarget_time_budget)
         
         # Now assign the auto-targeters as they would not have been assigned
         # when the actors were placed
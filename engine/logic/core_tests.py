@@ -3,6 +3,16 @@ from engine.test_lib import *
 
 def run():
     unittest.TextTestRunner(verbosity=1).run(ai_lib_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(sim_lib_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(spatial_lib_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(autotargeter_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(actor_store_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(headless_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(tick_profiler_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(replay_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(actor_table_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(wire_t.suite)
+    unittest.TextTestRunner(verbosity=1).run(baseline_t.suite)
     unittest.TextTestRunner(verbosity=1).run(actor_t.suite)
     unittest.TextTestRunner(verbosity=1).run(vector_t.suite)
     unittest.TextTestRunner(verbosity=1).run(geometry_t.suite)
@@ -29,8 +29,10 @@ class Effect (object):
 class Beam (Effect):
     def __init__(self, origin, target, colour, duration=None, degrade=(0,0,0)):
         super(Beam, self).__init__()
-        self.origin = origin
-        self.target = target
+        # Copied so the beam doesn't follow a position that gets
+        # moved in place
+        self.origin = list(origin)
+        self.target = list(target)
         self.colour = colour
         
         self.degrade = degrade
@@ -0,0 +1,87 @@
+from __future__ import division
+
+"""
+HeadlessSim runs the battle logic without a window, surfaces or any
+input. Anything the sim would normally ask the images for (e.g. the size
+of an actor) comes from a size cache (see utilities.size_cache) or, if
+an image isn't in the cache, the template data.
+    
+    e = HeadlessEngine(size_cache="data/image_sizes.json")
+    sim = new_sim(e, "data/config.json", "data/game_data.json", "data/dummy.json")
+    
+    for i in range(1000):
+        sim.logic_cycle()
+"""
+
+from engine.render import core
+from engine.logic import battle_sim
+from engine.libs import sim_lib
+from engine.utilities import size_cache as size_cache_lib
+
+class HeadlessEngine (core.EngineV3):
+    name = "Headless engine"
+    
+    def __init__(self, image_sizes=None, size_cache=None):
+        """image_sizes is a dict of image name -> (width, height), size_cache
+        is the path to a file made by utilities.size_cache"""
+        super(HeadlessEngine, self).__init__()
+        
+        self.display = None
+        self.image_sizes = {}
+        
+        if size_cache != None:
+            self.image_sizes.update(size_cache_lib.load(size_cache))
+        
+        if image_sizes != None:
+            self.image_sizes.update(image_sizes)
+    
+    def quit(self, event=None):
+        pass
+    
+    def startup(self):
+        pass
+    
+    def get_image_size(self, name):
+        return self.image_sizes.get(name, None)
+    
+    def set_screen(self, s, *args, **kwargs):
+        """Same as EngineV3.set_screen but without touching the display"""
+        if s in self.screens:
+            s = self.screens[s]
+        elif type(s) == str:
+            raise KeyError("Screen '%s' not found in screen dictionary" % s)
+        
+        if type(s) == type:
+            s = s(self, *args, **kwargs)
+        
+        s.engine = self
+        s.display = self.display
+        
+        self.current_screen = s
+        self.current_screen.activate()
+        
+        return s
+
+class HeadlessSim (battle_sim.BattleSim):
+    headless = True
+    interpolate = False
+    
+    def __init__(self, engine):
+        super(HeadlessSim, self).__init__(engine)
+        
+        # There's no frame rate to keep up with
+        sim_lib.set_speed(self, 10000)
+    
+    def redraw(self):
+        pass
+    
+    def update_window(self):
+        pass
+
+def new_sim(engine, config_path, setup_path, game_path, local=True, sim_class=HeadlessSim):
+    """Makes the sim the engine's current screen (the sim looks things up
+    through the engine while loading) and loads it"""
+    sim = engine.set_screen(sim_class)
+    sim.load_all(config_path, setup_path, game_path, local)
+    
+    return sim
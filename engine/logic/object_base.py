@@ -13,6 +13,13 @@ class ObjectBase (object):
     flags               = []
     size                = (0,0)
     
+    # When set pos is kept as a vectors.Vec3 and moved in place
+    use_vec3            = False
+    
+    # Where the object was at the start of the last tick, the screen draws
+    # between this and pos
+    last_pos            = None
+    
     def __init__(self):
         super(ObjectBase, self).__init__()
         
@@ -21,6 +28,9 @@ class ObjectBase (object):
         self.facing     = [0,0]# XY, Z
         
         self.oid = 0
+        
+        # Set when pos and velocity are held in an ActorStore
+        self.store_slot = None
     
     # These allow us to order actors based on their aid
     def __lt__(self, other): return self.oid < other.oid
@@ -31,7 +41,18 @@ class ObjectBase (object):
         self.rect = self.image.get_rect()
 
     def update(self):
-        self.pos = vectors.add_vectors(self.pos, self.velocity)
+        # The store moves everything at once before the actors update
+        if self.store_slot != None:
+            return
+        
+        if self.use_vec3:
+            # pos can be replaced by a list (e.g. loading from JSON)
+            if type(self.pos) != vectors.Vec3:
+                self.pos = vectors.Vec3(*self.pos)
+            
+            self.pos.iadd(self.velocity)
+        else:
+            self.pos = vectors.add_vectors(self.pos, self.velocity)
         
         # Set rect
         self.rect.topleft = (
@@ -0,0 +1,245 @@
+from __future__ import division
+
+"""
+Records a battle as the data it was loaded from plus every order given
+during it, playing the orders back into a headless sim gives the same
+battle. Replays are only valid for a deterministic sim (see the
+"deterministic" config option) on the same build of the game.
+
+    sim.recorder = replay.Recorder("battle.replay")
+    sim.load_all(...)
+    ...
+    sim.quit()
+
+    p = replay.Player("battle.replay")
+    p.play()
+    p.seek(1200)
+
+The file is a header followed by records, each record is a kind, the
+tick it happened on and the length of its payload:
+
+    SETUP       zlib of the JSON config, setup and game data
+    ORDER       an order given through add_order or queue_order
+    PLACE       an actor placed by the player
+    KEYFRAME    the checksum and a snapshot of the sim, used for seeking
+
+AI orders are all given through add_order so they're recorded along
+with the player's and the AIs themselves are not run during playback.
+"""
+
+import sys
+import json
+import zlib
+import struct
+
+from engine.logic import snapshots
+
+magic = b"SQRP"
+version = 1
+
+_header = struct.Struct("<4sH")
+_record = struct.Struct("<BII")
+_checksum = struct.Struct("<I")
+
+SETUP = 1
+ORDER = 2
+PLACE = 3
+KEYFRAME = 4
+
+def pack_keyframe(sim):
+    """A snapshot of the sim along with its checksum"""
+    return _checksum.pack(sim.checksum()) + sim.snapshot()
+
+def unpack_keyframe(payload):
+    """Returns the checksum and the snapshot"""
+    return _checksum.unpack_from(payload, 0)[0], payload[_checksum.size:]
+
+class Recorder (object):
+    def __init__(self, file_path, keyframe_interval=300):
+        super(Recorder, self).__init__()
+        
+        # Ticks between keyframes, 0 means no keyframes
+        self.keyframe_interval = keyframe_interval
+        
+        self.file = open(file_path, "wb")
+        self.file.write(_header.pack(magic, version))
+    
+    def write(self, kind, tick, payload):
+        self.file.write(_record.pack(kind, tick, len(payload)))
+        self.file.write(payload)
+    
+    def setup(self, config, setup, game):
+        """Called with the data the sim is loaded from before it's loaded"""
+        data = json.dumps([config, setup, game], separators=(",", ":"))
+        self.write(SETUP, 0, zlib.compress(data.encode("utf-8")))
+    
+    def order(self, tick, queued, the_actor, command, pos, target):
+        self.write(ORDER, tick, snapshots.pack_value((queued, the_actor, command, pos, target)))
+    
+    def place(self, tick, actor_data):
+        self.write(PLACE, tick, snapshots.pack_value(actor_data))
+    
+    def end_tick(self, sim):
+        if self.keyframe_interval > 0 and sim.tick % self.keyframe_interval == 0:
+            self.write(KEYFRAME, sim.tick, pack_keyframe(sim))
+            self.file.flush()
+    
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+def read(file_path):
+    """Returns a list of (kind, tick, payload)"""
+    with open(file_path, "rb") as f:
+        data = f.read()
+    
+    if len(data) < _header.size:
+        raise Exception("%s is not a replay" % file_path)
+    
+    file_magic, file_version = _header.unpack_from(data, 0)
+    if file_magic != magic:
+        raise Exception("%s is not a replay" % file_path)
+    
+    if file_version != version:
+        raise Exception("%s is replay version %d, only version %d can be played" % (
+            file_path, file_version, version
+        ))
+    
+    records = []
+    offset = _header.size
+    
+    # A replay whose game didn't exit cleanly can end part way through
+    # a record, anything before that is still good
+    while offset + _record.size <= len(data):
+        kind, tick, length = _record.unpack_from(data, offset)
+        offset += _record.size
+        
+        if offset + length > len(data):
+            break
+        
+        records.append((kind, tick, data[offset:offset+length]))
+        offset += length
+    
+    return records
+
+class Player (object):
+    def __init__(self, file_path, engine=None, sim_class=None):
+        super(Player, self).__init__()
+        
+        self.setup = None
+        
+        # tick -> list of (kind, data) in the order they were recorded
+        self.events = {}
+        
+        # tick -> payload, only unpacked when seeking
+        self.keyframes = {}
+        self.last_tick = 0
+        
+        for kind, tick, payload in read(file_path):
+            self.last_tick = max(self.last_tick, tick)
+            
+            if kind == SETUP:
+                self.setup = json.loads(zlib.decompress(payload).decode("utf-8"))
+            elif kind == ORDER or kind == PLACE:
+                if tick not in self.events:
+                    self.events[tick] = []
+                self.events[tick].append((kind, snapshots.unpack_value(payload)[0]))
+            elif kind == KEYFRAME:
+                self.keyframes[tick] = payload
+            else:
+                raise KeyError("No replay record kind of %d" % kind)
+        
+        if self.setup == None:
+            raise Exception("%s has no setup record" % file_path)
+        
+        self.engine = engine
+        self.sim_class = sim_class
+        
+        # Keyframe checksums are compared as they're passed, any that
+        # differ are listed here as (tick, recorded, actual)
+        self.check_keyframes = True
+        self.desyncs = []
+        
+        self.sim = None
+        self.reset()
+    
+    def reset(self):
+        """Builds a new sim from the setup, ready to play from tick 0"""
+        from engine.logic import headless_sim
+        
+        if self.engine == None:
+            self.engine = headless_sim.HeadlessEngine(
+                size_cache="%s/data/image_sizes.json" % sys.path[0])
+        
+        sim_class = self.sim_class or headless_sim.HeadlessSim
+        
+        if self.sim != None:
+            self.sim.quit()
+        
+        config, setup, game = json.loads(json.dumps(self.setup))
+        
+        # The AIs' orders are in the replay
+        game['ais'] = {}
+        
+        self.sim = self.engine.set_screen(sim_class)
+        self.sim.load_config(config)
+        self.sim.load_setup(setup)
+        self.sim.load_game(game)
+        
+        return self.sim
+    
+    def _apply_events(self):
+        sim = self.sim
+        
+        for kind, data in self.events.get(sim.tick, []):
+            if kind == PLACE:
+                sim.place_actor(data)
+                continue
+            
+            queued, the_actor, command, pos, target = snapshots.from_refs(data, sim.actor_lookup)
+            if the_actor == None:
+                continue
+            
+            if queued:
+                sim.queue_order(the_actor, command, pos=pos, target=target)
+            else:
+                sim.add_order(the_actor, command, pos=pos, target=target)
+    
+    def step(self):
+        """Gives the orders from this tick and runs a logic cycle"""
+        self._apply_events()
+        self.sim.logic_cycle()
+        
+        if self.check_keyframes and self.sim.tick in self.keyframes:
+            recorded = _checksum.unpack_from(self.keyframes[self.sim.tick], 0)[0]
+            actual = self.sim.checksum()
+            
+            if recorded != actual:
+                self.desyncs.append((self.sim.tick, recorded, actual))
+    
+    def play(self, to_tick=None):
+        """Runs flat out until to_tick or the end of the replay"""
+        if to_tick == None:
+            to_tick = self.last_tick
+        
+        while self.sim.tick < to_tick:
+            self.step()
+        
+        return self.sim
+    
+    def seek(self, tick):
+        """Jumps to the latest keyframe at or before tick (when it's not
+        quicker to just keep playing) and plays up to tick"""
+        keyframe_ticks = [t for t in self.keyframes.keys() if t <= tick]
+        
+        start = 0
+        if keyframe_ticks != []:
+            start = max(keyframe_ticks)
+        
+        if tick < self.sim.tick or start > self.sim.tick:
+            if start == 0:
+                self.reset()
+            else:
+                self.sim.restore(unpack_keyframe(self.keyframes[start])[1])
+        
+        return self.play(tick)
@@ -0,0 +1,495 @@
+from __future__ import division
+
+"""
+Captures the state of a BattleSim so that it can be put back later,
+this is what replays use to seek.
+
+Orders and targets refer to actors, in a snapshot these become an
+ActorRef holding the oid of the actor and are turned back into actors
+when restored.
+
+pack_value and unpack_value turn a snapshot (or any other mix of None,
+bools, numbers, strings, lists, tuples, dicts and ActorRefs) into a
+compact string of bytes and back, dumps and loads do the same for a
+whole sim and compress the result.
+
+    blob = snapshots.dumps(sim)
+    ...
+    snapshots.loads(sim, blob)
+
+Bullets and effects are rebuilt through bullet_types and effect_types,
+a new subclass needs an entry in these before it can be snapshot.
+
+Actors that have died can still be referred to (e.g. they are in the
+enemy_targets of an actor that has yet to refresh its targets), these
+are kept as dead_actors and rebuilt without being added to the sim.
+"""
+
+import zlib
+import struct
+
+from engine.logic import bullets, effects, actor_subtypes
+
+class ActorRef (object):
+    """Stands in for an actor until it can be looked up again"""
+    __slots__ = ("oid",)
+    
+    def __init__(self, oid):
+        super(ActorRef, self).__init__()
+        self.oid = oid
+    
+    def __eq__(self, other):
+        return type(other) == ActorRef and other.oid == self.oid
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def __hash__(self):
+        return hash(("ActorRef", self.oid))
+    
+    def __repr__(self):
+        return "ActorRef(%s)" % self.oid
+
+def to_refs(value, seen=None):
+    """Copies value replacing any actors with ActorRefs, the actors are
+    added to seen (oid -> actor) if it is given"""
+    t = type(value)
+    
+    if t == list:
+        return [to_refs(v, seen) for v in value]
+    elif t == tuple:
+        return tuple([to_refs(v, seen) for v in value])
+    elif hasattr(value, "oid") and hasattr(value, "actor_type"):
+        if seen != None:
+            seen[value.oid] = value
+        return ActorRef(value.oid)
+    
+    return value
+
+def from_refs(value, actor_lookup):
+    """Copies value replacing any ActorRefs with the actors they refer to,
+    refs to actors no longer in actor_lookup become None"""
+    t = type(value)
+    
+    if t == list:
+        return [from_refs(v, actor_lookup) for v in value]
+    elif t == tuple:
+        return tuple([from_refs(v, actor_lookup) for v in value])
+    elif t == ActorRef:
+        return actor_lookup.get(value.oid, None)
+    
+    return value
+
+# Value packing, each value is a one byte tag followed by its data. The
+# packers and unpackers are looked up by type and tag respectively.
+_int = struct.Struct("<q")
+_float = struct.Struct("<d")
+_length = struct.Struct("<I")
+_oid = struct.Struct("<i")
+
+def _pack_none(value, out):
+    out.append(b"N")
+
+def _pack_bool(value, out):
+    if value:
+        out.append(b"T")
+    else:
+        out.append(b"F")
+
+def _pack_int(value, out):
+    out.append(b"i")
+    out.append(_int.pack(value))
+
+def _pack_float(value, out):
+    out.append(b"d")
+    out.append(_float.pack(value))
+
+def _pack_string(value, out):
+    data = value.encode("utf-8")
+    out.append(b"s")
+    out.append(_length.pack(len(data)))
+    out.append(data)
+
+def _pack_list(value, out):
+    out.append(b"l")
+    out.append(_length.pack(len(value)))
+    for v in value:
+        _pack(v, out)
+
+def _pack_tuple(value, out):
+    out.append(b"t")
+    out.append(_length.pack(len(value)))
+    for v in value:
+        _pack(v, out)
+
+def _pack_dict(value, out):
+    out.append(b"m")
+    out.append(_length.pack(len(value)))
+    for k, v in value.items():
+        _pack(k, out)
+        _pack(v, out)
+
+def _pack_ref(value, out):
+    out.append(b"a")
+    out.append(_oid.pack(value.oid))
+
+packers = {
+    type(None): _pack_none,
+    bool:       _pack_bool,
+    int:        _pack_int,
+    long:       _pack_int,
+    float:      _pack_float,
+    str:        _pack_string,
+    unicode:    _pack_string,
+    list:       _pack_list,
+    tuple:      _pack_tuple,
+    dict:       _pack_dict,
+    ActorRef:   _pack_ref,
+}
+
+def _pack(value, out):
+    t = type(value)
+    
+    if t in packers:
+        packers[t](value, out)
+    elif hasattr(value, "oid") and hasattr(value, "actor_type"):
+        _pack_ref(value, out)
+    else:
+        # Vec3s and StoreVectors
+        try:
+            _pack_list(list(value), out)
+        except TypeError:
+            raise Exception("Unable to pack %s (%s)" % (value, t))
+
+def _unpack_string(data, offset):
+    length = _length.unpack_from(data, offset)[0]
+    offset += _length.size
+    
+    value = data[offset:offset+length].decode("utf-8")
+    
+    # Keep plain strings plain where we can
+    try:
+        value = str(value)
+    except UnicodeEncodeError:
+        pass
+    
+    return value, offset + length
+
+def _unpack_list(data, offset):
+    length = _length.unpack_from(data, offset)[0]
+    offset += _length.size
+    
+    value = []
+    for i in range(length):
+        v, offset = _unpack(data, offset)
+        value.append(v)
+    
+    return value, offset
+
+def _unpack_tuple(data, offset):
+    value, offset = _unpack_list(data, offset)
+    return tuple(value), offset
+
+def _unpack_dict(data, offset):
+    length = _length.unpack_from(data, offset)[0]
+    offset += _length.size
+    
+    value = {}
+    for i in range(length):
+        k, offset = _unpack(data, offset)
+        v, offset = _unpack(data, offset)
+        value[k] = v
+    
+    return value, offset
+
+unpackers = {
+    b"N":   lambda data, offset: (None, offset),
+    b"T":   lambda data, offset: (True, offset),
+    b"F":   lambda data, offset: (False, offset),
+    b"i":   lambda data, offset: (_int.unpack_from(data, offset)[0], offset + _int.size),
+    b"d":   lambda data, offset: (_float.unpack_from(data, offset)[0], offset + _float.size),
+    b"a":   lambda data, offset: (ActorRef(_oid.unpack_from(data, offset)[0]), offset + _oid.size),
+    b"s":   _unpack_string,
+    b"l":   _unpack_list,
+    b"t":   _unpack_tuple,
+    b"m":   _unpack_dict,
+}
+
+def _unpack(data, offset):
+    tag = data[offset:offset+1]
+    
+    if tag not in unpackers:
+        raise KeyError("No value type for the tag '%s' at %d" % (tag, offset))
+    
+    return unpackers[tag](data, offset + 1)
+
+def pack_value(value):
+    out = []
+    _pack(value, out)
+    return b"".join(out)
+
+def unpack_value(data, offset=0):
+    """Returns the value and the offset after it"""
+    return _unpack(data, offset)
+
+# Snapshots
+def _snapshot_orders(orders, seen=None):
+    result = {}
+    for tick, tick_orders in orders.items():
+        result[tick] = [to_refs(tuple(o), seen) for o in tick_orders]
+    return result
+
+def _restore_orders(orders, actor_lookup):
+    result = {}
+    for tick, tick_orders in orders.items():
+        result[tick] = []
+        for o in tick_orders:
+            o = from_refs(o, actor_lookup)
+            
+            # The order is dropped if the actor it was for is gone
+            if o[0] != None:
+                result[tick].append(o)
+    
+    return result
+
+# Actors are kept as rows rather than dicts so the names aren't repeated
+# for every actor. The first few fields are what's needed to place the
+# actor and are all that is kept of dead actors.
+actor_fields = ("oid", "type", "team", "pos", "velocity", "facing", "hp",
+    "completion", "current_order", "order_queue", "micro_orders",
+    "rally_orders", "build_queue", "cargo", "next_ai_update",
+    "enemy_targets", "priority_targets", "abilities")
+placement_fields = 8
+
+def _actor_row(a):
+    return [a.oid, a.actor_type, a.team, list(a.pos), list(a.velocity),
+        list(a.facing), a.hp, a.completion]
+
+def snapshot_actor(a, seen=None):
+    abilities = []
+    for ab in a.abilities:
+        abilities.append([ab.charge, list(ab.facing)])
+    
+    row = _actor_row(a)
+    row.extend([
+        to_refs(list(a.current_order), seen),
+        to_refs([list(o) for o in a.order_queue], seen),
+        to_refs([list(o) for o in a.micro_orders], seen),
+        to_refs([list(o) for o in a.rally_orders], seen),
+        list(a.build_queue),
+        dict(a.cargo),
+        a.next_ai_update,
+        to_refs(list(a.enemy_targets), seen),
+        to_refs(list(a.priority_targets), seen),
+        abilities,
+    ])
+    
+    return row
+
+# Bullets and effects, class name -> (snapshot function, restore function)
+def _snapshot_shell(b):
+    return {
+        "pos":              list(b.pos),
+        "velocity":         list(b.velocity),
+        "size":             [b.width, b.height],
+        "image":            b.image,
+        "blast_radius":     b.blast_radius,
+        "damage":           b.damage,
+        "dissipation_func": b.dissipation_func,
+        "team":             b.team,
+        "use_vec3":         b.use_vec3,
+    }
+
+def _restore_shell(data):
+    b = bullets.Shell(data['pos'], data['velocity'], data['size'], data['image'],
+        data['blast_radius'], data['damage'], data['dissipation_func'])
+    b.team = data['team']
+    b.use_vec3 = data['use_vec3']
+    return b
+
+def _snapshot_beam(e):
+    return {
+        "origin":           e.origin,
+        "target":           e.target,
+        "colour":           list(e.colour),
+        "degrade":          list(e.degrade),
+        "duration":         e.duration,
+        "age":              e.age,
+    }
+
+def _restore_beam(data):
+    e = effects.Beam(data['origin'], data['target'], data['colour'],
+        degrade=data['degrade'])
+    e.duration = data['duration']
+    e.age = data['age']
+    return e
+
+def _snapshot_explosion(e):
+    return {
+        "center":           list(e.center),
+        "colour":           list(e.colour),
+        "radius":           e.radius,
+        "colour_change":    list(e.colour_change),
+        "radius_change":    e.radius_change,
+        "duration":         e.duration,
+        "age":              e.age,
+    }
+
+def _restore_explosion(data):
+    e = effects.Explosion(data['center'], data['colour'], data['radius'],
+        data['colour_change'], data['radius_change'])
+    e.duration = data['duration']
+    e.age = data['age']
+    return e
+
+bullet_types = {
+    "Shell":        (_snapshot_shell, _restore_shell),
+}
+
+effect_types = {
+    "Beam":         (_snapshot_beam, _restore_beam),
+    "Explosion":    (_snapshot_explosion, _restore_explosion),
+}
+
+def _snapshot_object(obj, types):
+    name = obj.__class__.__name__
+    if name not in types:
+        raise KeyError("No snapshot function for %s" % name)
+    
+    return [name, types[name][0](obj)]
+
+def _restore_object(data, types):
+    name, obj_data = data
+    if name not in types:
+        raise KeyError("No restore function for %s" % name)
+    
+    return types[name][1](obj_data)
+
+def snapshot(sim):
+    """Returns the state of the sim as plain data (see pack_value)"""
+    team_resources = {}
+    for team_id, t in sim.teams.items():
+        team_resources[team_id] = dict(t.resources)
+    
+    # Every actor referred to, any not in the sim are dead
+    seen = {}
+    
+    autotargeters = {}
+    for team_id, t in sim.autotargeters.items():
+        autotargeters[team_id] = to_refs(list(t.backlog), seen)
+    
+    actors = [snapshot_actor(a, seen) for a in sim.actors]
+    orders = _snapshot_orders(sim.orders, seen)
+    q_orders = _snapshot_orders(sim.q_orders, seen)
+    
+    dead_actors = []
+    for oid, a in sorted(seen.items()):
+        if oid not in sim.actor_lookup:
+            dead_actors.append(_actor_row(a))
+    
+    return {
+        "tick":             sim.tick,
+        "next_oid":         sim._current_actor_id,
+        "actors":           actors,
+        "dead_actors":      dead_actors,
+        "bullets":          [_snapshot_object(b, bullet_types) for b in sim.bullets],
+        "effects":          [_snapshot_object(e, effect_types) for e in sim.effects],
+        "teams":            team_resources,
+        "orders":           orders,
+        "q_orders":         q_orders,
+        "rng":              sim.rng.getstate(),
+        "collision_count":  sim._collision_inverval_count,
+        "next_ai_update":   sim.next_ai_update,
+        "autotargeters":    autotargeters,
+    }
+
+def _dead_actor(sim, data):
+    """Builds an actor that is referred to but not part of the sim"""
+    aclass = actor_subtypes.types[sim.actor_types[data['type']]['type']]
+    
+    a = aclass()
+    a.apply_template(sim.actor_types[data['type']])
+    a.apply_data(data)
+    a.oid = data['oid']
+    a.team_obj = sim.teams[a.team]
+    
+    return a
+
+def restore_actor(sim, data):
+    """Places the actor with the oid it had, its orders are restored
+    once all the actors exist"""
+    sim._current_actor_id = data['oid']
+    
+    a = sim.place_actor({
+        "type":         data['type'],
+        "team":         data['team'],
+        "pos":          list(data['pos']),
+        "velocity":     list(data['velocity']),
+        "facing":       list(data['facing']),
+        "hp":           data['hp'],
+        "completion":   data['completion'],
+    })
+    
+    a.rect.topleft = (a.pos[0] - a.rect.width/2, a.pos[1] - a.rect.height/2)
+    
+    a.build_queue = list(data['build_queue'])
+    a.cargo = dict(data['cargo'])
+    a.next_ai_update = data['next_ai_update']
+    
+    for ab, (charge, facing) in zip(a.abilities, data['abilities']):
+        ab.charge = charge
+        ab.facing = list(facing)
+    
+    return a
+
+def restore(sim, data):
+    """Replaces the state of the sim with that from snapshot(sim)"""
+    sim.remove_actors(list(sim.actors))
+    
+    sim.tick = data['tick']
+    sim.rng.setstate(data['rng'])
+    sim._collision_inverval_count = data['collision_count']
+    sim.next_ai_update = data['next_ai_update']
+    
+    for team_id, resources in data['teams'].items():
+        sim.teams[team_id].resources = dict(resources)
+    
+    actors = [dict(zip(actor_fields, row)) for row in data['actors']]
+    for actor_data in actors:
+        restore_actor(sim, actor_data)
+    
+    sim._current_actor_id = data['next_oid']
+    
+    # Now every actor exists we can point the orders at them
+    refs = dict(sim.actor_lookup)
+    for row in data['dead_actors']:
+        actor_data = dict(zip(actor_fields, row))
+        refs[actor_data['oid']] = _dead_actor(sim, actor_data)
+    
+    for actor_data in actors:
+        a = sim.actor_lookup[actor_data['oid']]
+        
+        a.current_order = from_refs(actor_data['current_order'], refs)
+        a.order_queue = from_refs(actor_data['order_queue'], refs)
+        a.micro_orders = from_refs(actor_data['micro_orders'], refs)
+        a.rally_orders = from_refs(actor_data['rally_orders'], refs)
+        a.enemy_targets = from_refs(actor_data['enemy_targets'], refs)
+        a.priority_targets = from_refs(actor_data['priority_targets'], refs)
+    
+    sim.bullets[:] = [_restore_object(b, bullet_types) for b in data['bullets']]
+    sim.effects[:] = [_restore_object(e, effect_types) for e in data['effects']]
+    
+    for team_id, backlog in data['autotargeters'].items():
+        t = sim.autotargeters[team_id]
+        t.backlog = from_refs(backlog, refs)
+        t._backlog_oids = set([a.oid for a in t.backlog])
+    
+    sim.orders = _restore_orders(data['orders'], refs)
+    sim.q_orders = _restore_orders(data['q_orders'], refs)
+
+def dumps(sim):
+    """A snapshot of the sim as a compressed string of bytes"""
+    return zlib.compress(pack_value(snapshot(sim)))
+
+def loads(sim, blob):
+    restore(sim, unpack_value(zlib.decompress(blob))[0])
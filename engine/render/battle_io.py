@@ -197,10 +197,9 @@ class BattleIO (screen.Screen):
             if not drag:
                 if self.key_mod:
                     actor_target = None
-                    for a in self.actors:
-                        if actor_lib.contains_point(a, real_mouse_pos):
-                            actor_target = weakref.ref(a)()
-                            break
+                    for a in self.spatial_index.query_point(real_mouse_pos):
+                        actor_target = weakref.ref(a)()
+                        break
                     
                     if KMOD_SHIFT & mods:
                         for a in self.selected_actors:
@@ -215,10 +214,9 @@ class BattleIO (screen.Screen):
                     if not KMOD_SHIFT & mods:
                         self.unselect_all_actors()
                 
-                    for a in self.actors:
-                        if actor_lib.contains_point(a, real_mouse_pos):
-                            self.left_click_actor(a)
-                            break
+                    for a in self.spatial_index.query_point(real_mouse_pos):
+                        self.left_click_actor(a)
+                        break
             elif drag:
                 self.key_mod = None
         
@@ -227,10 +225,9 @@ class BattleIO (screen.Screen):
                 return
         
             actor_target = None
-            for a in self.actors:
-                if actor_lib.contains_point(a, real_mouse_pos):
-                    actor_target = weakref.ref(a)()
-                    break
+            for a in self.spatial_index.query_point(real_mouse_pos):
+                actor_target = weakref.ref(a)()
+                break
             
             # No actor clicked, this means we're moving
             if not actor_target:
@@ -281,8 +278,8 @@ class BattleIO (screen.Screen):
         )
         
         # Now check actors
-        for a in self.actors:
-            if actor_lib.contains_point(a, first_real_mouse_pos) and actor_lib.contains_point(a, second_real_mouse_pos):
+        for a in self.spatial_index.query_point(first_real_mouse_pos):
+            if actor_lib.contains_point(a, second_real_mouse_pos):
                 self.double_left_click_actor(a)
                 break
     
@@ -303,7 +300,7 @@ class BattleIO (screen.Screen):
             -self.scroll_y + self.draw_area[3]
         )
         
-        for a in self.actors:
+        for a in self.spatial_index.query_rect(scr_rect):
             if a.actor_type == act.actor_type:
                 if actor_lib.is_inside(a, scr_rect):
                     actors_to_select.append(a)
@@ -368,7 +365,7 @@ class BattleIO (screen.Screen):
             # First see if there are friendlies there
             # if the selection contains friendlies then we
             # should only select the friendlies
-            for a in self.actors:
+            for a in self.spatial_index.query_rect(drag_rect):
                 if actor_lib.is_inside(a, drag_rect):
                     if a.team == self.player_team:
                         contains_friendly = True
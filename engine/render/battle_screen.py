@@ -16,14 +16,21 @@ import weakref
 import pygame
 from pygame.locals import *
 
-from engine.render import battle_io
-from engine.libs import screen_lib, actor_lib, vectors
+from engine.render import battle_io, panels
+from engine.libs import screen_lib, actor_lib, vectors, tick_profiler
 
 class BattleScreen (battle_io.BattleIO):
     self_regulate = True
     player_team = None
     facings = 360/4# The number of different angles we'll draw
     
+    # Actors are drawn between where they were at the start of the last
+    # tick and where they are now
+    interpolate = True
+    
+    # The phases shown by the profiler overlay
+    profiler_phases = ("render",)
+    
     def __init__(self, engine):
         super(BattleScreen, self).__init__(engine)
         
@@ -38,8 +45,12 @@ class BattleScreen (battle_io.BattleIO):
         # want to draw battlefield stuff to these
         self.draw_margin = [0, 0]
         
-        self.background_image = pygame.Surface((1,1))
-        self.background = pygame.Surface((1,1))
+        if self.headless:
+            self.background_image = None
+            self.background = None
+        else:
+            self.background_image = pygame.Surface((1,1))
+            self.background = pygame.Surface((1,1))
         
         self.selected_actors = []
         
@@ -57,6 +68,12 @@ class BattleScreen (battle_io.BattleIO):
         self.redraw_count = [0, 0]
         self._current_actor_id = 0
         
+        # How far (0 to 1) we are between the last tick and the next one
+        self.interpolation = 1
+        
+        # Times each phase of the logic cycle and the redraw
+        self.profiler = tick_profiler.TickProfiler()
+        
         # This is switched instead of a function call because it's possible
         # that we may alter the selection several times in a row and it would
         # be a waste to rebuild menus several times
@@ -78,6 +95,9 @@ class BattleScreen (battle_io.BattleIO):
             # print("FPS: %s" % self.redraw_count[0])
             self.redraw_count = [0, int(time.time())]
         
+        if self.profiler.enabled:
+            redraw_start = time.time()
+        
         # Draw background taking into account scroll
         surf = self.engine.display
         surf.blit(self.background_image, pygame.Rect(
@@ -102,11 +122,18 @@ class BattleScreen (battle_io.BattleIO):
                     angle = rounded_facing
                 )
             
+            # Where to draw it, part way between ticks if we can
+            if self.interpolate and a.last_pos != None:
+                pos_x = a.last_pos[0] + (a.pos[0] - a.last_pos[0]) * self.interpolation
+                pos_y = a.last_pos[1] + (a.pos[1] - a.last_pos[1]) * self.interpolation
+            else:
+                pos_x, pos_y = a.pos[0], a.pos[1]
+            
             # Get the actor's image and rectangle
             actor_img = self.image_cache[img_name]
             r = pygame.Rect(actor_img.get_rect())
-            r.left = a.pos[0] + self.draw_margin[0] - r.width/2
-            r.top = a.pos[1] + self.draw_margin[1] - r.height/2
+            r.left = pos_x + self.draw_margin[0] - r.width/2
+            r.top = pos_y + self.draw_margin[1] - r.height/2
             
             # Only draw actors within the screen
             if r.right > self.draw_area[0] and r.left < self.draw_area[2]:
@@ -137,8 +164,8 @@ class BattleScreen (battle_io.BattleIO):
                             centre_offset = self.engine.images[ab.image].get_rotated_offset(ab_rounded_facing)
                             ability_img = self.image_cache[ab_img_name]
                             r = pygame.Rect(ability_img.get_rect())
-                            r.left = a.pos[0] + self.draw_margin[0] - r.width/2 + centre_offset[0] + rel_pos[0]
-                            r.top = a.pos[1] + self.draw_margin[1] - r.height/2 + centre_offset[1] + rel_pos[1]
+                            r.left = pos_x + self.draw_margin[0] - r.width/2 + centre_offset[0] + rel_pos[0]
+                            r.top = pos_y + self.draw_margin[1] - r.height/2 + centre_offset[1] + rel_pos[1]
                             surf.blit(ability_img, r)
                     
                     # Selection box?
@@ -153,15 +180,6 @@ class BattleScreen (battle_io.BattleIO):
                     # Draw completion box anyway
                     if a.completion < 100:
                         surf.blit(*a.completion_bar(self.draw_margin[0], self.draw_margin[1]))
-            
-            # Pass effects from the actor to the battle screen
-            # this means that if the actor dies the effect still lives on
-            while len(a.effects) > 0:
-                self.effects.append(a.effects.pop())
-            
-            # Do same with bullets
-            while len(a.bullets) > 0:
-                self.bullets.append(a.bullets.pop())
         
         # Bullets
         for b in self.bullets:
@@ -223,6 +241,37 @@ class BattleScreen (battle_io.BattleIO):
         pygame.display.flip()
         self._next_redraw = time.time() + self._redraw_delay
         self.redraw_count[0] += 1
+        
+        if self.profiler.enabled:
+            self.profiler.record("render", time.time() - redraw_start)
+    
+    def show_profiler(self, position=(200, 50)):
+        """Adds a panel showing the p50/p95/p99 of each phase the
+        profiler knows about"""
+        phases = self.profiler_phases
+        for phase in phases:
+            self.profiler.add_phase(phase)
+        
+        p = panels.InfoBox(self.engine,
+            size = (480, len(phases) * 20 + 10),
+            position = position,
+            fill_colour = (0,0,0),
+        )
+        p.always_changed = True
+        
+        for i, phase in enumerate(phases):
+            for j, pc in enumerate(tick_profiler.percentiles):
+                p.add_text(
+                    obj = self.profiler,
+                    attribute = "summary",
+                    key = "%s_p%d" % (phase, pc),
+                    position = (j*150 + 10, i*20 + 5),
+                    prefix = "%s p%d: " % (phase, pc),
+                    suffix = "ms",
+                    typecast = "float",
+                )
+        
+        self.panels["profiler"] = p
     
     def place_actor_mode(self, actor_type):
         """Used to enter placement mode where an icon hovers beneath the
@@ -234,7 +283,12 @@ class BattleScreen (battle_io.BattleIO):
         self.mouseup_callback_args = [{"type":actor_type}]
     
     def add_actor(self, a):
-        a.rect = self.engine.images[a.image].get_rect()
+        # Without images (e.g. headless) we fall back to the template size
+        size = self.engine.get_image_size(a.image)
+        if size == None:
+            size = a.size
+        
+        a.rect = pygame.Rect((0, 0), size)
         a.oid = self._current_actor_id
         self._current_actor_id += 1
         self.actors.append(a)
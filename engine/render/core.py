@@ -42,6 +42,14 @@ class EngineV3 (object):
         
         self.display = pygame.display.set_mode((self.window_width, self.window_height))
     
+    def get_image_size(self, name):
+        """Returns the (width, height) of an image or None if there's
+        no image by that name"""
+        if name not in self.images:
+            return None
+        
+        return self.images[name].get_rect().size
+    
     def set_screen(self, s, *args, **kwargs):
         # s can be a screen instance or the name of a screen in self.screens
         if s in self.screens:
@@ -71,6 +79,7 @@ class EngineV3 (object):
     def start(self):
         try:
             self.startup()
+            last_frame = time.time()
             
             while True:
                 for event in pygame.event.get():
@@ -85,7 +94,12 @@ class EngineV3 (object):
                 # Check to see if a key has been held down
                 self.current_screen._handle_keyhold()
 
-                self.current_screen.update()
+                # The screen is told how long the last frame took so that
+                # it can run as many updates as fit in that time
+                now = time.time()
+                self.current_screen.advance(now - last_frame)
+                last_frame = now
+                
                 self.current_screen.redraw()
 
                 if not self.current_screen.self_regulate:
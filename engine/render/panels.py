@@ -350,6 +350,8 @@ class InfoBox (Panel):
             
             if t['typecast'] == "int":
                 v = int(v)
+            elif t['typecast'] == "float":
+                v = "%.2f" % v
             else:
                 raise Exception("No handler for typecast type of '%s'" % t['typecast'])
             
@@ -7,6 +7,10 @@ class Screen (object):
     # When set to true the screen has to regulate the FPS itself
     self_regulate = False
     
+    # A headless screen never draws or takes input so it has no
+    # need of surfaces (or a display to make them with)
+    headless = False
+    
     def __init__(self, dimensions):
         super(Screen, self).__init__()
         
@@ -25,7 +29,10 @@ class Screen (object):
         self.engine = None
         self.background_image = None
         
-        self.surf = pygame.Surface(dimensions)
+        if self.headless:
+            self.surf = None
+        else:
+            self.surf = pygame.Surface(dimensions)
         
         self._last_mouseup = [None, -1]
         self._double_click_interval = 0.25
@@ -39,6 +46,14 @@ class Screen (object):
         """
         raise Exception("{0}.game_logic() is not implemented".format(self.__class__))
     
+    def advance(self, frame_time):
+        """
+        Called by the engine once per frame with the time (in seconds) the
+        last frame took. Screens running at a fixed timestep override this
+        to update as many times as fit in that time.
+        """
+        self.update()
+    
     # Drawing
     def redraw(self):
         """Called every main loop cycle"""
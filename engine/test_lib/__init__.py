@@ -1,3 +1,3 @@
 import vector_t, geometry_t, battle_t, actor_t
 import object_base_t
-import screen_lib_t, math_lib_t, ai_lib_t
\ No newline at end of file
+import screen_lib_t, math_lib_t, ai_lib_t, sim_lib_t, spatial_lib_t, autotargeter_t, actor_store_t, headless_t, tick_profiler_t, replay_t, actor_table_t, wire_t, baseline_t
\ No newline at end of file
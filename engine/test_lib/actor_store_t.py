@@ -0,0 +1,70 @@
+from __future__ import division
+
+import pygame
+import unittest
+from engine.logic import actor_store, object_base
+
+def new_base(oid, pos, velocity, size=10):
+    ob = object_base.ObjectBase()
+    ob.oid = oid
+    ob.pos = list(pos)
+    ob.velocity = list(velocity)
+    ob.rect = pygame.Rect(0, 0, size, size)
+    return ob
+
+def _layout():
+    return [new_base(i, [i * 10, i * 5, 0], [i % 3 - 1, 2 - i % 5, (i % 2) * 0.5], 10 + i) for i in range(20)]
+
+class ActorStoreTests(unittest.TestCase):
+    def _check(self, expected, stored):
+        for e, s in zip(expected, stored):
+            self.assertEqual(e.pos, s.pos)
+            self.assertEqual(e.velocity, s.velocity)
+            self.assertEqual(e.rect, s.rect)
+    
+    def test_integrate(self):
+        for use_numpy in (False, True):
+            # Start small so it has to grow
+            store = actor_store.ActorStore(capacity=4, use_numpy=use_numpy)
+            expected = _layout()
+            stored = _layout()
+            
+            for a in stored:
+                store.add(a)
+            
+            self.assertEqual(len(store), 20)
+            self.assertEqual(type(stored[0].pos), actor_store.StoreVector)
+            
+            for step in range(10):
+                for a in expected:
+                    a.update()
+                store.integrate()
+                
+                self._check(expected, stored)
+                
+                # Change things through the views and by replacing them
+                for objects in (expected, stored):
+                    objects[step].velocity = [step, -step, 0]
+                    objects[step + 1].velocity[0] += 1
+                    objects[step + 2].pos = [50, 50, 50]
+            
+            # Remove from the middle and the end, the rest keep moving
+            for i in (19, 3, 7):
+                store.remove(stored[i])
+                self.assertEqual(stored[i].store_slot, None)
+                self.assertEqual(type(stored[i].pos), list)
+                
+                del(stored[i])
+                del(expected[i])
+            
+            self._check(expected, stored)
+            
+            for step in range(3):
+                for a in expected:
+                    a.update()
+                store.integrate()
+                self._check(expected, stored)
+            
+            self.assertRaises(KeyError, store.add, stored[0])
+
+suite = unittest.TestLoader().loadTestsFromTestCase(ActorStoreTests)
@@ -0,0 +1,152 @@
+import unittest
+import sys
+import Queue
+import multiprocessing
+import os
+from engine.logic import headless_sim
+from engine.ai import actor_table, core_ai
+
+def _read_in_process(table, result_queue):
+    table = table.reader()
+    seq, tick, rows = table.read()
+    result_queue.put((seq, tick, [table.make_actor(r).oid for r in rows]))
+
+class ActorTableTests (unittest.TestCase):
+    def setUp(self):
+        self.tables = []
+    
+    def tearDown(self):
+        for t in self.tables:
+            t.close()
+    
+    def new_sim(self):
+        e = headless_sim.HeadlessEngine(size_cache="%s/data/image_sizes.json" % sys.path[0])
+        
+        return headless_sim.new_sim(e,
+            config_path = "data/config.json",
+            setup_path = "data/game_data.json",
+            game_path = "engine/test_lib/battle_test_setups/headless_state.json",
+        )
+    
+    def new_table(self, sim, capacity=10):
+        table = actor_table.ActorTable(sorted(sim.actor_types.keys()), capacity)
+        self.tables.append(table)
+        return table
+    
+    def test_write_read(self):
+        sim = self.new_sim()
+        table = self.new_table(sim)
+        
+        sim.actors[1].issue_command("attack", target=sim.actors[2])
+        sim.actors[3].issue_command("move", [1500, 1000])
+        
+        table.write(sim.actors, 12)
+        self.assertEqual(table.sequence(), 2)
+        
+        seq, tick, rows = table.read()
+        self.assertEqual((seq, tick, len(rows)), (2, 12, 4))
+        
+        actors = [table.make_actor(r) for r in rows]
+        self.assertEqual([a.oid for a in actors], [0, 1, 2, 3])
+        self.assertEqual([a.team for a in actors], [a.team for a in sim.actors])
+        self.assertEqual(actors[0].actor_type, "Red tank")
+        self.assertEqual(actors[0].pos, [200, 200, 0])
+        self.assertEqual(actors[0].current_order, ("stop", -1, -1))
+        self.assertEqual(actors[1].current_order, ("attack", None, 2))
+        self.assertEqual(actors[3].current_order, ("move", [1500, 1000], None))
+        
+        if actor_table.numpy != None:
+            self.assertEqual(table.view().shape, (4, actor_table.row_size))
+            self.assertEqual(list(table.view()[:, 0]), [0, 1, 2, 3])
+        else:
+            self.assertEqual(len(table.view()), 4 * actor_table.row_size * 8)
+    
+    def test_seqlock(self):
+        sim = self.new_sim()
+        table = self.new_table(sim, capacity=2)
+        
+        table.write(sim.actors)
+        self.assertEqual(len(table.read()[2]), 2)
+        self.assertTrue(table.overflowed)
+        
+        # Mid write, the reader gives up rather than return half the rows
+        reader = table.reader()
+        self.tables.append(reader)
+        
+        seq, count, tick = table.header()
+        actor_table._header.pack_into(table.buffer, 0, seq + 1, count, tick)
+        self.assertEqual(reader.read(retries=5), None)
+        
+        # Readers can't change the table at all
+        self.assertRaises(Exception, reader.write, sim.actors)
+        self.assertRaises(TypeError, actor_table._header.pack_into, reader.buffer, 0, 0, 0, 0)
+        
+        if actor_table.numpy != None:
+            self.assertFalse(reader.view().flags.writeable)
+        
+        # The one that made it removes the file
+        table.close()
+        reader.close()
+        self.assertFalse(os.path.exists(table.file_path))
+    
+    def test_ai_reads_table(self):
+        sim = self.new_sim()
+        sim.ai_table = self.new_table(sim)
+        sim.out_queues[2] = Queue.Queue()
+        sim.ai_prefs[2] = {"actor_source": "table"}
+        
+        sim.run_ticks(30)
+        
+        # The actors went through the table rather than the queue
+        self.assertEqual(sim.out_queues[2].qsize(), 0)
+        self.assertEqual(sim.ai_table.sequence(), 2)
+        
+        ai = core_ai.AICore(Queue.Queue(), None, sim.ai_table)
+        ai.prefs['actor_source'] = "table"
+        ai.team = 2
+        ai.core_cycle()
+        
+        self.assertEqual(sorted(ai.actors.keys()), [a.oid for a in sim.actors])
+        self.assertEqual([a.oid for a in ai.own_actors], [2, 3])
+        
+        # And another process sees the same thing
+        result_queue = multiprocessing.Queue()
+        p = multiprocessing.Process(target=_read_in_process, args=(sim.ai_table, result_queue))
+        p.start()
+        result = result_queue.get(timeout=10)
+        p.join()
+        
+        self.assertEqual(result, (2, 0, [a.oid for a in sim.actors]))
+    
+    def test_ai_visibility(self):
+        sim = self.new_sim()
+        sim.ai_table = self.new_table(sim)
+        
+        ais = {}
+        for t in (1, 2):
+            sim.out_queues[t] = Queue.Queue()
+            sim.ai_prefs[t] = {"actor_source": "table"}
+            
+            ais[t] = core_ai.AICore(Queue.Queue(), None, sim.ai_table.reader())
+            ais[t].prefs['actor_source'] = "table"
+            ais[t].team = t
+            self.tables.append(ais[t].actor_table)
+        
+        # The table has every actor but each AI only reads what its team
+        # can see, the same as visible_actors
+        sim.run_ticks(1)
+        self.assertEqual(len(sim.ai_table.read()[2]), 4)
+        
+        for t in (1, 2):
+            ais[t].core_cycle()
+            self.assertEqual(sorted(ais[t].actors.keys()), [a.oid for a in sim.visible_actors(t)])
+        
+        self.assertEqual(sorted(ais[1].actors.keys()), [0, 1, 2])
+        
+        # Without visibility everyone sees everything
+        sim._ai_visibility = False
+        sim.run_ticks(30)
+        ais[1].core_cycle()
+        self.assertEqual(sorted(ais[1].actors.keys()), [0, 1, 2, 3])
+
+suite = unittest.TestLoader().loadTestsFromTestCase(ActorTableTests)
@@ -1,6 +1,8 @@
 import pygame
 import unittest
-from engine.libs import ai_lib
+from engine.libs import ai_lib, actor_lib
+from engine.logic import actors
+from engine.ai import core_ai
 
 class DummyActor (object):
     def __init__(self, *args):
@@ -27,5 +29,45 @@ class AILibTests(unittest.TestCase):
         
         for actor_list, new_rect, expected in vals:
             self.assertEqual(expected, ai_lib.place_actor(actor_list, new_rect, distance=100))
+    
+    def test_actor_deltas(self):
+        def _actor(oid, team, pos):
+            a = actors.Actor()
+            a.oid, a.team, a.pos, a.actor_type = oid, team, pos, "Red tank"
+            return a
+        
+        actor_list = [_actor(0, 1, [100, 100, 0]), _actor(1, 1, [200, 100, 0]), _actor(2, 2, [300, 100, 0])]
+        
+        state, created, removed, changed = ai_lib.actor_deltas({}, actor_list)
+        self.assertEqual([f['oid'] for f in created], [0, 1, 2])
+        self.assertEqual((removed, changed), ([], {}))
+        
+        # The AI starts from the full list
+        ai = core_ai.AICore(None, None)
+        ai.team = 1
+        ai._recieve_actors([actor_lib.make_stripped(f) for f in created])
+        
+        # One moves, one dies and one is built
+        actor_list[0].pos = [110, 100, 0]
+        actor_list[0].current_order = ["attack", None, actor_list[2]]
+        del(actor_list[1])
+        actor_list.append(_actor(3, 2, [400, 100, 0]))
+        
+        state, created, removed, changed = ai_lib.actor_deltas(state, actor_list)
+        self.assertEqual([f['oid'] for f in created], [3])
+        self.assertEqual(removed, [1])
+        self.assertEqual(changed, {0: {
+            "pos":              [110, 100, 0],
+            "current_order":    ("attack", None, 2),
+        }})
+        
+        ai._recieve_actor_deltas(created, removed, changed)
+        self.assertEqual(sorted(ai.actors.keys()), [0, 2, 3])
+        self.assertEqual([a.oid for a in ai.own_actors], [0])
+        self.assertEqual([a.oid for a in ai.enemy_actors], [2, 3])
+        self.assertEqual(ai.actors[0].pos, [110, 100, 0])
+        
+        # Nothing changed means nothing to send
+        self.assertEqual(ai_lib.actor_deltas(state, actor_list)[1:], ([], [], {}))
 
 suite = unittest.TestLoader().loadTestsFromTestCase(AILibTests)
\ No newline at end of file
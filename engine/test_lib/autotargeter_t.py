@@ -0,0 +1,67 @@
+import pygame
+import unittest
+from engine.ai import autotargeter
+from engine.libs import spatial_lib
+
+class DummyActor (object):
+    def __init__(self, oid, x, y, team):
+        super(DummyActor, self).__init__()
+        self.oid = oid
+        self.team = team
+        self.hp = 10
+        self.pos = [x, y, 0]
+        self.rect = pygame.Rect(0, 0, 20, 20)
+        self.max_attack_range = 100
+        self.enemy_targets = []
+        self.next_ai_update = 0
+
+class DummySim (object):
+    def __init__(self, actors):
+        super(DummySim, self).__init__()
+        self.spatial_index = spatial_lib.SpatialIndex(50)
+        for a in actors:
+            self.spatial_index.add(a)
+
+class AutotargeterTests(unittest.TestCase):
+    def test_update_actor(self):
+        actors = [
+            DummyActor(0, 0, 0, 1),
+            DummyActor(1, 90, 0, 2),
+            DummyActor(2, 30, 0, 2),
+            DummyActor(3, 10, 0, 1),
+            DummyActor(4, 0, 30, 2),
+            DummyActor(5, 200, 0, 2),
+        ]
+        
+        targeter = autotargeter.Autotargeter(DummySim(actors), 1)
+        targeter.update_actor(actors[0])
+        
+        # Nearest first, ties are broken by oid
+        self.assertEqual([2, 4, 1], [a.oid for a in actors[0].enemy_targets])
+    
+    def test_budget(self):
+        actors = [DummyActor(i, i * 10, 0, i % 2) for i in range(10)]
+        targeter = autotargeter.Autotargeter(DummySim(actors), 0, actor_budget=4)
+        
+        targeter.update()
+        results = [targeter.request_update(a) for a in actors]
+        self.assertEqual([True] * 4 + [False] * 6, results)
+        
+        # Asking again doesn't queue it twice
+        self.assertEqual(False, targeter.request_update(actors[9]))
+        self.assertEqual(6, len(targeter.backlog))
+        
+        # Dead actors are dropped from the backlog
+        actors[4].hp = 0
+        
+        targeter.update()
+        self.assertEqual((4, 6), targeter.history[-1])
+        self.assertEqual(4, targeter.refreshes)
+        self.assertEqual([9], [a.oid for a in targeter.backlog])
+        self.assertEqual(autotargeter.Autotargeter.refresh_interval, actors[5].next_ai_update)
+        
+        targeter.update()
+        self.assertEqual(1, targeter.refreshes)
+        self.assertEqual(0, targeter.counters()['backlog'])
+
+suite = unittest.TestLoader().loadTestsFromTestCase(AutotargeterTests)
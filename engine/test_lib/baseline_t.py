@@ -0,0 +1,118 @@
+from __future__ import division
+import unittest
+import os
+import tempfile
+from profile_lib import baseline, autoprofiler
+
+def _metric(median, mad=0, higher_is_better=False):
+    return {"median": median, "mad": mad, "higher_is_better": higher_is_better}
+
+class BaselineTests (unittest.TestCase):
+    def test_median(self):
+        self.assertEqual(baseline.median([3, 1, 2]), 2)
+        self.assertEqual(baseline.median([4, 1, 3, 2]), 2.5)
+        self.assertEqual(baseline.median([5]), 5)
+    
+    def test_mad(self):
+        self.assertEqual(baseline.mad([1, 2, 3, 4, 100]), 1)
+        self.assertEqual(baseline.mad([2, 2, 2]), 0)
+        
+        s = baseline.summarise([10, 12, 11, 30], higher_is_better=True)
+        self.assertEqual((s['median'], s['mad'], s['higher_is_better']), (11.5, 1, True))
+    
+    def _regressed(self, base, cur, **kwargs):
+        result = baseline.compare({"m": cur}, {"m": base}, **kwargs)
+        self.assertEqual(len(result), 1)
+        return result[0][4]
+    
+    def test_compare(self):
+        # 20% worse with no noise
+        self.assertTrue(self._regressed(_metric(100), _metric(120), threshold=0.1))
+        
+        # Worse, but not by more than the threshold
+        self.assertFalse(self._regressed(_metric(100), _metric(105), threshold=0.1))
+        
+        # Past the threshold but within mad_factor * (mad + mad) of the baseline
+        self.assertFalse(self._regressed(_metric(100, 5), _metric(120, 5), threshold=0.1, mad_factor=3))
+        self.assertTrue(self._regressed(_metric(100, 3), _metric(120, 3), threshold=0.1, mad_factor=3))
+        
+        # Got faster
+        result = baseline.compare({"m": _metric(80)}, {"m": _metric(100)})
+        self.assertEqual(result, [("m", 100, 80, -0.2, False)])
+        
+        # Metrics missing from the baseline are skipped
+        self.assertEqual(baseline.compare({"new": _metric(1)}, {}), [])
+    
+    def test_higher_is_better(self):
+        self.assertTrue(self._regressed(_metric(100, higher_is_better=True),
+            _metric(80, higher_is_better=True), threshold=0.1))
+        self.assertFalse(self._regressed(_metric(100, higher_is_better=True),
+            _metric(120, higher_is_better=True), threshold=0.1))
+    
+    def test_min_value(self):
+        # Too small to time reliably
+        self.assertFalse(self._regressed(_metric(0.01), _metric(1), min_value=0.05))
+        self.assertTrue(self._regressed(_metric(0.01), _metric(1), min_value=0))
+        self.assertTrue(self._regressed(_metric(0.05), _metric(1), min_value=0.05))
+        
+        # A zero baseline has no change to speak of
+        self.assertFalse(self._regressed(_metric(0), _metric(1)))
+    
+    def test_check(self):
+        fd, file_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        
+        try:
+            baseline.save(file_path, "test", {"m": baseline.summarise([100, 101, 99])})
+            
+            # Passes quietly, fails with a non-zero exit status
+            baseline.check({"m": baseline.summarise([100, 102, 98])}, file_path, threshold=0.1)
+            self.assertRaises(SystemExit, baseline.check,
+                {"m": baseline.summarise([150, 151, 149])}, file_path, threshold=0.1)
+        finally:
+            os.remove(file_path)
+    
+    def _autoprofiler_run(self, scale):
+        # The same shape as autoprofiler.run_profilers() gives
+        results = {"Movement (fast)": 1.0 * scale, "Range checks (squared)": 0.5 * scale}
+        for engine_name, make_engine in autoprofiler.collision_engines:
+            results[engine_name] = {"No collisions": 0.2 * scale, "Mass all collisions": 2.0 * scale}
+        
+        return results
+    
+    def test_autoprofiler(self):
+        runs = [self._autoprofiler_run(s) for s in (1, 1.02, 0.98)]
+        metrics = autoprofiler.metrics(runs)
+        
+        self.assertEqual(sorted(metrics.keys()), [
+            "Movement (fast)", "Range checks (squared)",
+            "brute/Mass all collisions", "brute/No collisions",
+            "grid/Mass all collisions", "grid/No collisions",
+            "sweep/Mass all collisions", "sweep/No collisions",
+        ])
+        self.assertEqual(metrics["grid/Mass all collisions"]['samples'], [2.0, 2.04, 1.96])
+        self.assertEqual(metrics["grid/Mass all collisions"]['median'], 2.0)
+        
+        fd, file_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        
+        try:
+            baseline.save(file_path, "autoprofiler", metrics, {"repeat": 3})
+            
+            data = baseline.load(file_path)
+            self.assertEqual(data['kind'], "autoprofiler")
+            self.assertEqual(data['metrics'], metrics)
+            
+            # The same timings pass, slower collisions fail
+            baseline.check(autoprofiler.metrics(runs), file_path, threshold=0.1, min_value=0.05)
+            
+            slower = [self._autoprofiler_run(s) for s in (1, 1.02, 0.98)]
+            for r in slower:
+                r["sweep"]["Mass all collisions"] *= 1.5
+            
+            self.assertRaises(SystemExit, baseline.check, autoprofiler.metrics(slower),
+                file_path, threshold=0.1, min_value=0.05)
+        finally:
+            os.remove(file_path)
+
+suite = unittest.TestLoader().loadTestsFromTestCase(BaselineTests)
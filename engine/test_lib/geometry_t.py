@@ -133,8 +133,36 @@ class GeometryTests(unittest.TestCase):
                 print("Failure on sides with inputs of A=%s, B=%s" % (act1, act2))
                 raise
             
+    def test_overlapping_pairs(self):
+        bounds = [(i*30, (i % 5) * 20, i*30 + 41, (i % 5) * 20 + 41) for i in range(100)]
+        bounds.extend([(100, 100, 141, 141) for i in range(50)])
         
+        expected = []
+        for i in range(len(bounds)):
+            for j in range(i+1, len(bounds)):
+                if geometry.rect_collision(bounds[i], bounds[j]):
+                    expected.append((i, j))
+        
+        self.assertEqual(expected, geometry._overlapping_pairs_python(bounds))
+        self.assertEqual(expected, geometry.overlapping_pairs(bounds))
+        
+        # The vectorised kernel is optional
+        if geometry.numpy != None:
+            self.assertEqual(expected, geometry._overlapping_pairs_numpy(bounds))
     
+    def test_overlaps_any(self):
+        bounds = [(i*100, 0, i*100 + 41, 41) for i in range(100)]
+        
+        vals = (
+            ((50, 0, 90, 41), False),
+            ((50, 0, 100, 41), True),# Touching edge
+            ((-50, -50, 10000, -1), False),
+            ((5000, 20, 5001, 21), True),
+        )
+        
+        for rect, expected in vals:
+            self.assertEqual(expected, geometry.overlaps_any(bounds, rect))
+            self.assertEqual(expected, geometry.overlaps_any(bounds[:10], rect) or geometry.overlaps_any(bounds[10:], rect))
 
 
 
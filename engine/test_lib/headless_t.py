@@ -0,0 +1,227 @@
+import unittest
+import sys
+import Queue
+from engine.logic import headless_sim
+from engine.libs import sim_lib
+from engine.ai import core_ai
+
+class HeadlessTests (unittest.TestCase):
+    def new_sim(self, config="data/config.json"):
+        e = headless_sim.HeadlessEngine(size_cache="%s/data/image_sizes.json" % sys.path[0])
+        
+        return headless_sim.new_sim(e,
+            config_path = config,
+            setup_path = "data/game_data.json",
+            game_path = "engine/test_lib/battle_test_setups/headless_state.json",
+        )
+    
+    def test_load(self):
+        sim = self.new_sim()
+        
+        self.assertEqual(sim.surf, None)
+        self.assertEqual(len(sim.actors), 4)
+        
+        # Sizes come from the cache rather than the images
+        self.assertEqual(sim.actor_types['Red tank']['size'], (41, 56))
+        self.assertEqual(sim.actors[0].rect.size, (41, 56))
+    
+    def test_logic_cycle(self):
+        sim = self.new_sim()
+        
+        sim.actors[3].issue_command("move", [1500, 1000])
+        
+        for i in range(200):
+            sim.logic_cycle()
+        
+        # The nearby tanks have fought, the distant one has moved
+        self.assertEqual([0, 1, 3], [a.oid for a in sim.actors])
+        self.assertTrue(sim.actor_lookup[0].hp < sim.actor_lookup[0].max_hp)
+        self.assertEqual([int(p) for p in sim.actor_lookup[3].pos], [1500, 1000, 0])
+    
+    def test_run_ticks(self):
+        sim1 = self.new_sim()
+        sim2 = self.new_sim()
+        
+        for i in range(150):
+            sim1.logic_cycle()
+        sim2.run_ticks(150, render_every=10)
+        
+        # Running flat out must not change the outcome
+        self.assertEqual(sim1.tick, sim2.tick)
+        self.assertEqual(
+            [(a.oid, a.hp, list(a.pos)) for a in sim1.actors],
+            [(a.oid, a.hp, list(a.pos)) for a in sim2.actors],
+        )
+    
+    def test_advance(self):
+        sim = self.new_sim()
+        sim_lib.set_speed(sim, 10)
+        sim.interpolate = True
+        
+        # Two and a half ticks worth of time
+        sim.advance(0.25)
+        self.assertEqual(sim.tick, 2)
+        self.assertAlmostEqual(sim.interpolation, 0.5)
+        self.assertEqual(sim.actors[0].last_pos, (200, 200))
+        
+        # Too far behind, we only catch up by max_steps_per_frame
+        sim.advance(1.05)
+        self.assertEqual(sim.tick, 2 + sim.max_steps_per_frame)
+        self.assertEqual(sim.dropped_ticks, 11 - sim.max_steps_per_frame)
+    
+    def test_profiler(self):
+        sim = self.new_sim()
+        sim.profiler.enabled = True
+        
+        sim.run_ticks(30)
+        
+        self.assertEqual(sim.profiler.phases, ["ai_queues", "orders", "autotargeters",
+            "actors", "bullets", "effects", "collisions"])
+        self.assertEqual(sim.profiler.ticks, 30)
+        
+        # Lag is reported on the panel rather than printed
+        sim.show_profiler()
+        self.assertEqual([t['attribute'] for t in sim.panels["profiler"].texts][-1], "dropped_ticks")
+    
+    def test_no_growth(self):
+        sim = self.new_sim()
+        sim.run_ticks(300)
+        
+        # Dead actors and old order slots must not be held onto
+        self.assertEqual(sorted(sim.actor_lookup.keys()), [a.oid for a in sim.actors])
+        self.assertEqual(len(sim.spatial_index), len(sim.actors))
+        self.assertEqual(len(sim.orders), sim.tick_jump + 1)
+        self.assertEqual(len(sim.q_orders), sim.tick_jump + 1)
+    
+    def test_remove_actors(self):
+        sim = self.new_sim()
+        dead = [sim.actors[0], sim.actors[2]]
+        
+        for a in (sim.actors[0], sim.actors[1], sim.actors[2]):
+            a.selected = True
+            sim.selected_actors.append(a)
+        
+        sim.control_groups[1] = [sim.actors[0], sim.actors[1]]
+        sim.control_groups[2] = [sim.actors[2], sim.actors[3]]
+        sim.control_groups[3] = [sim.actors[0], sim.actors[2]]
+        
+        # Both die in the same tick
+        for a in dead:
+            a.hp = 0
+        sim.run_ticks(1)
+        
+        self.assertEqual([a.oid for a in sim.actors], [1, 3])
+        self.assertEqual(sorted(sim.actor_lookup.keys()), [1, 3])
+        self.assertEqual([a.oid for a in sim.selected_actors], [1])
+        self.assertEqual([a.oid for a in sim.control_groups[1]], [1])
+        self.assertEqual([a.oid for a in sim.control_groups[2]], [3])
+        self.assertEqual(sim.control_groups[3], [])
+        
+        for a in dead:
+            self.assertFalse(a.selected)
+            self.assertFalse(a.oid in sim.spatial_index.actors)
+            self.assertFalse(a in sim.spatial_index.query_radius(a.pos, 50))
+        
+        self.assertEqual(len(sim.spatial_index), 2)
+    
+    def test_determinism(self):
+        config = "engine/test_lib/battle_test_setups/deterministic_config.json"
+        sims = [self.new_sim(config), self.new_sim(config), self.new_sim(config)]
+        
+        for sim in sims:
+            sim.actors[3].issue_command("move", [1500, 1000])
+        
+        # One of them gets a different order
+        sims[2].actors[1].issue_command("move", [100, 300])
+        
+        for sim in sims:
+            sim.run_ticks(150)
+        
+        self.assertEqual(len(sims[0].checksums), 150)
+        self.assertEqual(list(sims[0].checksums), list(sims[1].checksums))
+        self.assertNotEqual(list(sims[0].checksums), list(sims[2].checksums))
+        
+        # The random numbers are the same too
+        self.assertEqual(sims[0].rng.random(), sims[1].rng.random())
+    
+    def test_snapshot(self):
+        config = "engine/test_lib/battle_test_setups/deterministic_config.json"
+        sim = self.new_sim(config)
+        sim.actors[1].issue_command("attack", target=sim.actors[2])
+        
+        # Part way through the fight, there are bullets in the air
+        sim.run_ticks(140)
+        blob = sim.snapshot()
+        self.assertTrue(len(sim.bullets) + len(sim.effects) > 0)
+        
+        sim.run_ticks(40)
+        expected = list(sim.checksums)[-40:]
+        
+        # Restoring over the top of the sim or into a new one
+        sim.restore(blob)
+        self.assertEqual(sim.tick, 140)
+        sim.run_ticks(40)
+        self.assertEqual(list(sim.checksums)[-40:], expected)
+        
+        sim2 = self.new_sim(config)
+        sim2.restore(blob)
+        sim2.run_ticks(40)
+        self.assertEqual(list(sim2.checksums), expected)
+        self.assertEqual(sim2.snapshot(), sim.snapshot())
+    
+    def test_ai_deltas(self):
+        sim = self.new_sim()
+        sim.out_queues[2] = Queue.Queue()
+        sim.ai_prefs[2] = {"actor_format": "dict"}
+        sim.ai_resync_interval = 3
+        
+        ai = core_ai.AICore(sim.out_queues[2], None)
+        ai.prefs = sim.ai_prefs[2]
+        ai.team = 2
+        
+        # A full list, then deltas and then another full list
+        cmds = []
+        for i in range(4):
+            sim.run_ticks(30)
+            self.assertEqual(sim.out_queues[2].qsize(), 1)
+            
+            cmds.append(sim.out_queues[2].queue[0]['cmd'])
+            ai.read_queue()
+            
+            # The AI's copy matches what the sim last sent
+            self.assertEqual(dict([(oid, a.__dict__) for oid, a in ai.actors.items()]), sim._ai_actor_state[2])
+        
+        self.assertEqual(cmds, ["actors", "actor_deltas", "actors", "actor_deltas"])
+        self.assertEqual(sorted(ai.own_actors.keys()), [a.oid for a in sim.actors if a.team == 2])
+    
+    def test_ai_visibility(self):
+        sim = self.new_sim()
+        for t in (1, 2):
+            sim.out_queues[t] = Queue.Queue()
+            sim.ai_prefs[t] = {"actor_format": "list"}
+        
+        # Team 1 is in the corner, the tank at 1500, 1500 is too far
+        # away for it to see. Team 2 has a tank right next to it.
+        self.assertEqual([a.oid for a in sim.visible_actors(1)], [0, 1, 2])
+        self.assertEqual([a.oid for a in sim.visible_actors(2)], [0, 1, 2, 3])
+        
+        sim.run_ticks(1)
+        self.assertEqual([a.oid for a in sim.out_queues[1].get()['actor_list']], [0, 1, 2])
+        self.assertEqual([a.oid for a in sim.out_queues[2].get()['actor_list']], [0, 1, 2, 3])
+        
+        # Moving out of sight is the same as dying as far as the AI knows
+        sim.actors[2].pos = [1000, 200, 0]
+        sim.spatial_index.update(sim.actors[2])
+        sim.run_ticks(30)
+        
+        deltas = sim.out_queues[1].get()
+        self.assertEqual(deltas['cmd'], "actor_deltas")
+        self.assertEqual(deltas['removed'], [2])
+        self.assertEqual(sorted(sim._ai_actor_state[1].keys()), [0, 1])
+        
+        # Without visibility everyone sees everything
+        sim._ai_visibility = False
+        sim.run_ticks(30)
+        self.assertEqual([f['oid'] for f in sim.out_queues[1].get()['created']], [2, 3])
+
+suite = unittest.TestLoader().loadTestsFromTestCase(HeadlessTests)
@@ -3,7 +3,7 @@ from __future__ import division
 import pygame
 import unittest
 from engine.logic import object_base
-from engine.libs import actor_lib
+from engine.libs import actor_lib, vectors
 
 def new_base(pos=[0,0,0], velocity=[0,0], facing=[0,0], size=[10,10]):
     ob = object_base.ObjectBase()
@@ -35,5 +35,22 @@ class ObjectBaseTests(unittest.TestCase):
             result = actor_lib.contains_point(ob, point)
             
             self.assertEqual(result, expected)
+    
+    def test_update(self):
+        for use_vec3 in (False, True):
+            ob = new_base(pos=[100, 100, 0], velocity=[3, -4, 1])
+            ob.use_vec3 = use_vec3
+            
+            for i in range(5):
+                ob.update()
+            
+            self.assertEqual([115, 80, 5], list(ob.pos))
+            self.assertEqual((110, 75), ob.rect.topleft)
+            self.assertEqual(use_vec3, type(ob.pos) == vectors.Vec3)
+            
+            # Loading data can still replace it with a list
+            ob.pos = [0, 0, 0]
+            ob.update()
+            self.assertEqual([3, -4, 1], list(ob.pos))
 
 suite = unittest.TestLoader().loadTestsFromTestCase(ObjectBaseTests)
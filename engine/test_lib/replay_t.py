@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import tempfile
+from engine.logic import headless_sim, replay, snapshots
+
+class ReplayTests (unittest.TestCase):
+    def setUp(self):
+        fd, self.file_path = tempfile.mkstemp(suffix=".replay")
+        os.close(fd)
+    
+    def tearDown(self):
+        os.remove(self.file_path)
+    
+    def record(self, ticks=200, keyframe_interval=50):
+        """Records a battle, returns the sim and its checksum at each tick"""
+        e = headless_sim.HeadlessEngine(size_cache="%s/data/image_sizes.json" % sys.path[0])
+        sim = e.set_screen(headless_sim.HeadlessSim)
+        sim.recorder = replay.Recorder(self.file_path, keyframe_interval)
+        
+        sim.load_all(
+            "engine/test_lib/battle_test_setups/deterministic_config.json",
+            "data/game_data.json",
+            "engine/test_lib/battle_test_setups/headless_state.json",
+        )
+        
+        sim.add_order(sim.actor_lookup[3], "move", pos=[1500, 1000])
+        sim.run_ticks(60)
+        
+        sim.queue_order(sim.actor_lookup[3], "move", pos=[1200, 1000])
+        sim.add_order(sim.actor_lookup[1], "attack", target=sim.actor_lookup[2])
+        sim.run_ticks(ticks - 60)
+        
+        sim.quit()
+        return sim, list(sim.checksums)
+    
+    def test_pack_value(self):
+        ref = snapshots.ActorRef(4)
+        value = {
+            "a":    [1, 2.5, None, True, False],
+            "b":    (u"move", [1.0, 2.0, 0], ref),
+            3:      {"nested": []},
+        }
+        
+        data = snapshots.pack_value(value)
+        result, offset = snapshots.unpack_value(data)
+        
+        self.assertEqual(result, value)
+        self.assertEqual(offset, len(data))
+        self.assertEqual(type(result['b']), tuple)
+    
+    def test_play(self):
+        sim, checksums = self.record()
+        
+        p = replay.Player(self.file_path)
+        self.assertEqual(sorted(p.keyframes.keys()), [50, 100, 150, 200])
+        
+        p.play()
+        
+        self.assertEqual(p.sim.tick, 200)
+        self.assertEqual(p.desyncs, [])
+        self.assertEqual(list(p.sim.checksums), checksums)
+        self.assertEqual([a.oid for a in p.sim.actors], [a.oid for a in sim.actors])
+    
+    def test_seek(self):
+        sim, checksums = self.record()
+        
+        p = replay.Player(self.file_path)
+        p.play(30)
+        
+        # Jumps forward to the keyframe at 100 rather than playing from 30
+        p.seek(120)
+        self.assertEqual(p.sim.tick, 120)
+        self.assertEqual(p.sim.actor_lookup[3].order_queue, [["move", [1200, 1000], None]])
+        self.assertEqual(p.sim.checksum(), checksums[119])
+        
+        # After the battle is over
+        p.seek(190)
+        self.assertEqual(p.sim.checksum(), checksums[189])
+        
+        # Going back to before the first keyframe starts over
+        p.seek(20)
+        self.assertEqual(p.sim.tick, 20)
+        self.assertEqual(p.sim.checksum(), checksums[19])
+
+suite = unittest.TestLoader().loadTestsFromTestCase(ReplayTests)
@@ -0,0 +1,52 @@
+import pygame
+import unittest
+from engine.libs import sim_lib
+
+class DummyActor (object):
+    def __init__(self, *args):
+        super(DummyActor, self).__init__()
+        self.rect = pygame.Rect(*args)
+
+def _layout(positions, size=41):
+    return [DummyActor(x, y, size, size) for x, y in positions]
+
+class SimLibTests(unittest.TestCase):
+    def test_get_collisions(self):
+        vals = (
+            # No overlapping
+            _layout([(i*100, 100) for i in range(30)]),
+            
+            # Overlapping with the one either side
+            _layout([(i*30, 100) for i in range(30)]),
+            
+            # All in the same spot
+            _layout([(100, 100) for i in range(30)]),
+            
+            # Touching edges, spanning cell boundaries and negative positions
+            _layout([(59, 0), (100, 0), (-41, -41), (0, 0), (250, 250)]),
+            [DummyActor(0, 0, 500, 20), DummyActor(450, 10, 10, 10), DummyActor(480, 200, 10, 10)],
+        )
+        
+        for actors in vals:
+            expected = sim_lib.brute_force_collisions(actors)
+            
+            for cell_size in (10, 100, 1000):
+                self.assertEqual(expected, sim_lib.get_collisions(actors, cell_size))
+            
+            self.assertEqual(expected, sim_lib.SweepAndPrune().get_collisions(actors))
+    
+    def test_sweep_and_prune_persistence(self):
+        sap = sim_lib.SweepAndPrune()
+        actors = _layout([(i*50, (i % 3) * 30) for i in range(20)])
+        
+        for step in range(10):
+            self.assertEqual(sim_lib.brute_force_collisions(actors), sap.get_collisions(actors))
+            
+            # Shuffle them along the x-axis and remove/add a few
+            for i, a in enumerate(actors):
+                a.rect.left += (i % 4 - 2) * 15
+            
+            del(actors[step])
+            actors.append(DummyActor(step * 70, 20, 41, 41))
+
+suite = unittest.TestLoader().loadTestsFromTestCase(SimLibTests)
@@ -0,0 +1,109 @@
+from __future__ import division
+import pygame
+import unittest
+from engine.libs import spatial_lib, actor_lib, vectors
+
+class DummyActor (object):
+    def __init__(self, oid, x, y, size=40, team=1):
+        super(DummyActor, self).__init__()
+        self.oid = oid
+        self.team = team
+        self.pos = [x, y, 0]
+        self.rect = pygame.Rect(0, 0, size, size)
+
+def _layout():
+    actors = []
+    for i in range(60):
+        actors.append(DummyActor(i, (i * 37) % 500 - 100, (i * 53) % 400 - 50, 20 + (i % 4) * 30, i % 3))
+    return actors
+
+class SpatialIndexTests(unittest.TestCase):
+    def _check(self, index, actors):
+        # Each query is compared against a linear scan of the actors
+        for point in ((0, 0), (-90, 10), (250, 250), (399.5, 120), (1000, 1000)):
+            expected = [a for a in actors if actor_lib.contains_point(a, point)]
+            self.assertEqual(expected, index.query_point(point))
+        
+        for rect in ((0, 0, 100, 100), (-200, -200, 0, 0), (150, 20, 151, 300), (600, 600, 700, 700)):
+            expected = []
+            for a in actors:
+                if a.pos[0] + a.rect.width/2 < rect[0] or a.pos[0] - a.rect.width/2 > rect[2]: continue
+                if a.pos[1] + a.rect.height/2 < rect[1] or a.pos[1] - a.rect.height/2 > rect[3]: continue
+                expected.append(a)
+            
+            self.assertEqual(expected, index.query_rect(rect))
+            self.assertEqual([a for a in expected if a.team != 2], index.query_rect(rect, exclude_team=2))
+        
+        self.assertEqual(index.query_rect((0, 0, 100, 100)), index.query_rect(pygame.Rect(0, 0, 100, 100)))
+        
+        for pos, radius in (((0, 0, 0), 50), ((200, 100, 0), 150), ((-100, -50, 0), 0), ((50, 50, 0), 1000)):
+            expected = [a for a in actors if vectors.distance(pos, a.pos) <= radius]
+            self.assertEqual(expected, index.query_radius(pos, radius))
+            
+            enemies = [a for a in expected if a.team != 1]
+            self.assertEqual(enemies, index.query_radius(pos, radius, exclude_team=1))
+            
+            enemies.sort(key=lambda a: (vectors.distance(pos, a.pos), a.oid))
+            self.assertEqual(enemies, index.query_radius(pos, radius, exclude_team=1, by_distance=True))
+        
+        # Anything overlapping the sight of one of the viewers
+        viewers = [a for a in actors if a.team == 1][:6]
+        for i, v in enumerate(viewers):
+            v.sight_range = i * 40
+        
+        expected = []
+        for a in actors:
+            if a.team == 1: continue
+            for v in viewers:
+                dx = max(abs(a.pos[0] - v.pos[0]) - a.rect.width/2, 0)
+                dy = max(abs(a.pos[1] - v.pos[1]) - a.rect.height/2, 0)
+                if dx * dx + dy * dy <= v.sight_range * v.sight_range:
+                    expected.append(a)
+                    break
+        
+        self.assertEqual(expected, index.query_sight(viewers, exclude_team=1))
+        self.assertEqual([], index.query_sight([]))
+    
+    def test_queries(self):
+        for cell_size in (10, 100, 1000):
+            actors = _layout()
+            index = spatial_lib.SpatialIndex(cell_size)
+            for a in actors:
+                index.add(a)
+            
+            self.assertEqual(len(index), len(actors))
+            self._check(index, actors)
+            
+            # Move them around, some will change cells and some won't
+            for step in range(5):
+                for i, a in enumerate(actors):
+                    a.pos = [a.pos[0] + (i % 5 - 2) * 13, a.pos[1] + (i % 3 - 1) * 29, 0]
+                    index.update(a)
+                
+                self._check(index, actors)
+            
+            # Remove a few
+            for a in actors[::7]:
+                index.remove(a)
+            actors = [a for i, a in enumerate(actors) if i % 7 != 0]
+            
+            self.assertEqual(len(index), len(actors))
+            self._check(index, actors)
+            
+            # Changing the cell size must not change the results
+            index.rebuild(cell_size * 3)
+            self._check(index, actors)
+    
+    def test_add_remove(self):
+        index = spatial_lib.SpatialIndex(100)
+        a = DummyActor(1, 50, 50)
+        
+        index.add(a)
+        self.assertRaises(KeyError, index.add, a)
+        
+        index.remove(a)
+        index.remove(a)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.cells, {})
+
+suite = unittest.TestLoader().loadTestsFromTestCase(SpatialIndexTests)
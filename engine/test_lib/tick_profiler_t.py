@@ -0,0 +1,44 @@
+from __future__ import division
+import unittest
+import json
+from engine.libs import tick_profiler
+
+class TickProfilerTests(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(101))
+        
+        self.assertEqual(tick_profiler.percentile(values, 50), 50)
+        self.assertEqual(tick_profiler.percentile(values, 99), 99)
+        self.assertEqual(tick_profiler.percentile([], 95), 0)
+    
+    def test_stats(self):
+        p = tick_profiler.TickProfiler(window=10, summary_interval=5)
+        p.enabled = True
+        
+        # Only the last 10 samples are kept
+        for i in range(20):
+            p.record("actors", i/1000)
+            p.record("bullets", 0.001)
+            p.end_tick()
+        
+        stats = p.stats()
+        self.assertEqual(p.phases, ["actors", "bullets"])
+        self.assertEqual(stats['actors']['samples'], 10)
+        self.assertAlmostEqual(stats['actors']['p50'], 15)
+        self.assertAlmostEqual(stats['actors']['max'], 19)
+        self.assertAlmostEqual(p.summary['bullets_p99'], 1)
+        
+        data = json.loads(p.dump())
+        self.assertEqual(data['ticks'], 20)
+        self.assertAlmostEqual(data['stats']['actors']['p95'], 19)
+    
+    def test_disabled(self):
+        p = tick_profiler.TickProfiler()
+        p.start()
+        p.mark("actors")
+        p.end_tick()
+        
+        self.assertEqual(p.phases, [])
+        self.assertEqual(p.ticks, 0)
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TickProfilerTests)
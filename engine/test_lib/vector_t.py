@@ -1,7 +1,11 @@
+import math
+import pickle
 import unittest
 from engine.libs import vectors
 
 class VectorTests(unittest.TestCase):
+    vectors = vectors
+    
     def test_bound_angle(self):
         vals = (
             # 2D
@@ -18,7 +22,7 @@ class VectorTests(unittest.TestCase):
         )
         
         for a, expected in vals:
-            self.assertEqual(expected, vectors.bound_angle(a))
+            self.assertEqual(expected, self.vectors.bound_angle(a))
     
     def test_add_vectors(self):
         vals = (
@@ -29,7 +33,7 @@ class VectorTests(unittest.TestCase):
         )
         
         for a, b, expected in vals:
-            self.assertEqual(vectors.add_vectors(a, b), expected)
+            self.assertEqual(self.vectors.add_vectors(a, b), expected)
     
     def test_move_to_vector(self):
         vals = (
@@ -56,7 +60,7 @@ class VectorTests(unittest.TestCase):
         )
         
         for angle, distance, expected in vals:
-            answer = vectors.move_to_vector(angle, distance)
+            answer = self.vectors.move_to_vector(angle, distance)
             
             try:
                 self.assertAlmostEqual(answer[0], expected[0], places=2)
@@ -66,6 +70,39 @@ class VectorTests(unittest.TestCase):
                 print("\n\nAngle: %s, Distance: %s, Expected: %s, Got: %s" % (angle, distance, expected, answer))
                 raise
     
+    def test_move_towards(self):
+        vals = (
+            ([0,0,0], [4,-4,0]),
+            ([0,0,0], [0,-4,0]),# Dead Up
+            ([0,0,0], [0,4,0]),# Dead Down
+            ([0,0,0], [4,0,0]),# Dead Right
+            ([0,0,0], [-4,0,0]),# Dead Left
+            ([1,1,0], [4,100,0]),
+            ([400,400,0], [100,900,0]),
+            ([10,10,10], [15,5,0]),
+            ([10,10,0], [-15,5,30]),
+            
+            # No horrizontal distance
+            ([0,0,0], [0,0,0]),
+            ([5,5,0], [5,5,10]),
+        )
+        
+        for pos1, pos2 in vals:
+            for distance in (0, 1, 7.5, 100):
+                expected = self.vectors.move_to_vector(self.vectors.angle(pos1, pos2), distance)
+                answer = self.vectors.move_towards(pos1, pos2, distance)
+                
+                for i in range(3):
+                    self.assertAlmostEqual(expected[i], answer[i], places=7, msg="move_towards(%s, %s, %s) should equal %s, instead got %s" % (
+                        pos1, pos2, distance, expected, answer
+                    ))
+    
+    def test_sin_cos(self):
+        for angle in (0, 1, 45, 90.0, 137, 359, 12.5, 0.1):
+            s, c = self.vectors.sin_cos(angle)
+            self.assertEqual(math.sin(math.radians(angle)), s)
+            self.assertEqual(math.cos(math.radians(angle)), c)
+    
     def test_distance(self):
         vals = (
             # 2D
@@ -82,7 +119,36 @@ class VectorTests(unittest.TestCase):
         )
         
         for a, b, expected in vals:
-            self.assertAlmostEqual(vectors.distance(a, b), expected, places=2)
+            self.assertAlmostEqual(self.vectors.distance(a, b), expected, places=2)
+    
+    def test_distance_squared(self):
+        vals = (
+            ([0,0], [0,0]),
+            ([1,1], [0,0]),
+            ([3,4], [-1,2]),
+            ([0,0,0], [0,0,0]),
+            ([1,1,1], [0,0,0]),
+            ([3,-4,0], [1,1,0]),
+            ([3,0,4], [0,0,0]),
+        )
+        
+        for a, b in vals:
+            self.assertAlmostEqual(self.vectors.distance(a, b) ** 2, self.vectors.distance_squared(a, b), places=7)
+        
+        self.assertEqual(self.vectors.distance_squared([3,4,0]), 25)
+    
+    def test_compare_distance(self):
+        vals = (
+            ([0,0,0], [3,4,0], 6, -1),
+            ([0,0,0], [3,4,0], 5, 0),
+            ([0,0,0], [3,4,0], 4.9, 1),
+            ([0,0,0], [0,0,0], 0, 0),
+            ([0,0,0], [0,0,0], -1, 1),
+            ([0,0], [3,4], 10, -1),
+        )
+        
+        for a, b, dist, expected in vals:
+            self.assertEqual(self.vectors.compare_distance(a, b, dist), expected)
     
     def test_angle_diff(self):
         vals = (
@@ -101,7 +167,7 @@ class VectorTests(unittest.TestCase):
         )
         
         for a1, a2, expected in vals:
-            self.assertEqual(vectors.angle_diff(a1, a2), expected)
+            self.assertEqual(self.vectors.angle_diff(a1, a2), expected)
     
     def test_angle(self):
         vals = (
@@ -134,7 +200,7 @@ class VectorTests(unittest.TestCase):
         )
         
         for a, b, expected in vals:
-            r, r2 = vectors.angle(a, b)
+            r, r2 = self.vectors.angle(a, b)
             self.assertAlmostEqual(r, expected[0], places=2, msg="vectors.angle(%s, %s) should equal %s, instead got %s" % (
                 a, b, expected[0], r
             ))
@@ -161,7 +227,7 @@ class VectorTests(unittest.TestCase):
         )
         
         for a, expected in vals:
-            r, r2 = vectors.angle(a)
+            r, r2 = self.vectors.angle(a)
             self.assertAlmostEqual(r, expected[0], places=2, msg="vectors.angle(%s) should equal %s, instead got %s" % (
                 a, expected[0], r
             ))
@@ -179,7 +245,7 @@ class VectorTests(unittest.TestCase):
         )
         
         for pos1, pos2, distance, expected in vals:
-            x,y,z = vectors.get_midpoint(pos1, pos2, distance)
+            x,y,z = self.vectors.get_midpoint(pos1, pos2, distance)
             
             try:
                 self.assertAlmostEqual(expected[0], x, places=2)
@@ -190,4 +256,57 @@ class VectorTests(unittest.TestCase):
                 raise
 
 
-suite = unittest.TestLoader().loadTestsFromTestCase(VectorTests)
\ No newline at end of file
+class _Vec3Vectors (object):
+    """Stands in for the vectors module, any 3 length sequences passed to
+    its functions are turned into Vec3s first"""
+    def __getattr__(self, name):
+        func = getattr(vectors, name)
+        
+        def _wrapped(*args):
+            new_args = []
+            for a in args:
+                if type(a) in (list, tuple) and len(a) == 3:
+                    a = vectors.Vec3(*a)
+                new_args.append(a)
+            
+            return func(*new_args)
+        return _wrapped
+
+class Vec3VectorTests(VectorTests):
+    """Runs all the vector tests again but with Vec3s"""
+    vectors = _Vec3Vectors()
+    
+    def test_vec3(self):
+        v = vectors.Vec3(1, 2, 3)
+        
+        self.assertEqual(v, [1, 2, 3])
+        self.assertEqual([1, 2, 3], v)
+        self.assertNotEqual(v, [1, 2, 4])
+        self.assertNotEqual(v, [1, 2])
+        self.assertNotEqual(v, None)
+        
+        self.assertEqual(3, len(v))
+        self.assertEqual(3, v[-1])
+        self.assertEqual([1, 2], v[:2])
+        self.assertEqual([1, 2, 3], list(v))
+        self.assertRaises(IndexError, v.__getitem__, 3)
+        
+        v[1] = 5
+        self.assertEqual([1, 5, 3], v.tolist())
+        
+        # In place, so anything holding a reference sees the change
+        same = v
+        v.iadd([1, 1, 1]).iscale(2)
+        self.assertEqual([4, 12, 8], same)
+        
+        c = v.copy()
+        c.iadd([1, 0, 0])
+        self.assertEqual([4, 12, 8], v)
+        
+        self.assertEqual(v, pickle.loads(pickle.dumps(v)))
+        self.assertEqual(v, pickle.loads(pickle.dumps(v, 2)))
+
+suite = unittest.TestSuite([
+    unittest.TestLoader().loadTestsFromTestCase(VectorTests),
+    unittest.TestLoader().loadTestsFromTestCase(Vec3VectorTests),
+])
\ No newline at end of file
@@ -0,0 +1,123 @@
+import unittest
+import sys
+import Queue
+from engine.logic import headless_sim
+from engine.libs import actor_lib, ai_lib
+from engine.ai import wire, core_ai
+
+class WireTests (unittest.TestCase):
+    def new_sim(self):
+        e = headless_sim.HeadlessEngine(size_cache="%s/data/image_sizes.json" % sys.path[0])
+        
+        return headless_sim.new_sim(e,
+            config_path = "data/config.json",
+            setup_path = "data/game_data.json",
+            game_path = "engine/test_lib/battle_test_setups/headless_state.json",
+        )
+    
+    def test_round_trip(self):
+        sim = self.new_sim()
+        codec = wire.Codec(sim.actor_types.keys())
+        
+        sim.actors[1].issue_command("attack", target=sim.actors[2])
+        sim.actors[3].issue_command("move", [1500, 1000])
+        sim.actors[3].order_queue.append(("build", None, "Blu factory"))
+        sim.actors[3].offence_flags.add("Not a name in the table")
+        
+        state, created, removed, changed = ai_lib.actor_deltas({}, sim.actors)
+        sim.actors[0].pos = [250, 200, 0]
+        state, created, removed, changed = ai_lib.actor_deltas(state, sim.actors[:3])
+        
+        messages = [
+            {"data_type": "orders", "cmd": "move", "actor": 3, "pos": [100, 200], "target": None},
+            {"data_type": "orders", "cmd": "build", "actor": 3, "pos": None, "target": "Blu factory"},
+            {"data_type": "orders", "cmd": "attack", "actor": 1, "pos": None, "target": 2},
+            {"data_type": "orders", "cmd": "patrol", "actor": 1, "pos": [1, 2, 3, 4], "target": None},
+            {"cmd": "actors", "actor_list": [actor_lib.strip_actor(a) for a in sim.actors]},
+            {"cmd": "actor_deltas", "created": created, "removed": removed, "changed": changed},
+            {"data_type": "prefs", "prefs": {"wire_format": "frames"}},
+        ]
+        
+        frame = codec.pack_frame(messages)
+        self.assertTrue(wire.is_frame(frame))
+        
+        result = codec.unpack_frame(frame)
+        self.assertEqual(len(result), len(messages))
+        
+        self.assertEqual(result[:4], messages[:4])
+        self.assertEqual(result[5:], messages[5:])
+        self.assertEqual(result[5]['changed'], {0: {"pos": [250, 200, 0]}})
+        
+        self.assertEqual([a.__dict__ for a in result[4]['actor_list']],
+            [actor_lib.stripped_fields(a) for a in sim.actors])
+        self.assertEqual(result[4]['actor_list'][3].order_queue[-1], ("build", None, "Blu factory"))
+        
+        # Unknown fields can't be packed
+        self.assertRaises(KeyError, codec.pack_message, {"cmd": "actor_deltas",
+            "created": [{"oid": 1, "size": 5}], "removed": [], "changed": {}})
+    
+    def test_compact(self):
+        sim = self.new_sim()
+        codec = wire.Codec(sim.actor_types.keys())
+        
+        # Actor numbers are float32
+        sim.actors[0].pos = [1234.5678, 10.25, 0]
+        sim.actors[0].hp = 33.3
+        sim.actors[0].offence_flags = set(["attack"])
+        sim.actors[0].defence_flags = set(["construct", "repair"])
+        
+        message = {"cmd": "actors", "actor_list": [actor_lib.strip_actor(sim.actors[0])]}
+        result = codec.unpack_frame(codec.pack_frame([message]))[0]['actor_list'][0]
+        
+        for a, b in zip(result.pos, sim.actors[0].pos):
+            self.assertAlmostEqual(a, b, places=3)
+        self.assertAlmostEqual(result.hp, 33.3, places=4)
+        self.assertEqual(result.offence_flags, set(["attack"]))
+        self.assertEqual(result.defence_flags, set(["construct", "repair"]))
+        
+        # A change that's only vectors is one struct behind the mask
+        changed = {7: {"pos": [1.5, 2.5, 0], "velocity": [4, 0, 0], "facing": [90, 0]}}
+        message = {"cmd": "actor_deltas", "created": [], "removed": [], "changed": changed}
+        frame = codec.pack_frame([message])
+        
+        self.assertEqual(len(frame), 5 + 4 + 4 + 4 + 4 + 2 + 8 * 4)
+        self.assertEqual(codec.unpack_frame(frame), [message])
+        
+        # And when one of them isn't the usual length it still gets there
+        changed[7]['facing'] = [90, 0, 0]
+        self.assertEqual(codec.unpack_frame(codec.pack_frame([message])), [message])
+    
+    def test_sim_and_ai(self):
+        sim = self.new_sim()
+        sim.out_queues[2] = Queue.Queue()
+        sim.in_queues[2] = Queue.Queue()
+        
+        ai = core_ai.AICore(sim.out_queues[2], sim.in_queues[2])
+        ai.team = 2
+        sim.ai_prefs[2] = ai.prefs
+        ai_lib.send_static_data(sim, sim.out_queues[2])
+        
+        # Everything for the AI in a cycle is in one frame
+        sim.run_ticks(1)
+        self.assertEqual(sim.out_queues[2].qsize(), 3)
+        self.assertTrue(wire.is_frame(sim.out_queues[2].queue[2]))
+        
+        ai.core_cycle()
+        self.assertEqual([a.oid for a in ai.own_actors], [2, 3])
+        
+        # As is everything from the AI
+        ai.issue_orders(2, "attack", target=0)
+        ai.issue_orders(3, "move", pos=[1000, 1000])
+        ai.issue_orders(99, "move", pos=[1000, 1000])
+        ai.send_orders()
+        
+        self.assertEqual(sim.in_queues[2].qsize(), 1)
+        
+        sim.read_ai_queues()
+        self.assertEqual(sim.in_queues[2].qsize(), 0)
+        
+        orders = sim.orders[sim.tick + sim.tick_jump]
+        self.assertEqual([(o[0].oid, o[1]) for o in orders], [(2, "attack"), (3, "move")])
+        self.assertEqual(orders[0][3], sim.actor_lookup[0])
+
+suite = unittest.TestLoader().loadTestsFromTestCase(WireTests)
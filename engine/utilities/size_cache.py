@@ -0,0 +1,30 @@
+"""
+The sim only needs to know how big each image is, not what it looks like.
+A size cache stores the (width, height) of every image an engine has so
+that a headless sim can be run without loading (or being able to load)
+any of them.
+"""
+
+import json
+
+def build(engine):
+    """Returns a dict of image name -> [width, height]"""
+    sizes = {}
+    for name in engine.images.keys():
+        sizes[name] = list(engine.get_image_size(name))
+    
+    return sizes
+
+def save(engine, file_path):
+    with open(file_path, "w") as f:
+        f.write(json.dumps(build(engine), indent=4, sort_keys=True, separators=(",", ": ")))
+
+def load(file_path):
+    with open(file_path) as f:
+        data = json.loads(f.read())
+    
+    sizes = {}
+    for name, size in data.items():
+        sizes[str(name)] = tuple(size)
+    
+    return sizes
@@ -14,10 +14,30 @@ if __name__ == '__main__':
         from profile_lib import profiler
         profiler.run("")
     
+    elif len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        from profile_lib import bench
+        bench.run(sys.argv[2:])
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == 'autoprofile':
+        from profile_lib import autoprofiler
+        autoprofiler.run(sys.argv[2:])
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == 'wirebench':
+        from profile_lib import wire_bench
+        wire_bench.run(sys.argv[2:])
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == 'memprofile':
+        from profile_lib import memprofile
+        memprofile.run(sys.argv[2:])
+    
     elif len(sys.argv) > 1 and sys.argv[1] == 'compare':
         from profile_lib import comparer
         comparer.compare()
     
+    elif len(sys.argv) > 1 and sys.argv[1] == 'sizecache':
+        from engine.utilities import size_cache
+        size_cache.save(seq_game.Sequtus(), sys.path[0] + "/data/image_sizes.json")
+    
     elif len(sys.argv) > 1 and sys.argv[1] == 'view':
         from profile_lib import profiler
         profiler.view("")
@@ -1,49 +1,23 @@
 """
 A set of functions and setups to profile the code using time taken. Alter
 the code and re-run the autoprofiler and compare results.
+
+These time individual functions, for whole logic cycles see bench.py.
+Like the bench the runs can be repeated, saved and checked against a
+saved baseline (see baseline.py):
+
+    python main.py autoprofile --repeat 5 --save autoprofile.json
+    python main.py autoprofile --repeat 5 --baseline autoprofile.json
 """
 
 import time
-import sys
+import optparse
 
-from game import seq_game
-from game.game_screens import battle
+import pygame
 
-from engine.libs import cli
+from engine.libs import cli, sim_lib, vectors
+from profile_lib import baseline
 
-class ProfilerBattle (battle.Battle):
-    def __init__(self, *args, **kwargs):
-        super(ProfilerBattle, self).__init__(*args, **kwargs)
-        self.max_age = 1000
-        self.age = 0
-    
-    def logic_cycle(self):
-        if self.tick > self.max_age:
-            raise StopIteration("")
-        
-        super(ProfilerBattle, self).logic_cycle()
-
-class ProfilerEngine (seq_game.Sequtus):
-    def __init__(self, *args, **kwargs):
-        super(ProfilerEngine, self).__init__(*args, **kwargs)
-        
-        self.images['test_image_100'] = self.images['red_building']
-        self.images['test_image_41'] = self.images['red_rune']
-    
-    def startup(self):
-        # The Sequtus implimentation has stuff we want to skip
-        super(seq_game.Sequtus, self).startup()
-        
-        self.screens['main'] = ProfilerBattle
-        self.set_screen('main')
-        
-        self.current_screen.load_all(
-            "%s/engine/test_lib/battle_test_setups/config.json" % sys.path[0],
-            "%s/engine/test_lib/battle_test_setups/game_data.json" % sys.path[0],
-            "%s/engine/test_lib/battle_test_setups/empty_game.json" % sys.path[0],
-            local=False,
-        )
-        
 def _profile(p, name, iterations, *args, **kwargs):
     start_time = time.time()
     
@@ -52,65 +26,116 @@ def _profile(p, name, iterations, *args, **kwargs):
     
     return round(time.time() - start_time, 2)
 
-def no_collision_test():
-    p = ProfilerEngine()
-    p.startup()
+class ProfilerActor (object):
+    """The collision engines only need a rect so we can skip the overhead
+    of loading a whole battle"""
+    def __init__(self, x, y, size=41):
+        super(ProfilerActor, self).__init__()
+        self.rect = pygame.Rect(x, y, size, size)
+
+collision_engines = (
+    ("brute",   lambda: sim_lib.brute_force_collisions),
+    ("grid",    lambda: sim_lib.get_collisions),
+    ("sweep",   lambda: sim_lib.SweepAndPrune().get_collisions),
+)
+
+def _collision_test(name, engine_name, count, position_func, iterations):
+    actors = [ProfilerActor(*position_func(i)) for i in range(0, count)]
     
-    # No overlapping
-    for i in range(0, 300):
-        p.current_screen.place_actor({"type":"Blue circle","pos":[i*100, 100, 0],"team":1,"completion":100,"hp":1})
+    # The sweep and prune engine keeps state so each test gets a new one
+    engine_func = dict(collision_engines)[engine_name]()
     
-    return "No collisions", _profile(p.current_screen.get_collisions, "No collisions", 250)
+    return name, _profile(engine_func, "%s (%s)" % (name, engine_name), iterations, actors)
 
-def pair_collision_test():
-    p = ProfilerEngine()
-    p.startup()
-    
+def no_collision_test(engine_name):
+    # No overlapping
+    return _collision_test("No collisions", engine_name, 300, lambda i: (i*100, 100), 250)
+
+def pair_collision_test(engine_name):
     # Overlapping with the one either side
-    for i in range(0, 300):
-        p.current_screen.place_actor({"type":"Blue circle","pos":[i*30, 100, 0],"team":1,"completion":100,"hp":1})
-    
-    return "Pair collisions", _profile(p.current_screen.get_collisions, "Pair collisions", 250)
+    return _collision_test("Pair collisions", engine_name, 300, lambda i: (i*30, 100), 250)
 
-def all_collision_test():
-    p = ProfilerEngine()
-    p.startup()
-    
+def all_collision_test(engine_name):
     # All in the same spot
-    for i in range(0, 300):
-        p.current_screen.place_actor({"type":"Blue circle","pos":[100, 100, 0],"team":1,"completion":100,"hp":1})
-    
-    return "All collisions", _profile(p.current_screen.get_collisions, "All collisions", 250)
+    return _collision_test("All collisions", engine_name, 300, lambda i: (100, 100), 250)
 
-def mass_no_collision_test():
-    p = ProfilerEngine()
-    p.startup()
-    
-    # All in the same spot
-    for i in range(0, 1000):
-        p.current_screen.place_actor({"type":"Blue circle","pos":[i*100, 100, 0],"team":1,"completion":100,"hp":1})
-    
-    return "Mass no collisions", _profile(p.current_screen.get_collisions, "Mass no collisions", 30)
+def mass_no_collision_test(engine_name):
+    return _collision_test("Mass no collisions", engine_name, 1000, lambda i: (i*100, 100), 30)
 
-def mass_pair_collision_test():
-    p = ProfilerEngine()
-    p.startup()
-    
-    # All in the same spot
-    for i in range(0, 1000):
-        p.current_screen.place_actor({"type":"Blue circle","pos":[i*30, 100, 0],"team":1,"completion":100,"hp":1})
-    
-    return "Mass pair collisions", _profile(p.current_screen.get_collisions, "Mass pair collisions", 30)
+def mass_pair_collision_test(engine_name):
+    return _collision_test("Mass pair collisions", engine_name, 1000, lambda i: (i*30, 100), 30)
 
-def mass_all_collision_test():
-    p = ProfilerEngine()
-    p.startup()
+def mass_all_collision_test(engine_name):
+    return _collision_test("Mass all collisions", engine_name, 1000, lambda i: (100, 100), 30)
+
+def _exact_move(pos, target, distance):
+    # How Actor._accelerate_ai worked before move_towards
+    return vectors.move_to_vector(vectors.angle(pos, target), distance)
+
+movement_paths = (
+    ("exact",   _exact_move),
+    ("fast",    vectors.move_towards),
+)
+
+def _move_all(move_func, points):
+    for pos, target in points:
+        move_func(pos, target, 5)
+
+def movement_test(path_name):
+    """The movement AI heads straight for a point every tick"""
+    points = [([i*7 % 500, i*13 % 400, 0], [i*31 % 600, i*17 % 300, i % 3]) for i in range(1000)]
+    move_func = dict(movement_paths)[path_name]
     
-    # All in the same spot
-    for i in range(0, 1000):
-        p.current_screen.place_actor({"type":"Blue circle","pos":[100, 100, 0],"team":1,"completion":100,"hp":1})
+    return "Movement", _profile(_move_all, "Movement (%s)" % path_name, 300, move_func, points)
+
+def _offset_all(facings):
+    for f in facings:
+        vectors.move_to_vector(f, 10)
+
+def facing_test(use_table):
+    """Ability offsets and turning use the facing of the actor, these
+    are whole degrees"""
+    facings = [[i % 360, 0] for i in range(1000)]
+    
+    saved_table = dict(vectors._trig_table)
+    if not use_table:
+        vectors._trig_table.clear()
+    
+    try:
+        return "Facing offsets", _profile(_offset_all, "Facing offsets (table: %s)" % use_table, 300, facings)
+    finally:
+        vectors._trig_table.update(saved_table)
+
+def _old_range_check(pos1, pos2, max_range, min_range):
+    # How the abilities checked their range before compare_distance
+    if vectors.distance(pos1, pos2) > max_range:
+        return False
+    if vectors.distance(pos1, pos2) < min_range:
+        return False
+    return True
+
+def _new_range_check(pos1, pos2, max_range, min_range):
+    if vectors.compare_distance(pos1, pos2, max_range) > 0:
+        return False
+    if vectors.compare_distance(pos1, pos2, min_range) < 0:
+        return False
+    return True
+
+range_checks = (
+    ("distance",    _old_range_check),
+    ("squared",     _new_range_check),
+)
+
+def _check_all(check_func, points):
+    for pos1, pos2 in points:
+        check_func(pos1, pos2, 300, 20)
+
+def range_test(check_name):
+    """Abilities check the range to their target every tick"""
+    points = [([i*7 % 500, i*13 % 400, 0], [i*31 % 600, i*17 % 300, 0]) for i in range(1000)]
+    check_func = dict(range_checks)[check_name]
     
-    return "Mass all collisions", _profile(p.current_screen.get_collisions, "Mass all collisions", 30)
+    return "Range checks", _profile(_check_all, "Range checks (%s)" % check_name, 300, check_func, points)
 
 profilers = (
     # Collisions
@@ -120,24 +145,110 @@ profilers = (
     mass_no_collision_test, mass_pair_collision_test, mass_all_collision_test,
 )
 
-def run():
+def run_profilers():
+    """Runs each of the profilers once"""
     results = {}
     
-    # Run functions
-    for p in profilers:
-        f,t = p()
+    for path_name, move_func in movement_paths:
+        f,t = movement_test(path_name)
+        results["%s (%s)" % (f, path_name)] = t
+    
+    for use_table in (False, True):
+        f,t = facing_test(use_table)
+        results["%s (table: %s)" % (f, use_table)] = t
+    
+    for check_name, check_func in range_checks:
+        f,t = range_test(check_name)
+        results["%s (%s)" % (f, check_name)] = t
+    
+    # Run functions, each collision engine gets run against every layout
+    for engine_name, make_engine in collision_engines:
+        results[engine_name] = {}
         
-        results[f] = t
+        for p in profilers:
+            f,t = p(engine_name)
+            
+            results[engine_name][f] = t
+    
+    return results
+
+def _flatten(results):
+    """Collision timings are nested by engine, these become engine/layout"""
+    flat = {}
+    for k, v in results.items():
+        if type(v) == dict:
+            for f, t in v.items():
+                flat["%s/%s" % (k, f)] = t
+        else:
+            flat[k] = v
+    
+    return flat
+
+def metrics(runs):
+    """Takes a list of run_profilers() results and gives the name -> samples
+    form used by result files and baselines"""
+    flat_runs = [_flatten(r) for r in runs]
+    
+    m = {}
+    for name in flat_runs[0].keys():
+        m[name] = baseline.summarise([r[name] for r in flat_runs])
+    
+    return m
+
+def print_results(m):
+    def _median(name):
+        return m[name]['median']
     
-    # Print results
     print("\n\n-----------\n\n")
-    print("Collisions: %s" % sum((
-        results["No collisions"],
-        results["Pair collisions"],
-        results["All collisions"],
-    )))
-    print("Mass collisions: %s" % sum((
-        results["Mass no collisions"],
-        results["Mass pair collisions"],
-        results["Mass all collisions"],
-    )))
+    for path_name, move_func in movement_paths:
+        print("Movement (%s): %s" % (path_name, _median("Movement (%s)" % path_name)))
+    
+    for use_table in (False, True):
+        print("Facing offsets (table: %s): %s" % (use_table, _median("Facing offsets (table: %s)" % use_table)))
+    
+    for check_name, check_func in range_checks:
+        print("Range checks (%s): %s" % (check_name, _median("Range checks (%s)" % check_name)))
+    
+    for engine_name, make_engine in collision_engines:
+        print("Collisions (%s): %s" % (engine_name, sum((
+            _median("%s/No collisions" % engine_name),
+            _median("%s/Pair collisions" % engine_name),
+            _median("%s/All collisions" % engine_name),
+        ))))
+        print("Mass collisions (%s): %s" % (engine_name, sum((
+            _median("%s/Mass no collisions" % engine_name),
+            _median("%s/Mass pair collisions" % engine_name),
+            _median("%s/Mass all collisions" % engine_name),
+        ))))
+
+def run(args=[]):
+    """Runs and prints each of the profilers, the timings can be saved
+    and checked against a baseline the same as bench.py"""
+    parser = optparse.OptionParser(usage="python main.py autoprofile [options]")
+    parser.add_option("--repeat", dest="repeat", type="int", default=1,
+        help="how many times to run each profiler, the median is used")
+    parser.add_option("--save", dest="save", default=None,
+        help="write the results to this file")
+    parser.add_option("--baseline", dest="baseline", default=None,
+        help="compare against this result file and exit non-zero on a regression")
+    parser.add_option("--threshold", dest="threshold", type="float", default=0.1,
+        help="how much worse (as a fraction) a timing must be to count as a regression")
+    parser.add_option("--mad-factor", dest="mad_factor", type="float", default=3,
+        help="how many median absolute deviations worse it must also be")
+    
+    options, extra = parser.parse_args(args)
+    
+    runs = [run_profilers() for i in range(options.repeat)]
+    m = metrics(runs)
+    print_results(m)
+    
+    if options.save != None:
+        baseline.save(options.save, "autoprofiler", m, {"repeat": options.repeat})
+    
+    if options.baseline != None:
+        print("")
+        
+        # Timings are rounded to 0.01s so anything this small is noise
+        baseline.check(m, options.baseline, options.threshold, options.mad_factor, min_value=0.05)
+    
+    return m
@@ -0,0 +1,169 @@
+from __future__ import division
+
+"""
+Result files and baselines for the benchmarks. A result file holds the
+samples of each metric from a number of repeated runs along with where
+they were run, a later run can then be compared against it.
+
+Timings are noisy so a metric only counts as a regression when it has
+got worse by more than the threshold (a fraction of the baseline) and
+by more than mad_factor times the combined median absolute deviation of
+the two runs.
+"""
+
+import sys
+import time
+import json
+import platform
+import subprocess
+
+def environment():
+    """What the results were recorded on, timings from different machines
+    or versions can't really be compared"""
+    env = {
+        "time":         time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python":       platform.python_version(),
+        "platform":     platform.platform(),
+        "machine":      platform.machine(),
+        "processor":    platform.processor(),
+        "pygame":       None,
+        "numpy":        None,
+        "commit":       None,
+    }
+    
+    try:
+        import multiprocessing
+        env['cpus'] = multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        env['cpus'] = None
+    
+    try:
+        import pygame
+        env['pygame'] = pygame.version.ver
+    except ImportError:
+        pass
+    
+    try:
+        import numpy
+        env['numpy'] = numpy.__version__
+    except ImportError:
+        pass
+    
+    try:
+        p = subprocess.Popen(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = p.communicate()
+        if p.returncode == 0:
+            env['commit'] = out.strip().decode("utf-8")
+    except OSError:
+        pass
+    
+    return env
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    
+    if len(values) % 2 == 1:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
+
+def mad(values):
+    """Median absolute deviation"""
+    m = median(values)
+    return median([abs(v - m) for v in values])
+
+def summarise(samples, higher_is_better=False):
+    return {
+        "samples":          list(samples),
+        "median":           median(samples),
+        "mad":              mad(samples),
+        "higher_is_better": higher_is_better,
+    }
+
+def save(file_path, kind, metrics, settings={}):
+    """metrics is name -> summarise(...)"""
+    data = {
+        "kind":         kind,
+        "environment":  environment(),
+        "settings":     settings,
+        "metrics":      metrics,
+    }
+    
+    with open(file_path, "w") as f:
+        f.write(json.dumps(data, indent=4, sort_keys=True, separators=(",", ": ")))
+    
+    return data
+
+def load(file_path):
+    with open(file_path) as f:
+        return json.loads(f.read())
+
+def compare(current, baseline, threshold=0.05, mad_factor=3, min_value=0):
+    """
+    Compares two sets of metrics (name -> summarise(...)), returns a list of
+    (name, baseline median, current median, change, regressed) sorted by
+    name. change is the fraction the metric has got worse by (negative
+    when it's improved). Metrics whose baseline median is below min_value
+    are too small to time reliably and never count as regressions.
+    """
+    results = []
+    for name in sorted(current.keys()):
+        if name not in baseline: continue
+        
+        cur = current[name]
+        base = baseline[name]
+        
+        if cur['higher_is_better']:
+            worse_by = base['median'] - cur['median']
+        else:
+            worse_by = cur['median'] - base['median']
+        
+        if base['median'] != 0:
+            change = worse_by / base['median']
+        else:
+            change = 0
+        
+        regressed = False
+        if base['median'] >= min_value:
+            noise = mad_factor * (base['mad'] + cur['mad'])
+            if change > threshold and worse_by > noise:
+                regressed = True
+        
+        results.append((name, base['median'], cur['median'], change, regressed))
+    
+    return results
+
+def report(comparisons, current_env=None, baseline_env=None):
+    """Prints the comparisons, returns the number of regressions"""
+    if current_env != None and baseline_env != None:
+        for k in ("python", "machine", "pygame", "numpy"):
+            if current_env.get(k) != baseline_env.get(k):
+                print("Warning: %s differs from the baseline (%s vs %s)" % (
+                    k, current_env.get(k), baseline_env.get(k)
+                ))
+    
+    regressions = 0
+    for name, base_median, cur_median, change, regressed in comparisons:
+        if regressed:
+            regressions += 1
+            marker = "REGRESSION"
+        else:
+            marker = ""
+        
+        print("%-50s %10.3f -> %10.3f  %+6.1f%% %s" % (name, base_median, cur_median, change * 100, marker))
+    
+    print("\n%d regression(s)" % regressions)
+    return regressions
+
+def check(current_metrics, baseline_path, threshold=0.05, mad_factor=3, min_value=0):
+    """Compares against the baseline file and exits with a non-zero
+    status if anything has regressed"""
+    baseline = load(baseline_path)
+    
+    regressions = report(
+        compare(current_metrics, baseline['metrics'], threshold, mad_factor, min_value),
+        environment(), baseline['environment'],
+    )
+    
+    if regressions > 0:
+        sys.exit(1)
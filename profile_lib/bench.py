@@ -0,0 +1,307 @@
+from __future__ import division
+
+"""
+Runs whole logic cycles of a headless sim and reports how many ticks per
+second it manages along with the time spent in each phase.
+
+Scenarios are game files (like data/scenario_1.json) with an extra
+"bench" section saying what to spawn. Each spawn group gets an equal
+share of the actors and lays them out in a grid:
+
+    "bench": {
+        "ticks":    100,
+        "spawn":    [
+            {
+                "type":     "Red tank",
+                "team":     1,
+                "origin":   [100, 100],
+                "columns":  50,
+                "spacing":  [60, 80],
+                "order":    ["move", [1600, 100]]
+            }
+        ],
+        "variants": {
+            "sweep":    {"collision_engine": "sweep"}
+        }
+    }
+
+The battlefield is grown to fit the spawned actors (with a margin of
+spawn_margin) so that none of them are simulated off the map.
+
+Variants are config overrides, the default config is always run and
+the variants are only run when asked for (--variants).
+
+    python main.py bench
+    python main.py bench skirmish --scales 100,1000 --ticks 50 --variants
+
+Runs can be repeated, saved and checked against a saved baseline (see
+baseline.py), a regression gives a non-zero exit status:
+    
+    python main.py bench --repeat 5 --save baseline.json
+    python main.py bench --repeat 5 --baseline baseline.json
+"""
+
+import sys
+import json
+import time
+import copy
+import optparse
+
+from engine.logic import headless_sim
+from profile_lib import baseline
+
+default_scales = (100, 1000, 5000, 10000)
+spawn_margin = 100
+
+def _path(name):
+    return "%s/%s" % (sys.path[0], name)
+
+def load_scenario(name):
+    """name can be a path or the name of a file in profile_lib/scenarios"""
+    if name.endswith(".json"):
+        file_path = name
+    else:
+        file_path = _path("profile_lib/scenarios/%s.json" % name)
+    
+    with open(file_path) as f:
+        return json.loads(f.read())
+
+def build_game(scenario, scale):
+    """Returns the scenario as game data with scale actors spawned"""
+    game = copy.deepcopy(scenario)
+    spawn = game['bench']['spawn']
+    
+    width, height = game['battlefield']['size']
+    
+    for i, group in enumerate(spawn):
+        # The first few groups pick up any remainder
+        count = scale // len(spawn)
+        if i < scale % len(spawn):
+            count += 1
+        
+        columns = group.get("columns", 50)
+        spacing = group.get("spacing", [60, 60])
+        
+        for j in range(count):
+            game['actors'].append({
+                "type": group['type'],
+                "team": group['team'],
+                "pos":  [
+                    group['origin'][0] + (j % columns) * spacing[0],
+                    group['origin'][1] + (j // columns) * spacing[1],
+                    0,
+                ],
+            })
+    
+    for a in game['actors']:
+        width = max(width, a['pos'][0] + spawn_margin)
+        height = max(height, a['pos'][1] + spawn_margin)
+    
+    game['battlefield']['size'] = [width, height]
+    
+    return game
+
+def new_sim(scenario, scale, config_overrides={}):
+    e = headless_sim.HeadlessEngine(size_cache=_path("data/image_sizes.json"))
+    sim = e.set_screen(headless_sim.HeadlessSim)
+    
+    with open(_path("data/config.json")) as f:
+        config = json.loads(f.read())
+    config.update(config_overrides)
+    
+    with open(_path("data/game_data.json")) as f:
+        setup = json.loads(f.read())
+    
+    sim.load_config(config)
+    sim.load_setup(setup)
+    sim.load_game(build_game(scenario, scale))
+    
+    # Orders are given once everything is in place
+    spawned = sim.actors[len(scenario['actors']):]
+    for group in scenario['bench']['spawn']:
+        if "order" not in group: continue
+        
+        cmd, pos = group['order']
+        for a in spawned:
+            if a.actor_type == group['type'] and a.team == group['team']:
+                a.issue_command(cmd, pos)
+    
+    return sim
+
+def time_snapshot(sim):
+    """Returns the ms taken to snapshot and restore the sim along with
+    the size of the snapshot in bytes"""
+    start_time = time.time()
+    blob = sim.snapshot()
+    snapshot_time = time.time() - start_time
+    
+    start_time = time.time()
+    sim.restore(blob)
+    restore_time = time.time() - start_time
+    
+    return snapshot_time * 1000, restore_time * 1000, len(blob)
+
+def run_scenario(scenario, scale, ticks, config_overrides={}):
+    """Returns ticks per second and the mean ms per tick of each phase
+    along with how long it takes to snapshot the sim at the end"""
+    sim = new_sim(scenario, scale, config_overrides)
+    
+    sim.profiler.window = ticks
+    sim.profiler.enabled = True
+    
+    try:
+        start_time = time.time()
+        sim.run_ticks(ticks)
+        elapsed = time.time() - start_time
+        
+        snapshot_ms, restore_ms, snapshot_bytes = time_snapshot(sim)
+    finally:
+        sim.quit()
+    
+    phases = {}
+    for phase, phase_stats in sim.profiler.stats().items():
+        phases[phase] = {
+            "mean": phase_stats['mean'],
+            "p95":  phase_stats['p95'],
+        }
+    
+    return {
+        "actors":           scale,
+        "ticks":            ticks,
+        "seconds":          elapsed,
+        "ticks_per_second": ticks / elapsed,
+        "phases":           phases,
+        "phase_order":      sim.profiler.phases,
+        "snapshot_ms":      snapshot_ms,
+        "restore_ms":       restore_ms,
+        "snapshot_bytes":   snapshot_bytes,
+    }
+
+def _combine(runs):
+    """Takes the median of each figure across repeated runs"""
+    r = dict(runs[0])
+    r['runs'] = runs
+    r['seconds'] = baseline.median([x['seconds'] for x in runs])
+    r['ticks_per_second'] = baseline.median([x['ticks_per_second'] for x in runs])
+    r['snapshot_ms'] = baseline.median([x['snapshot_ms'] for x in runs])
+    r['restore_ms'] = baseline.median([x['restore_ms'] for x in runs])
+    
+    r['phases'] = {}
+    for phase in runs[0]['phases'].keys():
+        r['phases'][phase] = {
+            "mean": baseline.median([x['phases'][phase]['mean'] for x in runs]),
+            "p95":  baseline.median([x['phases'][phase]['p95'] for x in runs]),
+        }
+    
+    return r
+
+def run_bench(scenario_names, scales=default_scales, ticks=None, variants=False, repeat=1):
+    """Returns scenario -> variant -> scale -> results, repeated runs are
+    combined by taking the median"""
+    results = {}
+    
+    for name in scenario_names:
+        scenario = load_scenario(name)
+        scenario_ticks = ticks or scenario['bench'].get("ticks", 100)
+        
+        to_run = [("default", {})]
+        if variants:
+            to_run.extend(sorted(scenario['bench'].get("variants", {}).items()))
+        
+        results[name] = {}
+        for variant_name, overrides in to_run:
+            results[name][variant_name] = {}
+            
+            for scale in scales:
+                runs = []
+                for i in range(repeat):
+                    sys.stdout.write("%s (%s) x%d..." % (name, variant_name, scale))
+                    sys.stdout.flush()
+                    
+                    runs.append(run_scenario(scenario, scale, scenario_ticks, overrides))
+                    print(" %.1f ticks/s" % runs[-1]['ticks_per_second'])
+                
+                results[name][variant_name][scale] = _combine(runs)
+    
+    return results
+
+def metrics(results):
+    """Flattens the results into the name -> samples form used by
+    result files and baselines"""
+    m = {}
+    for name, variant_results in results.items():
+        for variant_name, scale_results in variant_results.items():
+            for scale, r in scale_results.items():
+                prefix = "%s/%s/%d" % (name, variant_name, scale)
+                
+                m["%s/ticks_per_second" % prefix] = baseline.summarise(
+                    [x['ticks_per_second'] for x in r['runs']], higher_is_better=True)
+                
+                for phase in r['phase_order']:
+                    m["%s/%s_ms" % (prefix, phase)] = baseline.summarise(
+                        [x['phases'][phase]['mean'] for x in r['runs']])
+                
+                for k in ("snapshot_ms", "restore_ms"):
+                    m["%s/%s" % (prefix, k)] = baseline.summarise([x[k] for x in r['runs']])
+    
+    return m
+
+def print_results(results):
+    for name, variant_results in sorted(results.items()):
+        for variant_name, scale_results in sorted(variant_results.items()):
+            print("\n%s (%s)" % (name, variant_name))
+            
+            for scale, r in sorted(scale_results.items()):
+                print("  %6d actors: %8.1f ticks/s" % (scale, r['ticks_per_second']))
+                
+                for phase in r['phase_order']:
+                    p = r['phases'][phase]
+                    print("      %-14s mean %8.3fms  p95 %8.3fms" % (phase, p['mean'], p['p95']))
+                
+                print("      snapshot %.1fms (%d bytes), restore %.1fms" % (
+                    r['snapshot_ms'], r['snapshot_bytes'], r['restore_ms']))
+
+def run(args):
+    parser = optparse.OptionParser(usage="python main.py bench [scenario ...] [options]")
+    parser.add_option("--scales", dest="scales", default=",".join([str(s) for s in default_scales]),
+        help="comma separated actor counts")
+    parser.add_option("--ticks", dest="ticks", type="int", default=None,
+        help="ticks to run, defaults to the scenario's own")
+    parser.add_option("--variants", dest="variants", action="store_true", default=False,
+        help="also run each of the scenario's config variants")
+    parser.add_option("--repeat", dest="repeat", type="int", default=1,
+        help="how many times to run each scale, the median is used")
+    parser.add_option("--save", dest="save", default=None,
+        help="write the results to this file")
+    parser.add_option("--baseline", dest="baseline", default=None,
+        help="compare against this result file and exit non-zero on a regression")
+    parser.add_option("--threshold", dest="threshold", type="float", default=0.1,
+        help="how much worse (as a fraction) a metric must be to count as a regression")
+    parser.add_option("--mad-factor", dest="mad_factor", type="float", default=3,
+        help="how many median absolute deviations worse it must also be")
+    
+    options, scenario_names = parser.parse_args(args)
+    if scenario_names == []:
+        scenario_names = ["idle", "skirmish"]
+    
+    scales = [int(s) for s in options.scales.split(",")]
+    
+    results = run_bench(scenario_names, scales, options.ticks, options.variants, options.repeat)
+    print_results(results)
+    
+    if options.save != None:
+        baseline.save(options.save, "bench", metrics(results), {
+            "scenarios":    scenario_names,
+            "scales":       scales,
+            "ticks":        options.ticks,
+            "repeat":       options.repeat,
+        })
+    
+    if options.baseline != None:
+        print("")
+        
+        # Phases taking less than this (ms) are too small to time reliably
+        baseline.check(metrics(results), options.baseline,
+            options.threshold, options.mad_factor, min_value=0.05)
+    
+    return results
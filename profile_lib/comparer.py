@@ -1,42 +1,26 @@
 """
-Manually alter it to try several variations of the same function and see which is fastest
+Compares the config variants of a bench scenario (see bench.py) against
+the default config, no code changes needed to try a new variation, just
+add it to the scenario's "variants".
+    
+    python main.py compare [scenario] [scale]
 """
 
-import time
 import sys
 
-from profile_lib.autoprofiler import ProfilerEngine
-
-from engine.libs import cli
-
-def setup():
-    p = ProfilerEngine()
-    p.startup()
-    
-    for i in range(0, 1000):
-        p.current_screen.place_actor({"type":"Blue circle","pos":[i*30, 100, 0],"team":1,"completion":100,"hp":1})
-    
-    return p
-
-def _run_func(f, args, kwargs):
-    p = setup()
-    this_func = getattr(p.current_screen, f)
-    
-    start_time = time.time()
-    for i in range(0, 100):
-        this_func(*args, **kwargs)
-    
-    return time.time() - start_time
+from profile_lib import bench
 
-def compare():
-    funcs = (("get_collisions", [], {}), ("get_collisions2", [], {}))
-    results = {}
+def compare(scenario_name="skirmish", scale=1000):
+    if len(sys.argv) > 2:
+        scenario_name = sys.argv[2]
+    if len(sys.argv) > 3:
+        scale = int(sys.argv[3])
     
-    # Run functions
-    for f, args, kwargs in funcs:
-        results[f] = _run_func(f, args, kwargs)
+    results = bench.run_bench([scenario_name], [scale], variants=True)[scenario_name]
+    default_tps = results['default'][scale]['ticks_per_second']
     
     # Print results
-    for f, t in results.items():
-        print(f, t)
-        
+    print("")
+    for variant_name, scale_results in sorted(results.items()):
+        tps = scale_results[scale]['ticks_per_second']
+        print("%-14s %8.1f ticks/s (%+.1f%%)" % (variant_name, tps, (tps / default_tps - 1) * 100))
@@ -0,0 +1,207 @@
+from __future__ import division
+
+"""
+Runs a bench scenario (see bench.py) headless for a long time and takes
+a snapshot of memory use every so often. The report shows how each part
+of the sim has grown, which types of object have grown and where the new
+objects came from. On Python 2 that last part is worked out from the gc:
+objects are grouped by the module their class is defined in and by which
+of the sim's containers they can be reached from. When tracemalloc is
+available the lines of code that allocated them are shown as well.
+
+    python main.py memprofile
+    python main.py memprofile skirmish --scale 500 --ticks 5000 --interval 500
+"""
+
+import gc
+import sys
+import types
+import optparse
+
+from profile_lib import bench
+
+# tracemalloc only exists from Python 3.4, without it the growth is put
+# down to modules and containers (see module_counts and owner_counts)
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# The containers owner_counts walks from, in the order objects are
+# claimed. Anything reachable from more than one goes to the first.
+owner_roots = ("actors", "bullets", "effects", "orders", "q_orders",
+    "spatial_index", "autotargeters", "actor_store", "image_cache", "profiler")
+
+# Never walked into, everything is reachable through them
+_stop_types = (types.ModuleType, type, types.FunctionType, types.BuiltinFunctionType)
+
+def subsystem_counts(sim):
+    """The length of each of the containers that live as long as the sim"""
+    counts = {
+        "actors":           len(sim.actors),
+        "actor_lookup":     len(sim.actor_lookup),
+        "selected_actors":  len(sim.selected_actors),
+        "orders":           len(sim.orders),
+        "q_orders":         len(sim.q_orders),
+        "queued_orders":    sum([len(v) for v in sim.orders.values()]) + sum([len(v) for v in sim.q_orders.values()]),
+        "bullets":          len(sim.bullets),
+        "effects":          len(sim.effects),
+        "image_cache":      len(sim.image_cache),
+        "spatial_actors":   len(sim.spatial_index),
+        "spatial_cells":    sum([len(cells) for cells in sim.spatial_index.cells.values()]),
+        "autotarget_backlog": sum([len(t.backlog) for t in sim.autotargeters.values()]),
+        "profiler_samples": sum([len(s) for s in sim.profiler.samples.values()]),
+    }
+    
+    if sim.actor_store != None:
+        counts['actor_store'] = len(sim.actor_store)
+    
+    # Things the actors hold onto
+    counts['actor_effects'] = sum([len(a.effects) for a in sim.actors])
+    counts['actor_bullets'] = sum([len(a.bullets) for a in sim.actors])
+    counts['actor_orders'] = sum([len(a.order_queue) for a in sim.actors])
+    
+    return counts
+
+def type_counts():
+    """Number of live objects of each type the garbage collector knows of"""
+    gc.collect()
+    
+    counts = {}
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        counts[name] = counts.get(name, 0) + 1
+    
+    return counts
+
+def module_counts():
+    """Number of live objects the garbage collector knows of grouped by
+    the module their class is defined in"""
+    gc.collect()
+    
+    counts = {}
+    for obj in gc.get_objects():
+        name = getattr(type(obj), "__module__", None) or "?"
+        counts[name] = counts.get(name, 0) + 1
+    
+    return counts
+
+def owner_counts(sim):
+    """Number of objects (numbers and strings included) reachable from
+    each of the sim's containers (see owner_roots), so a dict or list is
+    put down to the part of the sim holding it rather than to builtins"""
+    gc.collect()
+    
+    seen = set([id(sim)])
+    counts = {}
+    for name in owner_roots:
+        root = getattr(sim, name, None)
+        if root == None or id(root) in seen:
+            continue
+        
+        seen.add(id(root))
+        stack = [root]
+        found = 1
+        while stack:
+            for obj in gc.get_referents(stack.pop()):
+                if id(obj) in seen or isinstance(obj, _stop_types):
+                    continue
+                
+                seen.add(id(obj))
+                stack.append(obj)
+                found += 1
+        
+        counts[name] = found
+    
+    return counts
+
+def snapshot(sim):
+    s = {
+        "tick":         sim.tick,
+        "subsystems":   subsystem_counts(sim),
+        "types":        type_counts(),
+        "modules":      module_counts(),
+        "owners":       owner_counts(sim),
+        "tracemalloc":  None,
+    }
+    
+    if tracemalloc != None and tracemalloc.is_tracing():
+        s['tracemalloc'] = tracemalloc.take_snapshot()
+    
+    return s
+
+def _growth(first, last):
+    """Returns a list of (change, name, first, last) biggest first"""
+    result = []
+    for k in set(first.keys()) | set(last.keys()):
+        change = last.get(k, 0) - first.get(k, 0)
+        if change != 0:
+            result.append((change, k, first.get(k, 0), last.get(k, 0)))
+    
+    result.sort(reverse=True)
+    return result
+
+def report(snapshots, top=15):
+    first, last = snapshots[0], snapshots[-1]
+    
+    # Subsystems over time
+    names = sorted(first['subsystems'].keys())
+    print("\n%-20s %s" % ("tick", " ".join(["%8d" % s['tick'] for s in snapshots])))
+    for n in names:
+        print("%-20s %s" % (n, " ".join(["%8d" % s['subsystems'].get(n, 0) for s in snapshots])))
+    
+    print("\nGrowth by type (tick %d to %d)" % (first['tick'], last['tick']))
+    for change, name, before, after in _growth(first['types'], last['types'])[:top]:
+        print("  %-30s %+8d (%d -> %d)" % (name, change, before, after))
+    
+    print("\nGrowth by module (tick %d to %d)" % (first['tick'], last['tick']))
+    for change, name, before, after in _growth(first['modules'], last['modules'])[:top]:
+        print("  %-30s %+8d (%d -> %d)" % (name, change, before, after))
+    
+    print("\nGrowth by owner (tick %d to %d)" % (first['tick'], last['tick']))
+    for change, name, before, after in _growth(first['owners'], last['owners'])[:top]:
+        print("  %-30s %+8d (%d -> %d)" % (name, change, before, after))
+    
+    if first['tracemalloc'] != None:
+        print("\nGrowth by allocation site")
+        for stat in last['tracemalloc'].compare_to(first['tracemalloc'], "lineno")[:top]:
+            print("  %s" % stat)
+
+def run(args):
+    parser = optparse.OptionParser(usage="python main.py memprofile [scenario] [options]")
+    parser.add_option("--scale", dest="scale", type="int", default=200,
+        help="how many actors to spawn")
+    parser.add_option("--ticks", dest="ticks", type="int", default=3000,
+        help="how many ticks to run for")
+    parser.add_option("--interval", dest="interval", type="int", default=500,
+        help="ticks between snapshots")
+    parser.add_option("--top", dest="top", type="int", default=15,
+        help="how many types/sites to show")
+    
+    options, names = parser.parse_args(args)
+    if names == []:
+        names = ["skirmish"]
+    
+    scenario = bench.load_scenario(names[0])
+    sim = bench.new_sim(scenario, options.scale)
+    
+    if tracemalloc != None:
+        tracemalloc.start()
+    
+    try:
+        snapshots = [snapshot(sim)]
+        while sim.tick < options.ticks:
+            sim.run_ticks(min(options.interval, options.ticks - sim.tick))
+            snapshots.append(snapshot(sim))
+            
+            sys.stdout.write("Tick %d\r" % sim.tick)
+            sys.stdout.flush()
+    finally:
+        sim.quit()
+        
+        if tracemalloc != None:
+            tracemalloc.stop()
+    
+    report(snapshots, options.top)
+    
+    return snapshots
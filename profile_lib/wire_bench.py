@@ -0,0 +1,156 @@
+from __future__ import division
+
+"""
+Compares the wire format (see engine/ai/wire.py) with sending each
+message as its own dict. Orders are sent from another process through a
+multiprocessing.Queue the way an AI sends them. Actors, both the full
+list and the deltas between updates, are packed and unpacked in this
+process the way the sim sends them.
+
+    python main.py wirebench
+    python main.py wirebench --orders 50000 --batch 200 --scale 5000
+"""
+
+import time
+import optparse
+import multiprocessing
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from engine.ai import wire
+from engine.libs import actor_lib, ai_lib
+from profile_lib import bench
+
+def order_messages(count, type_names):
+    """A mix of the orders the AIs give"""
+    messages = []
+    for i in range(count):
+        if i % 3 == 0:
+            messages.append({"data_type": "orders", "cmd": "move", "actor": i,
+                "pos": [i % 2000, i % 1500], "target": None})
+        elif i % 3 == 1:
+            messages.append({"data_type": "orders", "cmd": "attack", "actor": i,
+                "pos": None, "target": i + 1})
+        else:
+            messages.append({"data_type": "orders", "cmd": "build", "actor": i,
+                "pos": None, "target": type_names[i % len(type_names)]})
+    
+    return messages
+
+def _send(queue, start, messages, type_names, batch):
+    start.wait()
+    
+    if batch == 0:
+        for m in messages:
+            queue.put(m)
+        return
+    
+    codec = wire.Codec(type_names)
+    for i in range(0, len(messages), batch):
+        queue.put(codec.pack_frame(messages[i:i+batch]))
+
+def time_orders(messages, type_names, batch):
+    """Messages per second from another process, batch is how many go
+    in each frame (0 sends dicts)"""
+    codec = wire.Codec(type_names)
+    queue = multiprocessing.Queue()
+    start = multiprocessing.Event()
+    
+    p = multiprocessing.Process(target=_send, args=(queue, start, messages, type_names, batch))
+    p.start()
+    
+    start_time = time.time()
+    start.set()
+    
+    received = 0
+    while received < len(messages):
+        data = queue.get()
+        
+        if wire.is_frame(data):
+            received += len(codec.unpack_frame(data))
+        else:
+            received += 1
+    
+    elapsed = time.time() - start_time
+    p.join()
+    
+    return len(messages) / elapsed
+
+def _time_message(message, count, type_names, repeat):
+    """(actors per second, bytes per actor) for the message sent as a
+    pickled dict and as a frame, the best of repeat runs"""
+    codec = wire.Codec(type_names)
+    dict_time, frame_time = None, None
+    
+    for i in range(repeat):
+        start_time = time.time()
+        data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        pickle.loads(data)
+        dict_time = min(dict_time or 1e9, time.time() - start_time)
+        
+        start_time = time.time()
+        frame = codec.pack_frame([message])
+        codec.unpack_frame(frame)
+        frame_time = min(frame_time or 1e9, time.time() - start_time)
+    
+    return (count / dict_time, len(data) / count), (count / frame_time, len(frame) / count)
+
+def time_actors(sim, type_names, repeat=5):
+    """Actors per second and bytes per actor for a full list"""
+    message = {"cmd": "actors", "actor_list": [actor_lib.strip_actor(a) for a in sim.actors]}
+    return _time_message(message, len(sim.actors), type_names, repeat)
+
+def time_deltas(sim, type_names, ticks=10, repeat=5):
+    """Changed actors per second and bytes per changed actor for the
+    deltas after running ticks more ticks"""
+    state = ai_lib.actor_deltas({}, sim.actors)[0]
+    sim.run_ticks(ticks)
+    state, created, removed, changed = ai_lib.actor_deltas(state, sim.actors)
+    
+    message = {"cmd": "actor_deltas", "created": created, "removed": removed, "changed": changed}
+    count = max(len(created) + len(changed), 1)
+    return _time_message(message, count, type_names, repeat)
+
+def run(args):
+    parser = optparse.OptionParser(usage="python main.py wirebench [options]")
+    parser.add_option("--orders", dest="orders", type="int", default=20000,
+        help="how many orders to send")
+    parser.add_option("--batch", dest="batch", type="int", default=100,
+        help="orders in each frame")
+    parser.add_option("--scale", dest="scale", type="int", default=1000,
+        help="actors in the list sent to the AI")
+    parser.add_option("--scenario", dest="scenario", default="skirmish",
+        help="bench scenario the actors come from")
+    
+    options, extra = parser.parse_args(args)
+    
+    sim = bench.new_sim(bench.load_scenario(options.scenario), options.scale)
+    type_names = sorted(sim.actor_types.keys())
+    
+    messages = order_messages(options.orders, type_names)
+    orders = {
+        "dicts":    time_orders(messages, type_names, 0),
+        "frames":   time_orders(messages, type_names, options.batch),
+    }
+    
+    print("Orders (%d, from another process)" % options.orders)
+    print("  dicts       %10.0f messages/s" % orders['dicts'])
+    print("  frames      %10.0f messages/s (%d per frame, %.1fx)" % (
+        orders['frames'], options.batch, orders['frames'] / orders['dicts']))
+    
+    actors = dict(zip(("dicts", "frames"), time_actors(sim, type_names)))
+    
+    print("Actors (%d, packed and unpacked)" % len(sim.actors))
+    for name in ("dicts", "frames"):
+        print("  %-10s  %10.0f actors/s  %6.1f bytes each" % ((name,) + actors[name]))
+    
+    deltas = dict(zip(("dicts", "frames"), time_deltas(sim, type_names)))
+    
+    print("Actor deltas (after 10 ticks, packed and unpacked)")
+    for name in ("dicts", "frames"):
+        print("  %-10s  %10.0f actors/s  %6.1f bytes each" % ((name,) + deltas[name]))
+    
+    return {"orders": orders, "actors": actors, "deltas": deltas}